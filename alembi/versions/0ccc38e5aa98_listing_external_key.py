@@ -0,0 +1,36 @@
+"""listing external key
+
+Revision ID: 0ccc38e5aa98
+Revises: 739a280f366a
+Create Date: 2026-10-19 07:16:58.401945
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0ccc38e5aa98"
+down_revision: Union[str, None] = "739a280f366a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite cannot add a constraint in place: batch mode copies the table
+    with op.batch_alter_table("listings") as batch_op:
+        batch_op.add_column(
+            sa.Column("external_key", sa.String(length=100), nullable=True)
+        )
+        batch_op.create_unique_constraint(
+            "uq_listing_seller_external_key", ["seller_id", "external_key"]
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("listings") as batch_op:
+        batch_op.drop_constraint("uq_listing_seller_external_key", type_="unique")
+        batch_op.drop_column("external_key")
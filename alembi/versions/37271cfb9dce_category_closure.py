@@ -0,0 +1,60 @@
+"""category closure
+
+Revision ID: 37271cfb9dce
+Revises: c6d8a5098e7f
+Create Date: 2026-10-19 07:16:59.669522
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "37271cfb9dce"
+down_revision: Union[str, None] = "c6d8a5098e7f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "category_closure",
+        sa.Column("ancestor_id", sa.String(length=36), nullable=False),
+        sa.Column("descendant_id", sa.String(length=36), nullable=False),
+        sa.Column("depth", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["ancestor_id"],
+            ["categories.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["descendant_id"],
+            ["categories.id"],
+        ),
+        sa.PrimaryKeyConstraint("ancestor_id", "descendant_id"),
+    )
+    op.create_index(
+        "ix_category_closure_descendant",
+        "category_closure",
+        ["descendant_id", "depth"],
+        unique=False,
+    )
+    # Pairs for the existing tree, as CategoryService.rebuild_closure() finds
+    # them: every category at depth 0, then each level below its ancestors
+    op.execute("""
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM categories
+            UNION ALL
+            SELECT tree.ancestor_id, categories.id, tree.depth + 1
+            FROM tree JOIN categories ON categories.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_category_closure_descendant", table_name="category_closure")
+    op.drop_table("category_closure")
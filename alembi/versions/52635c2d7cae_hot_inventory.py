@@ -0,0 +1,56 @@
+"""hot inventory
+
+Revision ID: 52635c2d7cae
+Revises: 5c2034efc992
+Create Date: 2026-10-19 07:17:01.673799
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "52635c2d7cae"
+down_revision: Union[str, None] = "5c2034efc992"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_order_items() -> bool:
+    # orders and order_items predate the migrations and are made by the
+    # app's create_all, which already gives a new order_items stock_applied
+    return sa.inspect(op.get_bind()).has_table("order_items")
+
+
+def upgrade() -> None:
+    op.add_column(
+        "listings",
+        sa.Column("hot_inventory", sa.Boolean(), server_default="0", nullable=False),
+    )
+    if _has_order_items():
+        # Items sold before flash sales existed were all deducted at checkout
+        op.add_column(
+            "order_items",
+            sa.Column(
+                "stock_applied", sa.Boolean(), server_default="1", nullable=False
+            ),
+        )
+        op.create_index(
+            "ix_order_items_stock_pending",
+            "order_items",
+            ["listing_id"],
+            unique=False,
+            sqlite_where=sa.text("stock_applied = 0"),
+        )
+
+
+def downgrade() -> None:
+    if _has_order_items():
+        op.drop_index("ix_order_items_stock_pending", table_name="order_items")
+        with op.batch_alter_table("order_items") as batch_op:
+            batch_op.drop_column("stock_applied")
+    with op.batch_alter_table("listings") as batch_op:
+        batch_op.drop_column("hot_inventory")
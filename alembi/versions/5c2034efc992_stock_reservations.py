@@ -0,0 +1,65 @@
+"""stock reservations
+
+Revision ID: 5c2034efc992
+Revises: 9f9f8cf797a9
+Create Date: 2026-10-19 07:17:00.964746
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2034efc992"
+down_revision: Union[str, None] = "9f9f8cf797a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "listings",
+        sa.Column(
+            "reserved_quantity", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+    op.create_table(
+        "stock_reservations",
+        sa.Column("user_id", sa.String(length=36), nullable=False),
+        sa.Column("listing_id", sa.String(length=36), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["listing_id"],
+            ["listings.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "user_id", "listing_id", name="uq_reservation_user_listing"
+        ),
+    )
+    op.create_index(
+        op.f("ix_stock_reservations_expires_at"),
+        "stock_reservations",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_stock_reservations_expires_at"), table_name="stock_reservations"
+    )
+    op.drop_table("stock_reservations")
+    with op.batch_alter_table("listings") as batch_op:
+        batch_op.drop_column("reserved_quantity")
@@ -0,0 +1,70 @@
+"""checkout jobs
+
+Revision ID: 64f8cbd87a60
+Revises: 78470a0dea33
+Create Date: 2026-10-19 07:17:02.835887
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "64f8cbd87a60"
+down_revision: Union[str, None] = "78470a0dea33"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "checkout_jobs",
+        sa.Column("user_id", sa.String(length=36), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("QUEUED", "PROCESSING", "DONE", "FAILED", name="checkoutjobstatus"),
+            nullable=False,
+        ),
+        sa.Column("order_id", sa.String(length=36), nullable=True),
+        sa.Column("error", sa.String(length=500), nullable=True),
+        sa.Column("claimed_by", sa.String(length=36), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["order_id"],
+            ["orders.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_checkout_jobs_status_created",
+        "checkout_jobs",
+        ["status", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_checkout_jobs_user_id"), "checkout_jobs", ["user_id"], unique=False
+    )
+    op.create_index(
+        "uq_checkout_jobs_open_user",
+        "checkout_jobs",
+        ["user_id"],
+        unique=True,
+        sqlite_where=sa.text("status IN ('QUEUED', 'PROCESSING')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_checkout_jobs_open_user", table_name="checkout_jobs")
+    op.drop_index(op.f("ix_checkout_jobs_user_id"), table_name="checkout_jobs")
+    op.drop_index("ix_checkout_jobs_status_created", table_name="checkout_jobs")
+    op.drop_table("checkout_jobs")
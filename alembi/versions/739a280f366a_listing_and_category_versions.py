@@ -0,0 +1,42 @@
+"""listing and category versions
+
+Revision ID: 739a280f366a
+Revises: 2370082a126a
+Create Date: 2026-10-19 07:16:57.731420
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "739a280f366a"
+down_revision: Union[str, None] = "2370082a126a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows start at version 1, as new rows do
+    op.add_column(
+        "listings",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "categories",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.create_index(
+        "ix_listings_created_at_id", "listings", ["created_at", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_listings_created_at_id", table_name="listings")
+    with op.batch_alter_table("categories") as batch_op:
+        batch_op.drop_column("version")
+    with op.batch_alter_table("listings") as batch_op:
+        batch_op.drop_column("version")
@@ -0,0 +1,30 @@
+"""cart token merged at
+
+Revision ID: 78470a0dea33
+Revises: 52635c2d7cae
+Create Date: 2026-10-19 07:17:02.246861
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "78470a0dea33"
+down_revision: Union[str, None] = "52635c2d7cae"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users", sa.Column("cart_token_merged_at", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("cart_token_merged_at")
@@ -0,0 +1,33 @@
+"""catalog versions
+
+Revision ID: 9f9f8cf797a9
+Revises: 37271cfb9dce
+Create Date: 2026-10-19 07:17:00.288357
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9f9f8cf797a9"
+down_revision: Union[str, None] = "37271cfb9dce"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Empty: a catalog without a row reads as version 0 until its first bump
+    op.create_table(
+        "catalog_versions",
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("catalog_versions")
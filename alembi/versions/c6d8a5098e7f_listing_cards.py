@@ -0,0 +1,91 @@
+"""listing cards
+
+Revision ID: c6d8a5098e7f
+Revises: 0ccc38e5aa98
+Create Date: 2026-10-19 07:16:59.073558
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c6d8a5098e7f"
+down_revision: Union[str, None] = "0ccc38e5aa98"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "listing_cards",
+        sa.Column("listing_id", sa.String(length=36), nullable=False),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("ACTIVE", "INACTIVE", "SOLD_OUT", "DELETED", name="listingstatus"),
+            nullable=True,
+        ),
+        sa.Column("category_id", sa.String(length=36), nullable=False),
+        sa.Column("category_name", sa.String(length=100), nullable=False),
+        sa.Column("seller_id", sa.String(length=36), nullable=False),
+        sa.Column("seller_username", sa.String(length=50), nullable=False),
+        sa.Column("average_rating", sa.Float(), nullable=True),
+        sa.Column("review_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("listing_id"),
+    )
+    op.create_index(
+        "ix_listing_cards_status_category",
+        "listing_cards",
+        ["status", "category_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_listing_cards_seller", "listing_cards", ["seller_id"], unique=False
+    )
+    op.create_index("ix_listing_cards_price", "listing_cards", ["price"], unique=False)
+    op.create_index(
+        "ix_listing_cards_created_at_listing",
+        "listing_cards",
+        ["created_at", "listing_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_reviews_listing_id"), "reviews", ["listing_id"], unique=False
+    )
+    # Cards for the existing listings, as ListingCardService.rebuild() makes them
+    op.execute("""
+        INSERT INTO listing_cards (
+            listing_id, title, price, quantity, status, category_id,
+            category_name, seller_id, seller_username, average_rating,
+            review_count, created_at, updated_at
+        )
+        SELECT
+            listings.id, listings.title, listings.price, listings.quantity,
+            listings.status, listings.category_id, categories.name,
+            listings.seller_id, users.username,
+            (SELECT avg(reviews.rating) FROM reviews
+             WHERE reviews.listing_id = listings.id),
+            (SELECT count(reviews.id) FROM reviews
+             WHERE reviews.listing_id = listings.id),
+            listings.created_at, listings.updated_at
+        FROM listings
+        JOIN categories ON categories.id = listings.category_id
+        JOIN users ON users.id = listings.seller_id
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_reviews_listing_id"), table_name="reviews")
+    op.drop_index("ix_listing_cards_created_at_listing", table_name="listing_cards")
+    op.drop_index("ix_listing_cards_price", table_name="listing_cards")
+    op.drop_index("ix_listing_cards_seller", table_name="listing_cards")
+    op.drop_index("ix_listing_cards_status_category", table_name="listing_cards")
+    op.drop_table("listing_cards")
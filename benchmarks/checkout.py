@@ -0,0 +1,173 @@
+"""Checkout latency and statement count against cart size.
+
+Seeds a throwaway SQLite database, fills a buyer's cart with N distinct
+listings and checks it out, for each cart size, two ways:
+
+* ``per-item``: one SELECT and one UPDATE per cart item through the ORM,
+  then one INSERT per order item (the previous checkout)
+* ``set-based``: ``CartService.process_checkout`` (one IN load, one hold
+  release, one guarded UPDATE, one order item INSERT, one cart DELETE)
+
+``stmts`` counts the statements sent to SQLite and ``write stmts`` those
+issued while the write lock is held (from the first write to the commit).
+
+Usage (from the repository root)::
+
+    python -m benchmarks.checkout [--sizes 1,5,10,30,100] [--repeat 20]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401  (register every mapper)
+from database import Base
+from models.cart import CartItem
+from models.category import Category
+from models.listing import Listing, ListingStatus
+from models.order import Order, OrderItem, OrderStatus
+from models.roles import Role, UserRole
+from models.user import User
+from services.cart import CartService
+from services.listing_card import ListingCardService
+
+
+def per_item_checkout(db, user_id: str) -> Order:
+    """The checkout loop this replaced, with the model field names fixed"""
+    cart_items = db.query(CartItem).filter(CartItem.user_id == user_id).all()
+    total = Decimal(0)
+    order_items = []
+    for cart_item in cart_items:
+        listing = db.query(Listing).filter(Listing.id == cart_item.listing_id).first()
+        if not listing or listing.status != ListingStatus.ACTIVE:
+            raise ValueError(f"Listing {cart_item.listing_id} is no longer available")
+        if listing.quantity < cart_item.quantity:
+            raise ValueError(f"Not enough stock for {listing.title}")
+        listing.quantity -= cart_item.quantity
+        if listing.quantity == 0:
+            listing.status = ListingStatus.SOLD_OUT
+        total += Decimal(str(cart_item.price_at_add)) * cart_item.quantity
+        order_items.append(
+            OrderItem(
+                listing_id=listing.id,
+                quantity=cart_item.quantity,
+                price_at_time=cart_item.price_at_add,
+            )
+        )
+    order = Order(
+        buyer_id=user_id,
+        total_amount=total,
+        status=OrderStatus.PENDING,
+        items=order_items,
+    )
+    db.add(order)
+    db.query(CartItem).filter(CartItem.user_id == user_id).delete()
+    ListingCardService(db).refresh_listings(item.listing_id for item in order_items)
+    db.commit()
+    return order
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.total = self.writes = 0
+        self.writing = False
+        event.listen(engine, "before_cursor_execute", self._execute)
+        event.listen(engine, "commit", self._commit)
+        event.listen(engine, "rollback", self._commit)
+
+    def _execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+        if not statement.lstrip().upper().startswith("SELECT"):
+            self.writing = True
+        if self.writing:
+            self.writes += 1
+
+    def _commit(self, conn):
+        self.writing = False
+
+    def reset(self):
+        self.total = self.writes = 0
+        self.writing = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,5,10,30,100")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    logging.getLogger("api").handlers.clear()
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        role = Role(name=UserRole.BUYER)
+        buyer = User(username="buyer", email="b@bench.test", password="x", role=role)
+        seller = User(username="seller", email="s@bench.test", password="x", role=role)
+        category = Category(name="Bench")
+        session.add_all([role, buyer, seller, category])
+        session.flush()
+        listings = [
+            Listing(
+                title=f"Listing {i}",
+                price=9.99,
+                quantity=10**6,
+                category_id=category.id,
+                seller_id=seller.id,
+            )
+            for i in range(max(sizes))
+        ]
+        session.add_all(listings)
+        session.commit()
+        buyer_id = buyer.id
+        listing_ids = [listing.id for listing in listings]
+
+    counter = StatementCounter(engine)
+    paths = {
+        "per-item": lambda db: per_item_checkout(db, buyer_id),
+        "set-based": lambda db: CartService(db).process_checkout(buyer_id),
+    }
+
+    print(
+        f"{'items':>6}  {'path':<10}{'median ms':>10}{'p95 ms':>9}"
+        f"{'stmts':>7}{'write stmts':>13}"
+    )
+    for size in sizes:
+        for label, checkout in paths.items():
+            timings = []
+            for _ in range(args.repeat):
+                with Session() as db:
+                    db.add_all(
+                        CartItem(
+                            user_id=buyer_id,
+                            listing_id=listing_id,
+                            quantity=1,
+                            price_at_add=9.99,
+                        )
+                        for listing_id in listing_ids[:size]
+                    )
+                    db.commit()
+                counter.reset()
+                with Session() as db:
+                    start = time.perf_counter()
+                    checkout(db)
+                    timings.append(time.perf_counter() - start)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(
+                f"{size:>6}  {label:<10}{statistics.median(timings) * 1e3:>10.2f}"
+                f"{p95 * 1e3:>9.2f}{counter.total:>7}{counter.writes:>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
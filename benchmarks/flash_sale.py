@@ -0,0 +1,150 @@
+"""Checkout throughput on one flash-sale listing.
+
+Seeds a throwaway SQLite database with one listing and many buyers, each
+with that listing in their cart, then lets ``--threads`` workers check the
+carts out as fast as they can, two ways:
+
+* ``guarded``: every checkout runs the guarded stock UPDATE on the listing
+  row, so all of them queue on SQLite's write lock together with the rest
+  of the checkout
+* ``ledger``: the listing is in hot-inventory mode; checkouts allocate from
+  the in-memory ledger and a write-behind thread deducts the sales in
+  batches
+
+After each run the remaining sales are written back and the listing row is
+checked against the units sold, so an oversell fails the benchmark.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.flash_sale [--buyers 2000] [--threads 8] [--stock 1500]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401  (register every mapper)
+import services.cart
+from database import Base
+from models.cart import CartItem
+from models.category import Category
+from models.listing import Listing
+from models.order import OrderItem
+from models.roles import Role, UserRole
+from models.user import User
+from services.cart import CartService
+from services.hot_inventory import HotInventoryLedger
+
+
+def seed(Session, buyers: int, stock: int):
+    with Session() as db:
+        role = Role(name=UserRole.BUYER)
+        seller = User(username="seller", email="s@bench.test", password="x", role=role)
+        category = Category(name="Bench")
+        users = [
+            User(username=f"b{i}", email=f"b{i}@bench.test", password="x", role=role)
+            for i in range(buyers)
+        ]
+        db.add_all([role, seller, category, *users])
+        db.flush()
+        listing = Listing(
+            title="Flash sale",
+            price=9.99,
+            quantity=stock,
+            category_id=category.id,
+            seller_id=seller.id,
+        )
+        db.add(listing)
+        db.flush()
+        db.add_all(
+            CartItem(
+                user_id=user.id,
+                listing_id=listing.id,
+                quantity=1,
+                price_at_add=9.99,
+            )
+            for user in users
+        )
+        db.commit()
+        return listing.id, [user.id for user in users]
+
+
+def run(Session, buyer_ids, threads: int):
+    """Check every cart out from ``threads`` workers; returns (sold, refused, s)"""
+    queue = list(buyer_ids)
+    lock = threading.Lock()
+    counts = {"sold": 0, "refused": 0}
+
+    def worker():
+        with Session() as db:
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    buyer_id = queue.pop()
+                try:
+                    CartService(db).process_checkout(buyer_id)
+                    outcome = "sold"
+                except ValueError:
+                    db.rollback()
+                    outcome = "refused"
+                with lock:
+                    counts[outcome] += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return counts["sold"], counts["refused"], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buyers", type=int, default=2_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--stock", type=int, default=1_500)
+    args = parser.parse_args()
+
+    logging.getLogger("api").handlers.clear()
+    print(
+        f"{'mode':<9}{'sold':>6}{'refused':>9}{'seconds':>9}{'checkouts/s':>13}"
+        f"{'row qty':>9}"
+    )
+    for mode in ("guarded", "ledger"):
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        listing_id, buyer_ids = seed(Session, args.buyers, args.stock)
+
+        ledger = HotInventoryLedger(Session)
+        services.cart.hot_inventory = ledger
+        if mode == "ledger":
+            with Session() as db:
+                ledger.enable(db, listing_id)
+        ledger.start()
+        sold, refused, seconds = run(Session, buyer_ids, args.threads)
+        ledger.stop()
+
+        with Session() as db:
+            quantity = db.get(Listing, listing_id).quantity
+            units = db.query(func.sum(OrderItem.quantity)).scalar() or 0
+        assert sold == units == min(args.stock, args.buyers), "stock oversold"
+        assert quantity == args.stock - sold, "write-behind lost sales"
+        print(
+            f"{mode:<9}{sold:>6}{refused:>9}{seconds:>9.2f}{sold / seconds:>13.0f}"
+            f"{quantity:>9}"
+        )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Throughput of the JSON response paths for a page of listings.
+
+Serves the same page of ``ListingResponse`` objects through each path and
+drives it in-process over ASGI, so the numbers isolate serialization and
+framework overhead from the network and the database:
+
+* ``stdlib``: ``response_class=JSONResponse`` (validate, encode to Python,
+  then ``json.dumps``)
+* ``pydantic``: FastAPI's default for a ``response_model`` (validate, then
+  ``dump_json`` in pydantic-core)
+* ``orjson``: ``response_class=OrjsonResponse`` with a ``response_model``
+* ``orjson-untyped``: ``OrjsonResponse`` around the bare slotted rows
+* ``stored``: ``RawJSONResponse`` around pre-serialized bytes, as served by
+  the response caches
+
+It also hits the real ``GET /listings`` endpoint cold (browse cache
+cleared before every request) and warm, with request logging silenced.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.json_responses [--rows 100] [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+
+from models.listing import ListingStatus
+from responses import OrjsonResponse, RawJSONResponse
+from schemas.listing import ListingResponse, ListingRow
+
+
+def build_rows(count: int) -> List[ListingRow]:
+    return [
+        ListingRow(
+            title=f"Listing {i}",
+            description="lorem ipsum dolor sit amet " * 8,
+            price=Decimal("19.99"),
+            quantity=3,
+            category_id=str(uuid.uuid4()),
+            status=ListingStatus.ACTIVE,
+            id=str(uuid.uuid4()),
+            seller_id=str(uuid.uuid4()),
+        )
+        for i in range(count)
+    ]
+
+
+def build_app(rows: List[ListingRow]) -> FastAPI:
+    models = [ListingResponse.model_validate(row, from_attributes=True) for row in rows]
+    body = TypeAdapter(List[ListingRow]).dump_json(rows)
+    app = FastAPI()
+
+    @app.get(
+        "/stdlib", response_model=List[ListingResponse], response_class=JSONResponse
+    )
+    async def stdlib():
+        return models
+
+    @app.get("/pydantic", response_model=List[ListingResponse])
+    async def pydantic_default():
+        return models
+
+    @app.get(
+        "/orjson", response_model=List[ListingResponse], response_class=OrjsonResponse
+    )
+    async def orjson_typed():
+        return models
+
+    @app.get("/orjson-untyped")
+    async def orjson_untyped():
+        return OrjsonResponse(rows)
+
+    @app.get("/stored")
+    async def stored():
+        return RawJSONResponse(body)
+
+    return app
+
+
+async def throughput(app, path: str, requests: int, before=None) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        reference = (await c.get(path)).content
+        start = time.perf_counter()
+        for _ in range(requests):
+            if before:
+                before()
+            response = await c.get(path)
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, reference
+
+
+def seed_app_listings(rows: int):
+    """Point the real app at a scratch database holding ``rows`` listings"""
+    import main
+    from database import Base, SessionLocal
+    from models import Category, Listing, Role, User
+    from models.roles import UserRole
+
+    # Keep the per-request log lines out of the measurement
+    logging.getLogger("api").handlers.clear()
+    engine = create_engine(
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal.configure(bind=engine)
+
+    db = SessionLocal()
+    role = Role(name=UserRole.SELLER)
+    seller = User(username="bench", email="bench@bench.test", password="x", role=role)
+    category = Category(name="Bench")
+    db.add_all([role, seller, category])
+    db.flush()
+    db.add_all(
+        Listing(
+            title=f"Listing {i}",
+            description="lorem ipsum dolor sit amet " * 8,
+            price=19.99,
+            quantity=3,
+            category_id=category.id,
+            seller_id=seller.id,
+        )
+        for i in range(rows)
+    )
+    db.commit()
+    db.close()
+    return main.app
+
+
+async def run(args):
+    rows = build_rows(args.rows)
+    app = build_app(rows)
+    print(f"{'path':<28}{'req/s':>10}")
+    bodies = {}
+    for path in ("stdlib", "pydantic", "orjson", "orjson-untyped", "stored"):
+        rate, bodies[path] = await throughput(app, f"/{path}", args.requests)
+        print(f"{path:<28}{rate:>10.0f}")
+    # Every path must put the same document on the wire
+    documents = [json.loads(body) for body in bodies.values()]
+    assert all(document == documents[0] for document in documents)
+
+    from cache import listing_browse_cache
+
+    listings_app = seed_app_listings(args.rows)
+    path = f"/listings/?limit={args.rows}"
+    cold, _ = await throughput(
+        listings_app, path, args.requests // 4, before=listing_browse_cache.clear
+    )
+    warm, _ = await throughput(listings_app, path, args.requests)
+    print(f"{'GET /listings (cold)':<28}{cold:>10.0f}")
+    print(f"{'GET /listings (cached)':<28}{warm:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Per-row cost of ORM entity loading vs column projection on list endpoints.
+
+Seeds a throwaway SQLite database and serializes the same page both ways:
+
+* ``orm``: full entities -> ``Model.model_validate`` -> ``TypeAdapter.dump_json``
+  (the previous read path)
+* ``projection``: selected columns -> slotted dataclass -> ``dump_json``
+
+Both bodies are checked to be byte-identical before timing.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.list_projection [--rows 5000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401  (register every mapper)
+from database import Base
+from models.category import Category
+from models.listing import Listing
+from models.order import Order, OrderItem
+from models.review import Review
+from models.roles import Role, UserRole
+from models.user import User
+from schemas.listing import ListingResponse, ListingRow
+from schemas.order import OrderResponse, OrderRow
+from schemas.review import ReviewResponse, ReviewRow
+from services.listing import ListingService
+from services.order import OrderService
+from services.review import ReviewService
+
+
+def seed(session, rows: int) -> str:
+    rng = random.Random(42)
+    role = Role(name=UserRole.SELLER)
+    seller = User(
+        username="bench_seller", email="seller@bench.test", password="x", role=role
+    )
+    category = Category(name="Bench")
+    session.add_all([role, seller, category])
+    session.flush()
+
+    listings = [
+        Listing(
+            title=f"Listing {i}",
+            description="lorem ipsum " * rng.randint(20, 200),
+            price=round(rng.uniform(1, 500), 2),
+            quantity=rng.randint(1, 50),
+            category_id=category.id,
+            seller_id=seller.id,
+            version=1,
+        )
+        for i in range(rows)
+    ]
+    session.add_all(listings)
+    session.flush()
+
+    reviewed = listings[0]
+    session.add_all(
+        Review(
+            listing_id=reviewed.id,
+            reviewer_id=seller.id,
+            rating=rng.randint(1, 5),
+            comment="solid tool " * rng.randint(1, 20),
+        )
+        for _ in range(rows)
+    )
+    for i in range(rows // 3):
+        items = [
+            OrderItem(
+                listing_id=listing.id,
+                quantity=rng.randint(1, 3),
+                price_at_time=Decimal(str(listing.price)),
+            )
+            for listing in rng.sample(listings, 3)
+        ]
+        session.add(
+            Order(
+                buyer_id=seller.id,
+                total_amount=sum(item.price_at_time * item.quantity for item in items),
+                items=items,
+            )
+        )
+    session.commit()
+    return reviewed.id
+
+
+def measure(fn, repeat: int):
+    """Best wall time and traced peak memory of fn()"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        reviewed_id = seed(session, args.rows)
+
+    limit = args.rows
+    listing_adapter = TypeAdapter(List[ListingResponse])
+    listing_rows_adapter = TypeAdapter(List[ListingRow])
+    order_adapter = TypeAdapter(List[OrderResponse])
+    order_rows_adapter = TypeAdapter(List[OrderRow])
+    review_adapter = TypeAdapter(List[ReviewResponse])
+    review_rows_adapter = TypeAdapter(List[ReviewRow])
+
+    def run(build):
+        # A fresh session per call, as each request gets one
+        with Session() as session:
+            return build(session)
+
+    cases = {
+        "GET /listings": (
+            lambda db: listing_adapter.dump_json(
+                [
+                    ListingResponse.model_validate(listing)
+                    for listing in ListingService(db).get_listings(limit=limit)
+                ]
+            ),
+            lambda db: listing_rows_adapter.dump_json(
+                [
+                    ListingRow.from_row(row)
+                    for row in ListingService(db).get_listing_rows(limit=limit)
+                ]
+            ),
+        ),
+        "GET /orders": (
+            lambda db: order_adapter.dump_json(
+                [
+                    OrderResponse.model_validate(order)
+                    for order in OrderService(db).get_all_orders(limit=limit)
+                ]
+            ),
+            lambda db: order_rows_adapter.dump_json(
+                OrderService(db).get_order_rows(limit=limit)
+            ),
+        ),
+        "GET /reviews/listing/{id}": (
+            lambda db: review_adapter.dump_json(
+                [
+                    ReviewResponse.model_validate(review)
+                    for review in ReviewService(db).get_listing_reviews(
+                        reviewed_id, limit=limit
+                    )
+                ]
+            ),
+            lambda db: review_rows_adapter.dump_json(
+                ReviewService(db).get_listing_review_rows(reviewed_id, limit=limit)
+            ),
+        ),
+    }
+
+    print(f"{'endpoint':<28}{'path':<12}{'rows':>7}{'us/row':>10}{'peak B/row':>12}")
+    for endpoint, (orm, projection) in cases.items():
+        body = run(orm)
+        assert body == run(projection), f"{endpoint}: bodies differ"
+        rows = len(json.loads(body))
+        for label, build in (("orm", orm), ("projection", projection)):
+            seconds, peak = measure(lambda: run(build), args.repeat)
+            print(
+                f"{endpoint:<28}{label:<12}{rows:>7}"
+                f"{seconds / rows * 1e6:>10.1f}{peak / rows:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
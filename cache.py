@@ -0,0 +1,503 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from config import settings
+
+
+class CachedResponse(NamedTuple):
+    """Serialized response body together with its validators.
+
+    ``encoded`` holds precompressed variants of ``body`` keyed by
+    Content-Encoding, so cache hits are never compressed again.
+    """
+
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime] = None
+    encoded: Optional[Dict[str, bytes]] = None
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: Any, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+def _sizeof(key: Hashable, value: Any) -> int:
+    if isinstance(value, CachedResponse):
+        size = len(value.body) + len(value.etag)
+        if value.encoded:
+            size += sum(len(variant) for variant in value.encoded.values())
+    elif isinstance(value, (bytes, bytearray, str)):
+        size = len(value)
+    else:
+        size = sys.getsizeof(value)
+    return size + sys.getsizeof(key)
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hard entry/byte caps"""
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self) -> int:
+        """Token to pass to set() so loads racing an invalidation are dropped"""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        size = _sizeof(key, value)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = _Entry(value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if key in self._data:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class _TaggedEntry(_Entry):
+    __slots__ = ("tags", "fresh_until", "refreshing")
+
+    def __init__(self, value, size, expires_at, tags, fresh_until):
+        super().__init__(value, size, expires_at)
+        self.tags = tags
+        self.fresh_until = fresh_until
+        self.refreshing = False
+
+
+class TaggedCache(LRUCache):
+    """LRU cache whose entries carry tags for targeted invalidation.
+
+    Entries are fresh for ``ttl`` seconds and may then be served stale for
+    another ``stale_ttl`` seconds while a single caller refreshes them.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+
+    def __init__(
+        self, name: str, max_entries: int, max_bytes: int, ttl: float, stale_ttl: float
+    ):
+        super().__init__(name, max_entries, max_bytes, ttl)
+        self.stale_ttl = stale_ttl
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self.stale_hits = 0
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], Optional[str]]:
+        """Return (value, state); state is FRESH, STALE or None on a miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            now = time.monotonic()
+            if entry is None:
+                self.misses += 1
+                return None, None
+            if entry.expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            if entry.fresh_until > now:
+                return entry.value, self.FRESH
+            self.stale_hits += 1
+            return entry.value, self.STALE
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        return self.lookup(key)[0]
+
+    def claim_refresh(self, key: Hashable) -> bool:
+        """True for exactly one caller per stale entry"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry.refreshing:
+                return False
+            entry.refreshing = True
+            return True
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        generation: Optional[int] = None,
+        tags: Iterable[str] = (),
+    ) -> bool:
+        size = _sizeof(key, value)
+        if size > self.max_bytes:
+            return False
+
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._data:
+                self._remove(key)
+            now = time.monotonic()
+            self._data[key] = _TaggedEntry(
+                value, size, now + self.ttl + self.stale_ttl, tags, now + self.ttl
+            )
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate_tags(self, *tags: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update(
+                stale_ttl_seconds=self.stale_ttl,
+                stale_hits=self.stale_hits,
+                tags=len(self._tags),
+            )
+        return stats
+
+
+class CountCache:
+    """Short-lived cache of total counts for paginated endpoints.
+
+    Writes do not evict counts; they mark the affected entries dirty. A clean
+    entry is exact; a dirty one is served as an estimate until it ages past
+    ``ttl``, unless the caller decides recounting is cheap enough.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> [count, computed_at, dirty, tags]
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.exact_hits = 0
+        self.estimates = 0
+        self.recounts = 0
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Tuple[int, bool]]:
+        """Return (count, exact) or None when a recount is required"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            count, computed_at, dirty, _ = entry
+            if time.monotonic() - computed_at > self.ttl:
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            if dirty:
+                self.estimates += 1
+            else:
+                self.exact_hits += 1
+            return count, not dirty
+
+    def set(
+        self, key: Hashable, count: int, generation: int, tags: Iterable[str] = ()
+    ) -> None:
+        with self._lock:
+            self.recounts += 1
+            if key in self._data:
+                self._remove(key)
+            # A write that landed while counting leaves the result approximate
+            dirty = generation != self._generation
+            tags = frozenset(tags)
+            self._data[key] = [count, time.monotonic(), dirty, tags]
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.max_entries:
+                self._remove(next(iter(self._data)))
+
+    def mark_dirty(self, *tags: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in self._tags.get(tag, ()):
+                    self._data[key][2] = True
+
+    def mark_all_dirty(self) -> None:
+        with self._lock:
+            self._generation += 1
+            for entry in self._data.values():
+                entry[2] = True
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        for tag in entry[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "exact_hits": self.exact_hits,
+                "estimates": self.estimates,
+                "recounts": self.recounts,
+            }
+
+
+listing_detail_cache = LRUCache(
+    "listing_detail",
+    max_entries=settings.LISTING_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LISTING_CACHE_MAX_BYTES,
+    ttl=settings.LISTING_CACHE_TTL_SECONDS,
+)
+
+
+listing_browse_cache = TaggedCache(
+    "listing_browse",
+    max_entries=settings.LISTING_BROWSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LISTING_BROWSE_CACHE_MAX_BYTES,
+    ttl=settings.LISTING_BROWSE_CACHE_TTL_SECONDS,
+    stale_ttl=settings.LISTING_BROWSE_CACHE_STALE_SECONDS,
+)
+
+cart_summary_cache = TaggedCache(
+    "cart_summary",
+    max_entries=settings.CART_SUMMARY_CACHE_MAX_ENTRIES,
+    max_bytes=settings.CART_SUMMARY_CACHE_MAX_BYTES,
+    ttl=settings.CART_SUMMARY_CACHE_TTL_SECONDS,
+    stale_ttl=0,
+)
+
+total_count_cache = CountCache(
+    "total_count",
+    max_entries=settings.TOTAL_COUNT_CACHE_MAX_ENTRIES,
+    ttl=settings.TOTAL_COUNT_CACHE_TTL_SECONDS,
+)
+
+# Browse pages that filter on neither category nor seller can be affected by
+# any listing write
+ALL_LISTINGS_TAG = "listings:all"
+
+
+def category_tag(category_id) -> str:
+    return f"category:{category_id}"
+
+
+def seller_tag(seller_id) -> str:
+    return f"seller:{seller_id}"
+
+
+def browse_page_tags(
+    category_id=None, seller_id=None, include_descendants=False
+) -> Set[str]:
+    if category_id and include_descendants:
+        # Subcategory membership is not tracked per tag; any listing write
+        # or category move drops these pages
+        return {ALL_LISTINGS_TAG}
+    tags = set()
+    if category_id:
+        tags.add(category_tag(category_id))
+    if seller_id:
+        tags.add(seller_tag(seller_id))
+    return tags or {ALL_LISTINGS_TAG}
+
+
+def cart_tag(user_id) -> str:
+    return f"cart:{user_id}"
+
+
+def listing_tag(listing_id) -> str:
+    return f"listing:{listing_id}"
+
+
+def cart_summary_tags(user_id, listing_ids: Iterable[str]) -> Set[str]:
+    """A summary goes stale with the cart or any listing in it"""
+    return {cart_tag(user_id), *(listing_tag(listing_id) for listing_id in listing_ids)}
+
+
+def orders_tag(buyer_id=None) -> str:
+    return f"orders:{buyer_id}" if buyer_id else "orders:all"
+
+
+def get_total_count(
+    key: Hashable, tags: Iterable[str], count: Callable[[], int]
+) -> Tuple[int, bool]:
+    """(total, exact) for a list endpoint, recounting only when required.
+
+    A dirty count is recounted straight away while the last known total is
+    below TOTAL_COUNT_EXACT_THRESHOLD; above it the estimate is served until
+    the entry expires.
+    """
+    cached = total_count_cache.get(key)
+    if cached is not None:
+        total, exact = cached
+        if exact or total >= settings.TOTAL_COUNT_EXACT_THRESHOLD:
+            return cached
+
+    generation = total_count_cache.generation()
+    total = count()
+    total_count_cache.set(key, total, generation, tags)
+    return total, True
+
+
+def invalidate_orders(*buyer_ids) -> None:
+    """Mark order totals of the given buyers (and the admin view) as stale"""
+    total_count_cache.mark_dirty(
+        orders_tag(), *(orders_tag(buyer_id) for buyer_id in set(buyer_ids))
+    )
+
+
+def invalidate_cart(*user_ids) -> None:
+    """Drop the cached cart summaries of the given users"""
+    cart_summary_cache.invalidate_tags(*(cart_tag(user_id) for user_id in user_ids))
+
+
+def invalidate_listing(*listing_ids, category_ids=(), seller_ids=()) -> None:
+    """Drop every cached representation of the given listings.
+
+    ``category_ids`` and ``seller_ids`` should include both the old and the
+    new values when a listing moves, so browse pages on either side go.
+    Without either, every browse page is dropped.
+    """
+    listing_detail_cache.invalidate(*(str(listing_id) for listing_id in listing_ids))
+    if listing_ids:
+        cart_summary_cache.invalidate_tags(
+            *(listing_tag(listing_id) for listing_id in set(listing_ids))
+        )
+    if not category_ids and not seller_ids:
+        listing_browse_cache.clear()
+        total_count_cache.mark_all_dirty()
+        return
+    tags = (
+        ALL_LISTINGS_TAG,
+        *(category_tag(category_id) for category_id in set(category_ids)),
+        *(seller_tag(seller_id) for seller_id in set(seller_ids)),
+    )
+    listing_browse_cache.invalidate_tags(*tags)
+    total_count_cache.mark_dirty(*tags)
+
+
+def cache_stats() -> dict:
+    return {
+        "listing_detail": listing_detail_cache.stats(),
+        "listing_browse": listing_browse_cache.stats(),
+        "total_count": total_count_cache.stats(),
+        "cart_summary": cart_summary_cache.stats(),
+    }
@@ -0,0 +1,85 @@
+import base64
+import hashlib
+import hmac
+import time
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+import orjson
+from config import settings
+
+CART_TOKEN_HEADER = "X-Cart-Token"
+
+_VERSION = 1
+# Derived, so a cart token can never pass as any other signed value
+_KEY = hashlib.sha256(b"cart-token:" + settings.SECRET_KEY.encode()).digest()
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_KEY, payload, hashlib.sha256).digest()[:16]
+
+
+def encode_cart(items: Dict[str, int]) -> str:
+    """Sign an anonymous cart (listing id -> quantity) into a token.
+
+    Listing ids travel as 32 hex digits; a full token of
+    CART_TOKEN_MAX_ITEMS lines stays well inside a cookie.
+    """
+    if len(items) > settings.CART_TOKEN_MAX_ITEMS:
+        raise ValueError(
+            f"An anonymous cart holds at most {settings.CART_TOKEN_MAX_ITEMS} items"
+        )
+    payload = orjson.dumps(
+        [
+            _VERSION,
+            int(time.time()),
+            [[listing_id.replace("-", ""), qty] for listing_id, qty in items.items()],
+        ]
+    )
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cart(token: Optional[str]) -> Dict[str, int]:
+    """Verify a token from ``encode_cart``; a missing token is an empty cart.
+
+    Raises ValueError for tokens that are oversized, tampered with, expired
+    or malformed.
+    """
+    return decode_cart_token(token)[0]
+
+
+def decode_cart_token(token: Optional[str]) -> Tuple[Dict[str, int], int]:
+    """``decode_cart`` plus the time the token was issued (0 without one)"""
+    if not token:
+        return {}, 0
+    if len(token) > settings.CART_TOKEN_MAX_BYTES:
+        raise ValueError("Cart token is too large")
+    try:
+        payload_part, signature_part = token.split(".")
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except ValueError:
+        raise ValueError("Malformed cart token")
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("Invalid cart token")
+    try:
+        version, issued_at, lines = orjson.loads(payload)
+        if version != _VERSION:
+            raise ValueError
+        items = {}
+        for listing_hex, quantity in lines:
+            if not 0 < quantity <= settings.CART_TOKEN_MAX_QUANTITY:
+                raise ValueError
+            items[str(UUID(hex=listing_hex))] = quantity
+    except (TypeError, ValueError):
+        raise ValueError("Malformed cart token")
+    if issued_at + settings.CART_TOKEN_TTL_SECONDS < time.time():
+        raise ValueError("Cart token has expired")
+    return items, issued_at
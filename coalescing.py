@@ -0,0 +1,62 @@
+import asyncio
+from collections import defaultdict
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Tuple
+from starlette.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent identical reads.
+
+    The first caller for a key starts ``fn`` in the threadpool; callers that
+    arrive while it is running await the same result (or exception). ``fn``
+    must not use the caller's request-scoped resources (such as its
+    session): they are shared with every follower.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "executions": 0, "coalesced": 0}
+        )
+
+    async def do(self, route: str, key: Hashable, fn: Callable, *args) -> Any:
+        stats = self._stats[route]
+        stats["requests"] += 1
+
+        flight_key = (route, key)
+        flight = self._inflight.get(flight_key)
+        if flight is None:
+            stats["executions"] += 1
+            flight = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[flight_key] = flight
+            flight.add_done_callback(partial(self._land, flight_key))
+        else:
+            stats["coalesced"] += 1
+        # The call belongs to the flight, not to the caller that started it:
+        # a cancelled caller (client gone) stops waiting, the others still
+        # get the result
+        return await asyncio.shield(flight)
+
+    def _land(self, flight_key: Tuple[str, Hashable], flight: asyncio.Future) -> None:
+        if self._inflight.get(flight_key) is flight:
+            del self._inflight[flight_key]
+        # Mark as retrieved so a flight nobody waits for any more does not warn
+        if not flight.cancelled():
+            flight.exception()
+
+    def stats(self) -> dict:
+        return {
+            route: {
+                **counts,
+                "coalescing_ratio": (
+                    round(counts["coalesced"] / counts["requests"], 4)
+                    if counts["requests"]
+                    else 0.0
+                ),
+            }
+            for route, counts in self._stats.items()
+        }
+
+
+read_flights = SingleFlight()
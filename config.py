@@ -1,8 +1,99 @@
+import os
+
+
 class Settings:
     def __init__(self):
         self.SECRET_KEY = "your-super-secret-test-key"
         self.ALGORITHM = "HS256"
         self.ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+        # Listing detail response cache
+        self.LISTING_CACHE_MAX_ENTRIES = 10_000
+        self.LISTING_CACHE_MAX_BYTES = 32 * 1024 * 1024
+        self.LISTING_CACHE_TTL_SECONDS = 60
+
+        # Listing browse page cache
+        self.LISTING_BROWSE_CACHE_MAX_ENTRIES = 2_000
+        self.LISTING_BROWSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+        self.LISTING_BROWSE_CACHE_TTL_SECONDS = 30
+        self.LISTING_BROWSE_CACHE_STALE_SECONDS = 120
+
+        # Total counts for paginated endpoints (X-Total-Count)
+        self.TOTAL_COUNT_CACHE_MAX_ENTRIES = 5_000
+        self.TOTAL_COUNT_CACHE_TTL_SECONDS = 30
+        # Below this many rows a stale count is simply recounted
+        self.TOTAL_COUNT_EXACT_THRESHOLD = 10_000
+
+        # Upper bounds of the price facet buckets; the last bucket is open-ended
+        self.LISTING_FACET_PRICE_BUCKETS = (10, 25, 50, 100, 250, 500, 1000)
+
+        # Rows fetched per server-side cursor batch in catalog exports
+        self.LISTING_EXPORT_BATCH_SIZE = 1_000
+
+        # Seller catalog imports
+        self.LISTING_IMPORT_BATCH_SIZE = 1_000
+        self.LISTING_IMPORT_MAX_ERRORS = 1_000
+
+        # Response compression (brotli and zstd are used when installed)
+        self.COMPRESSION_MINIMUM_SIZE = 1_024
+        self.COMPRESSION_GZIP_LEVEL = 6
+        self.COMPRESSION_BROTLI_QUALITY = 5
+        self.COMPRESSION_ZSTD_LEVEL = 3
+
+        # In-memory category catalog: how often a worker checks the shared
+        # version stamp for changes made by other workers (0 = every request)
+        self.CATEGORY_CATALOG_RECHECK_SECONDS = 1.0
+
+        # Stock holds taken when items are added to a cart
+        self.STOCK_RESERVATIONS_ENABLED = False
+        self.STOCK_RESERVATION_TTL_SECONDS = 15 * 60
+        # Expired holds released per statement by the expiry worker
+        self.STOCK_RESERVATION_EXPIRY_BATCH_SIZE = 500
+
+        # Per-user cart summaries; dropped on cart or listing writes, the TTL
+        # bounds staleness from other buyers' holds on the same listings
+        self.CART_SUMMARY_CACHE_MAX_ENTRIES = 10_000
+        self.CART_SUMMARY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+        self.CART_SUMMARY_CACHE_TTL_SECONDS = 30
+
+        # Signed carts held by anonymous visitors (X-Cart-Token), merged into
+        # the database cart at login or checkout
+        self.CART_TOKEN_MAX_ITEMS = 50
+        self.CART_TOKEN_MAX_QUANTITY = 99
+        self.CART_TOKEN_MAX_BYTES = 4_096
+        self.CART_TOKEN_TTL_SECONDS = 7 * 24 * 3600
+
+        # Responses kept for replay to retries carrying an Idempotency-Key
+        self.IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+        self.IDEMPOTENCY_MAX_ENTRIES = 10_000
+        self.IDEMPOTENCY_MAX_BYTES = 32 * 1024 * 1024
+        self.IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+        # Queued checkout (POST /cart/checkout?mode=queued): default mode,
+        # worker threads, jobs per grouped commit and idle poll interval
+        self.CHECKOUT_DEFAULT_MODE = "sync"
+        self.CHECKOUT_QUEUE_WORKERS = 2
+        self.CHECKOUT_QUEUE_BATCH_SIZE = 50
+        self.CHECKOUT_QUEUE_POLL_SECONDS = 1.0
+        # A claimed job whose worker has not finished it within this long
+        # (crashed process) is claimed again
+        self.CHECKOUT_QUEUE_LEASE_SECONDS = 60
+
+        # Operations accepted by one PATCH /cart request
+        self.CART_BATCH_MAX_OPERATIONS = 100
+
+        # Flash-sale listings: how often ledger sales are written back to the
+        # listing rows, and how many order items per write
+        self.HOT_INVENTORY_FLUSH_INTERVAL_SECONDS = 0.5
+        self.HOT_INVENTORY_FLUSH_BATCH_SIZE = 5_000
+        # How long checkouts and a hand back wait for a listing switching
+        # in or out of hot mode
+        self.HOT_INVENTORY_SWITCH_TIMEOUT_SECONDS = 5.0
+
+        # Worker processes serving the app; uvicorn and gunicorn take their
+        # default worker count from the same variable. Hot inventory keeps
+        # per-process counters and is refused above 1.
+        self.WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+
 
 settings = Settings()
@@ -2,9 +2,10 @@ from sqlalchemy import create_engine, Column, DateTime, String
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import os
 import uuid
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./marketplace.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./marketplace.db")
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
@@ -0,0 +1,50 @@
+from typing import FrozenSet, Iterable, List, Optional, Type
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import null
+
+Fieldset = Optional[FrozenSet[str]]
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Fieldset:
+    """Validate a comma separated ?fields= value against a response model.
+
+    Returns None (every field) when the parameter is absent.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - model.model_fields.keys()
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"Unknown fields: {', '.join(sorted(unknown))}. "
+                if unknown
+                else "No fields requested. "
+            )
+            + f"Allowed: {', '.join(model.model_fields)}",
+        )
+    return frozenset(requested)
+
+
+def fieldset_key(fields: Fieldset) -> Optional[tuple]:
+    """Hashable, order independent form of a fieldset for cache keys"""
+    return None if fields is None else tuple(sorted(fields))
+
+
+def project(columns: Iterable, fields: Fieldset) -> List:
+    """SELECT list for a fieldset.
+
+    Unrequested columns become NULL placeholders under the same label, so
+    rows keep their shape while the database never reads those columns.
+    """
+    return [
+        column if fields is None or column.key in fields else null().label(column.key)
+        for column in columns
+    ]
+
+
+def dump_include(fields: Fieldset) -> Optional[dict]:
+    """``include`` argument restricting a list dump to the fieldset"""
+    return None if fields is None else {"__all__": set(fields)}
@@ -0,0 +1,216 @@
+import zlib
+from typing import Dict, Iterable, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # optional codec
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional codec
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/",
+)
+
+
+class _GzipStream:
+    def __init__(self):
+        self._obj = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so every streamed chunk reaches the client right away
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdStream:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(
+            level=settings.COMPRESSION_ZSTD_LEVEL
+        ).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def _gzip(data: bytes) -> bytes:
+    obj = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return obj.compress(data) + obj.flush()
+
+
+# Encoding -> (one-shot compressor, streaming compressor), most preferred first
+CODECS: Dict[str, tuple] = {}
+if zstandard is not None:
+    CODECS["zstd"] = (
+        lambda data: zstandard.ZstdCompressor(
+            level=settings.COMPRESSION_ZSTD_LEVEL
+        ).compress(data),
+        _ZstdStream,
+    )
+if brotli is not None:
+    CODECS["br"] = (
+        lambda data: brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY),
+        _BrotliStream,
+    )
+CODECS["gzip"] = (_gzip, _GzipStream)
+
+
+def negotiate(
+    accept_encoding: Optional[str], available: Iterable[str] = CODECS
+) -> Optional[str]:
+    """Pick the best of ``available`` for an Accept-Encoding header.
+
+    Highest q-value wins; ties go to the order of ``available``. Returns None
+    when the client accepts none of them (identity).
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def precompress(body: bytes) -> Dict[str, bytes]:
+    """Every available encoding of ``body`` that is worth sending"""
+    if len(body) < settings.COMPRESSION_MINIMUM_SIZE:
+        return {}
+    variants = {}
+    for encoding, (compress, _) in CODECS.items():
+        compressed = compress(body)
+        if len(compressed) < len(body):
+            variants[encoding] = compressed
+    return variants
+
+
+class CompressionMiddleware:
+    """Compress compressible responses in the encoding the client prefers.
+
+    Bodies below ``minimum_size`` and responses that already carry a
+    Content-Encoding (precompressed cache hits) pass through untouched.
+    Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = (
+            settings.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: Optional[str], minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.stream = None
+        self.buffer = bytearray()
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            if not is_compressible(headers.get("content-type")):
+                self.passthrough = True
+                await self._send(message)
+                return
+            if "accept-encoding" not in headers.get("vary", "").lower():
+                headers.add_vary_header("Accept-Encoding")
+            if self.encoding is None or "content-encoding" in headers:
+                self.passthrough = True
+                await self._send(message)
+                return
+            # Hold the start message until the first body chunk shows its size
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is None:
+            # Buffer until the body is known to reach minimum_size; streamed
+            # responses (including everything behind BaseHTTPMiddleware) may
+            # arrive in several small chunks
+            self.buffer += body
+            if more_body and len(self.buffer) < self.minimum_size:
+                return
+            body, self.buffer = bytes(self.buffer), bytearray()
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    await self._send(self.start)
+                    await self._send({"type": "http.response.body", "body": body})
+                    return
+                body = CODECS[self.encoding][0](body)
+                headers["Content-Encoding"] = self.encoding
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            headers["Content-Encoding"] = self.encoding
+            del headers["Content-Length"]
+            self.stream = CODECS[self.encoding][1]()
+            await self._send(self.start)
+
+        chunk = self.stream.compress(body) if body else b""
+        if not more_body:
+            chunk += self.stream.finish()
+        await self._send(
+            {"type": "http.response.body", "body": chunk, "more_body": more_body}
+        )
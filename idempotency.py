@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import re
+from typing import Dict, Hashable, List, Optional, Tuple
+import orjson
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from cache import LRUCache
+from config import settings
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+
+# Write endpoints whose retries must not run twice: checkout (the only way
+# orders are created) and the batch endpoints
+IDEMPOTENT_ROUTES = (
+    ("POST", re.compile(r"^/cart/checkout/?$")),
+    ("PATCH", re.compile(r"^/cart/?$")),
+    ("POST", re.compile(r"^/orders/[^/]+/cancel/?$")),
+    ("POST", re.compile(r"^/listings/bulk-update/?$")),
+)
+
+_FINGERPRINT_SIZE = 16
+
+
+class IdempotencyStore:
+    """Responses of completed keyed requests plus the requests in flight.
+
+    A stored response is one bytes blob (request fingerprint, status and
+    headers as JSON, body), so the LRUCache byte cap is exact. The store
+    is per process: with several workers a retry landing on another
+    worker runs again.
+    """
+
+    RUN = "run"
+    REPLAY = "replay"
+    CONFLICT = "conflict"
+
+    def __init__(self):
+        self._responses = LRUCache(
+            "idempotency",
+            max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+            max_bytes=settings.IDEMPOTENCY_MAX_BYTES,
+            ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+        )
+        self._inflight: Dict[Hashable, Tuple[bytes, asyncio.Future]] = {}
+        self.replays = 0
+        self.waits = 0
+        self.conflicts = 0
+
+    async def begin(
+        self, key: Hashable, fingerprint: bytes
+    ) -> Tuple[str, Optional[bytes]]:
+        """(RUN, None), (REPLAY, stored response) or (CONFLICT, None).
+
+        A duplicate of a request still running waits for it; if that one
+        ends without storing a response (5xx, crash), the waiter runs.
+        """
+        while True:
+            stored = self._responses.get(key)
+            if stored is not None:
+                if stored[:_FINGERPRINT_SIZE] != fingerprint:
+                    self.conflicts += 1
+                    return self.CONFLICT, None
+                self.replays += 1
+                return self.REPLAY, stored[_FINGERPRINT_SIZE:]
+            flight = self._inflight.get(key)
+            if flight is None:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = (fingerprint, future)
+                return self.RUN, None
+            if flight[0] != fingerprint:
+                self.conflicts += 1
+                return self.CONFLICT, None
+            self.waits += 1
+            await asyncio.shield(flight[1])
+
+    def finish(self, key: Hashable, response: Optional[bytes]) -> None:
+        """Store the response of a RUN (None to let the next attempt run)"""
+        fingerprint, future = self._inflight.pop(key)
+        if response is not None:
+            self._responses.set(key, fingerprint + response)
+        future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            **self._responses.stats(),
+            "in_flight": len(self._inflight),
+            "replays": self.replays,
+            "waits": self.waits,
+            "conflicts": self.conflicts,
+        }
+
+
+def _pack(status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> bytes:
+    meta = orjson.dumps([status, [[k.decode(), v.decode()] for k, v in headers]])
+    return meta + b"\n" + body
+
+
+def _unpack(stored: bytes) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    meta, body = stored.split(b"\n", 1)
+    status, headers = orjson.loads(meta)
+    return status, [(k.encode(), v.encode()) for k, v in headers], body
+
+
+def _caller(headers: Headers) -> Tuple[str, Hashable]:
+    """The token's subject, so a retry with a refreshed token still matches.
+
+    Requests without a valid bearer token fall back to their raw
+    Authorization header; the app refuses them anyway.
+    """
+    authorization = headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            claims = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+        except JWTError:
+            claims = {}
+        if claims.get("sub") is not None:
+            return "sub", claims["sub"]
+    return (
+        "authorization",
+        hashlib.blake2b(authorization.encode(), digest_size=16).digest(),
+    )
+
+
+async def _send_json(send: Send, status: int, detail: str) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Run a keyed write once and replay its response to retries.
+
+    Applies to IDEMPOTENT_ROUTES requests carrying an Idempotency-Key. Keys
+    are scoped to the caller (the token's subject), method and path; the
+    same key with a different query string or body is refused with 422.
+    Responses below 500 are kept for IDEMPOTENCY_TTL_SECONDS and replayed
+    with ``Idempotent-Replayed: true``.
+    """
+
+    def __init__(self, app: ASGIApp, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store or idempotency_store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not any(
+            scope["method"] == method and pattern.match(scope["path"])
+            for method, pattern in IDEMPOTENT_ROUTES
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(idempotency_key) <= settings.IDEMPOTENCY_KEY_MAX_LENGTH:
+            await _send_json(send, 400, "Invalid Idempotency-Key")
+            return
+
+        # The body is read up front for the fingerprint and replayed to the app
+        messages: List[Message] = []
+        digest = hashlib.blake2b(digest_size=_FINGERPRINT_SIZE)
+        # ?mode=sync and ?mode=queued are different requests
+        query = scope.get("query_string", b"")
+        digest.update(len(query).to_bytes(4, "big") + query)
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            digest.update(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        key = (
+            _caller(headers),
+            scope["method"],
+            scope["path"].rstrip("/"),
+            idempotency_key,
+        )
+
+        outcome, stored = await self.store.begin(key, digest.digest())
+        if outcome == IdempotencyStore.CONFLICT:
+            await _send_json(
+                send, 422, "Idempotency-Key was already used for a different request"
+            )
+            return
+        if outcome == IdempotencyStore.REPLAY:
+            status, response_headers, body = _unpack(stored)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status,
+                    "headers": response_headers + [(b"idempotent-replayed", b"true")],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def replay_receive() -> Message:
+            return messages.pop(0) if messages else await receive()
+
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        response = None
+        try:
+            await self.app(scope, replay_receive, capture)
+            if start is not None and start["status"] < 500:
+                response = _pack(start["status"], start["headers"], b"".join(chunks))
+        finally:
+            self.store.finish(key, response)
+
+
+idempotency_store = IdempotencyStore()
@@ -1,4 +1,5 @@
 import logging
+import os
 import sys
 from datetime import datetime
 import json
@@ -77,7 +78,7 @@ console_handler.setFormatter(CustomFormatter())
 logger.addHandler(console_handler)
 
 # File handler
-file_handler = logging.FileHandler("api.log")
+file_handler = logging.FileHandler(os.environ.get("API_LOG_FILE", "api.log"))
 file_handler.setFormatter(
     logging.Formatter(
         "%(asctime)s - %(levelname)s - %(method)s %(path)s - %(status_code)s\n"
@@ -3,15 +3,41 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from database import Base, engine
 from routers import auth
-from routes import categories, listings, cart, reviews, orders
+from routes import categories, listings, cart, reviews, orders, metrics
 from logging_config import log_request_middleware
+from responses import OrjsonResponse
+from http_compression import CompressionMiddleware
+from idempotency import IdempotencyMiddleware
 from fastapi.openapi.utils import get_openapi
+from contextlib import asynccontextmanager
+from services.checkout_queue import checkout_queue
+from services.hot_inventory import hot_inventory
+from services.reservation import reservation_expiry
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Always running, so holds left from a time reservations were enabled
+    # still lapse
+    reservation_expiry.start()
+    # Writes back sales a crashed process left pending before serving
+    hot_inventory.start()
+    # Requeues checkouts a crashed process left half done
+    checkout_queue.start()
+    yield
+    checkout_queue.stop()
+    hot_inventory.stop()
+    reservation_expiry.stop()
+
+
+app = FastAPI(default_response_class=OrjsonResponse, lifespan=lifespan)
+# Innermost, so replays are stored uncompressed and still logged
+app.add_middleware(IdempotencyMiddleware)
 app.middleware("http")(log_request_middleware)
+app.add_middleware(CompressionMiddleware)
 
 
 def custom_openapi():
@@ -76,6 +102,7 @@ app.include_router(listings.router)
 app.include_router(cart.router)
 app.include_router(reviews.router)
 app.include_router(orders.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
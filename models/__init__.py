@@ -3,6 +3,10 @@ from .roles import Role
 from .listing import Listing
 from .cart import CartItem
 from .review import Review
-from .category import Category
+from .category import Category, CategoryClosure
+from .listing_card import ListingCard
+from .catalog_version import CatalogVersion
+from .reservation import StockReservation
+from .checkout_job import CheckoutJob
 
 # This ensures all models are available when importing from models
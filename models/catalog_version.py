@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+
+class CatalogVersion(Base):
+    """Change counter for a data set that workers hold in memory.
+
+    Writers bump the row in the same transaction as their change; readers
+    compare it with the version of their snapshot to know when to reload.
+    """
+
+    __tablename__ = "catalog_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Text
+from sqlalchemy import Column, String, ForeignKey, Index, Integer, Text
 from sqlalchemy.orm import relationship
 from uuid import UUID
 from database import Base, BaseModel
@@ -10,9 +10,29 @@ class Category(Base, BaseModel):
     name = Column(String(100), nullable=False)
     description = Column(Text)
     parent_id = Column(ForeignKey("categories.id"), nullable=True)
+    # ETag source for conditional GETs, bumped by every write
+    version = Column(Integer, nullable=False, server_default="1")
 
     # Relationships
     parent = relationship(
         "Category", remote_side="Category.id", backref="subcategories"
     )
     listings = relationship("Listing", back_populates="category")
+
+
+class CategoryClosure(Base):
+    """Every ancestor/descendant pair of the category tree.
+
+    Each category also has a depth 0 row pointing at itself, so "a category
+    and everything below it" is a single lookup on ``ancestor_id``.
+    Maintained by services.category.CategoryService.
+    """
+
+    __tablename__ = "category_closure"
+    __table_args__ = (
+        Index("ix_category_closure_descendant", "descendant_id", "depth"),
+    )
+
+    ancestor_id = Column(ForeignKey("categories.id"), primary_key=True)
+    descendant_id = Column(ForeignKey("categories.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
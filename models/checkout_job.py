@@ -0,0 +1,54 @@
+from enum import Enum
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    Enum as SQLAlchemyEnum,
+)
+from database import Base, BaseModel
+
+
+class CheckoutJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    PROCESSING = "PROCESSING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class CheckoutJob(Base, BaseModel):
+    """A queued checkout of one buyer's cart.
+
+    The row is the durable queue entry: it is marked DONE in the same
+    transaction that creates its order, so a job never yields two orders.
+    A worker claims a job for a lease and only writes the result while the
+    job is still PROCESSING under its claim.
+    """
+
+    __tablename__ = "checkout_jobs"
+
+    user_id = Column(ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(
+        SQLAlchemyEnum(CheckoutJobStatus),
+        nullable=False,
+        default=CheckoutJobStatus.QUEUED,
+    )
+    order_id = Column(ForeignKey("orders.id"), nullable=True)
+    error = Column(String(500), nullable=True)
+    # Worker that is processing the job, and until when it may
+    claimed_by = Column(String(36), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_checkout_jobs_status_created", "status", "created_at"),
+        # One open job per buyer, however many requests race to enqueue
+        Index(
+            "uq_checkout_jobs_open_user",
+            "user_id",
+            unique=True,
+            sqlite_where=status.in_(
+                [CheckoutJobStatus.QUEUED, CheckoutJobStatus.PROCESSING]
+            ),
+        ),
+    )
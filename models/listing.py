@@ -1,12 +1,16 @@
 from sqlalchemy import (
+    Boolean,
     Column,
     String,
     Float,
     Integer,
     ForeignKey,
+    Index,
     Text,
+    UniqueConstraint,
     Enum as SQLAEnum,
 )
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from enum import Enum
 from database import Base, BaseModel
@@ -21,14 +25,37 @@ class ListingStatus(str, Enum):
 
 class Listing(Base, BaseModel):
     __tablename__ = "listings"
+    __table_args__ = (
+        UniqueConstraint(
+            "seller_id", "external_key", name="uq_listing_seller_external_key"
+        ),
+        # Browse pages are served in ListingService.PAGE_ORDER
+        Index("ix_listings_created_at_id", "created_at", "id"),
+    )
 
     title = Column(String(200), nullable=False)
     description = Column(Text)
     price = Column(Float, nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
+    # Units held by unexpired cart reservations (services.reservation)
+    reserved_quantity = Column(Integer, nullable=False, default=0, server_default="0")
     category_id = Column(ForeignKey("categories.id"), nullable=False)
     seller_id = Column(ForeignKey("users.id"), nullable=False)
     status = Column(SQLAEnum(ListingStatus), default=ListingStatus.ACTIVE)
+    # ETag source for conditional GETs, bumped by every write. Not a
+    # version_id_col: the guarded stock updates bump it too, and an edit
+    # must not fail because stock moved between its read and its flush.
+    version = Column(Integer, nullable=False, server_default="1")
+    # Seller-supplied identifier used to upsert catalog imports
+    external_key = Column(String(100), nullable=True)
+    # Flash-sale mode: stock is allocated from services.hot_inventory's
+    # in-memory ledger and written back in batches
+    hot_inventory = Column(Boolean, nullable=False, default=False, server_default="0")
+
+    @hybrid_property
+    def available_quantity(self):
+        """Units that can still be reserved or bought"""
+        return self.quantity - self.reserved_quantity
 
     # Relationships
     category = relationship("Category", back_populates="listings")
@@ -0,0 +1,43 @@
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    Enum as SQLAEnum,
+)
+from database import Base
+from models.listing import ListingStatus
+
+
+class ListingCard(Base):
+    """Flattened, join-free read model behind the browse page.
+
+    Rows are derived from listings, categories, users and reviews and are
+    maintained by services.listing_card.ListingCardService.
+    """
+
+    __tablename__ = "listing_cards"
+    __table_args__ = (
+        Index("ix_listing_cards_status_category", "status", "category_id"),
+        Index("ix_listing_cards_seller", "seller_id"),
+        Index("ix_listing_cards_price", "price"),
+        # Cards are served in the /listings browse order (see get_cards)
+        Index("ix_listing_cards_created_at_listing", "created_at", "listing_id"),
+    )
+
+    listing_id = Column(String(36), primary_key=True)
+    title = Column(String(200), nullable=False)
+    price = Column(Float, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(SQLAEnum(ListingStatus))
+    category_id = Column(String(36), nullable=False)
+    category_name = Column(String(100), nullable=False)
+    seller_id = Column(String(36), nullable=False)
+    # As wide as users.username in the migrated schema
+    seller_username = Column(String(50), nullable=False)
+    average_rating = Column(Float)
+    review_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
@@ -1,5 +1,14 @@
 from enum import Enum
-from sqlalchemy import Column, String, ForeignKey, Numeric, Enum as SQLAlchemyEnum
+from sqlalchemy import (
+    Boolean,
+    Column,
+    String,
+    ForeignKey,
+    Index,
+    Numeric,
+    Enum as SQLAlchemyEnum,
+    false,
+)
 from sqlalchemy.orm import relationship
 from database import Base, BaseModel
 
@@ -34,7 +43,17 @@ class OrderItem(Base, BaseModel):
     listing_id = Column(ForeignKey("listings.id"), nullable=False)
     quantity = Column(Numeric(10, 2), nullable=False)
     price_at_time = Column(Numeric(10, 2), nullable=False)
+    # False while a hot-inventory sale is not yet deducted from the listing
+    stock_applied = Column(Boolean, nullable=False, default=True, server_default="1")
 
     # Relationships
     order = relationship("Order", back_populates="items")
     listing = relationship("Listing")
+
+
+# Only the few items still waiting for write-behind are indexed
+Index(
+    "ix_order_items_stock_pending",
+    OrderItem.listing_id,
+    sqlite_where=OrderItem.stock_applied == false(),
+)
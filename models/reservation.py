@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, UniqueConstraint
+from database import Base, BaseModel
+
+
+class StockReservation(Base, BaseModel):
+    """Units of a listing held for one buyer's cart until ``expires_at``.
+
+    The held units are also counted in ``Listing.reserved_quantity``; a row
+    is deleted when its hold is checked out, released or expired.
+    """
+
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "listing_id", name="uq_reservation_user_listing"),
+    )
+
+    user_id = Column(ForeignKey("users.id"), nullable=False)
+    listing_id = Column(ForeignKey("listings.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -9,7 +9,7 @@ class Review(Base, BaseModel):
         CheckConstraint("rating >= 1 and rating <= 5", name="check_rating_range"),
     )
 
-    listing_id = Column(ForeignKey("listings.id"), nullable=False)
+    listing_id = Column(ForeignKey("listings.id"), nullable=False, index=True)
     reviewer_id = Column(ForeignKey("users.id"), nullable=False)
     rating = Column(Integer, nullable=False)
     comment = Column(Text)
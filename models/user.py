@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum as SQLAlchemyEnum
 from sqlalchemy.orm import relationship
 from database import Base, BaseModel
 from models.roles import UserRole
@@ -11,6 +11,9 @@ class User(Base, BaseModel):
     email = Column(String(254), unique=True, nullable=False)
     password = Column(String(60), nullable=False)
     role_id = Column(ForeignKey("roles.id"), nullable=False)
+    # issued_at of the last anonymous cart token merged into the cart;
+    # tokens issued up to then are spent and no longer merged
+    cart_token_merged_at = Column(Integer, nullable=True)
 
     # Relationship
     role = relationship("Role", back_populates="users")
@@ -0,0 +1,53 @@
+from decimal import Decimal
+from typing import Any, Dict, Optional
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.responses import Response
+from http_compression import negotiate
+
+
+def _default(value: Any) -> Any:
+    # Same wire format as pydantic: Decimal as a string, models in JSON mode
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """orjson encoding with native UUID, datetime, enum and dataclass support"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse encoded with orjson instead of the stdlib json module"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Already serialized JSON (cached or TypeAdapter bytes) sent unchanged"""
+
+    media_type = "application/json"
+
+    @classmethod
+    def negotiated(
+        cls,
+        request: Request,
+        body: bytes,
+        encoded: Optional[Dict[str, bytes]],
+        headers: Optional[dict] = None,
+    ) -> "RawJSONResponse":
+        """Send the precompressed variant the client accepts, if there is one"""
+        headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+        encoding = encoded and negotiate(
+            request.headers.get("accept-encoding"), encoded
+        )
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            body = encoded[encoding]
+        return cls(body, headers=headers)
@@ -1,7 +1,7 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Response
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, Optional
 from jose import JWTError, jwt
 
 from database import get_db
@@ -18,6 +18,9 @@ from services.auth import (
 
 from models.user import User
 from models.roles import Role, UserRole
+from services.cart import CartService
+from services.listing_card import ListingCardService
+from cart_token import CART_TOKEN_HEADER, decode_cart_token
 from config import settings
 
 router = APIRouter()
@@ -155,8 +158,14 @@ async def register(user: UserCreate, db: Annotated[Session, Depends(get_db)]):
 async def login(
     form_data: LoginUser,
     db: Annotated[Session, Depends(get_db)],
+    response: Response,
+    cart_token: Annotated[Optional[str], Header(alias=CART_TOKEN_HEADER)] = None,
 ):
-    """Login user and return JWT token."""
+    """Login user and return JWT token.
+
+    An anonymous cart sent as X-Cart-Token is merged into the user's cart;
+    X-Cart-Merged tells the client whether it may drop the token.
+    """
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -168,6 +177,14 @@ async def login(
         data={"sub": user.username},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
     )
+    if cart_token is not None:
+        try:
+            merged = CartService(db).merge_anonymous(
+                user.id, *decode_cart_token(cart_token)
+            )
+        except ValueError:
+            merged = False
+        response.headers["X-Cart-Merged"] = "true" if merged else "false"
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -280,6 +297,7 @@ async def delete_user(
 
     # Delete user
     db.delete(user)
+    ListingCardService(db).refresh_seller(user.id)
     db.commit()
 
     return None
@@ -1,11 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
+from cache import cart_summary_cache, cart_summary_tags
+from cart_token import CART_TOKEN_HEADER, decode_cart, decode_cart_token
 from database import get_db
-from schemas.cart import CartItemCreate, CartItemUpdate, CartItemResponse, CartSummary
+from schemas.cart import (
+    AnonymousCart,
+    CartBatch,
+    CartItemCreate,
+    CartItemUpdate,
+    CartItemResponse,
+    CartSummary,
+    CheckoutJobResponse,
+    CheckoutMode,
+)
 from services.cart import CartService
+from services.checkout_queue import CheckoutQueueService, checkout_queue
+from services.hot_inventory import ListingSwitching
+from schemas.order import OrderResponse
 from services.auth import get_current_user
+from models.user import User
+from responses import OrjsonResponse, RawJSONResponse
+from config import settings
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
@@ -16,29 +34,37 @@ router = APIRouter(prefix="/cart", tags=["Cart"])
 async def add_to_cart(
     item: CartItemCreate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    current_user: User = Depends(get_current_user),
 ):
     """Add an item to the user's cart"""
     try:
-        return CartService(db).add_to_cart(current_user["id"], item)
+        return CartService(db).add_to_cart(current_user.id, item)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/items", response_model=List[CartItemResponse])
 async def get_cart_items(
-    db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
     """Get all items in the user's cart"""
-    return CartService(db).get_cart_items(current_user["id"])
+    return CartService(db).get_cart_items(current_user.id)
 
 
 @router.get("/summary", response_model=CartSummary)
 async def get_cart_summary(
-    db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
-    """Get a summary of the cart including total price"""
-    return CartService(db).get_cart_summary(current_user["id"])
+    """Cart lines against live prices and stock, with totals"""
+    key = str(current_user.id)
+    body = cart_summary_cache.get(key)
+    if body is None:
+        generation = cart_summary_cache.generation()
+        summary = CartService(db).get_cart_summary(key)
+        body = summary.model_dump_json().encode()
+        tags = cart_summary_tags(key, (str(item.listing_id) for item in summary.items))
+        cart_summary_cache.set(key, body, generation, tags=tags)
+    return RawJSONResponse(body)
 
 
 @router.put("/items/{item_id}", response_model=CartItemResponse)
@@ -46,12 +72,12 @@ async def update_cart_item(
     item_id: UUID,
     item: CartItemUpdate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    current_user: User = Depends(get_current_user),
 ):
     """Update quantity of an item in the cart"""
     try:
         updated_item = CartService(db).update_cart_item(
-            current_user["id"], item_id, item.quantity
+            current_user.id, item_id, item.quantity
         )
         if not updated_item:
             raise HTTPException(status_code=404, detail="Cart item not found")
@@ -64,27 +90,138 @@ async def update_cart_item(
 async def remove_from_cart(
     item_id: UUID,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    current_user: User = Depends(get_current_user),
 ):
     """Remove an item from the cart"""
-    if not CartService(db).remove_from_cart(current_user["id"], item_id):
+    if not CartService(db).remove_from_cart(current_user.id, item_id):
         raise HTTPException(status_code=404, detail="Cart item not found")
 
 
+@router.patch("", response_model=CartSummary)
+async def update_cart(
+    batch: CartBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Apply a batch of add, update and remove operations in one transaction"""
+    try:
+        return CartService(db).apply_operations(current_user.id, batch.operations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.delete("/clear", status_code=status.HTTP_204_NO_CONTENT)
 async def clear_cart(
-    db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
     """Clear all items from the cart"""
-    CartService(db).clear_cart(current_user["id"])
+    CartService(db).clear_cart(current_user.id)
 
 
-@router.post("/checkout", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/checkout",
+    response_model=OrderResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={202: {"model": CheckoutJobResponse}},
+)
 async def checkout(
-    db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)
+    mode: Optional[CheckoutMode] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    cart_token: Optional[str] = Header(None, alias=CART_TOKEN_HEADER),
+):
+    """Process checkout for all items in the cart.
+
+    An anonymous cart sent as X-Cart-Token is merged in first. With
+    ``mode=queued`` the cart is only checked and queued: the response is
+    202 with the job's status URL, and a worker creates the order.
+    """
+    mode = mode or CheckoutMode(settings.CHECKOUT_DEFAULT_MODE)
+    try:
+        service = CartService(db)
+        service.merge_anonymous(
+            current_user.id, *decode_cart_token(cart_token), strict=True
+        )
+        if mode == CheckoutMode.QUEUED:
+            job = CheckoutQueueService(db).enqueue(current_user.id)
+            checkout_queue.notify()
+            body = CheckoutJobResponse.from_job(job)
+            return OrjsonResponse(
+                body,
+                status_code=status.HTTP_202_ACCEPTED,
+                headers={"Location": body.status_url},
+            )
+        # Off the event loop: a hot listing being switched is waited for
+        return await run_in_threadpool(service.process_checkout, current_user.id)
+    except ListingSwitching as e:
+        # 503 is not stored by the idempotency layer, so a keyed retry runs
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/checkout/jobs/{job_id}", response_model=CheckoutJobResponse)
+async def get_checkout_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Status of a queued checkout, with the order URL once it is DONE"""
+    job = CheckoutQueueService(db).get_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Checkout job not found")
+    return CheckoutJobResponse.from_job(job)
+
+
+def anonymous_items(
+    cart_token: Optional[str] = Header(None, alias=CART_TOKEN_HEADER),
+) -> dict:
+    """Dependency that verifies the X-Cart-Token of an anonymous visitor"""
+    try:
+        return decode_cart(cart_token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/anonymous", response_model=AnonymousCart)
+async def get_anonymous_cart(
+    items: dict = Depends(anonymous_items), db: Session = Depends(get_db)
+):
+    """Price the signed cart of a visitor who is not logged in"""
+    return CartService(db).anonymous_cart(items)
+
+
+@router.put("/anonymous/items/{listing_id}", response_model=AnonymousCart)
+async def set_anonymous_item(
+    listing_id: UUID,
+    item: CartItemUpdate,
+    items: dict = Depends(anonymous_items),
+    db: Session = Depends(get_db),
 ):
-    """Process checkout for all items in the cart"""
+    """Set an item of a visitor's signed cart; returns the reissued token.
+
+    Nothing is written to the database until the cart is merged at login
+    or checkout.
+    """
+    service = CartService(db)
     try:
-        return CartService(db).process_checkout(current_user["id"])
+        return service.anonymous_cart(
+            service.set_anonymous_item(items, listing_id, item.quantity)
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/anonymous/items/{listing_id}", response_model=AnonymousCart)
+async def remove_anonymous_item(
+    listing_id: UUID,
+    items: dict = Depends(anonymous_items),
+    db: Session = Depends(get_db),
+):
+    """Remove an item from a visitor's signed cart"""
+    items.pop(str(listing_id), None)
+    return CartService(db).anonymous_cart(items)
@@ -1,11 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
 from database import get_db
-from schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
-from services.category import CategoryService
+from schemas.category import (
+    CategoryCreate,
+    CategoryResponse,
+    CategoryTreeNode,
+    CategoryUpdate,
+)
+from services.category import CategoryService, category_catalog
 from services.auth import get_current_user, check_admin_role
+from http_cache import (
+    collection_etag,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    set_validators,
+    validator_headers,
+)
+from responses import RawJSONResponse
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
@@ -21,17 +35,69 @@ async def create_category(
 
 @router.get("/", response_model=List[CategoryResponse])
 async def get_categories(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
+    page = category_catalog.current(db).page(skip=skip, limit=limit)
+    if is_not_modified(request, page.etag, page.last_modified):
+        return not_modified(page.etag, page.last_modified)
+    return RawJSONResponse(
+        page.body, headers=validator_headers(page.etag, page.last_modified)
+    )
+
+
+@router.get("/tree", response_model=List[CategoryTreeNode])
+async def get_category_tree(
+    request: Request,
+    response: Response,
+    root_id: Optional[UUID] = None,
+    db: Session = Depends(get_db),
 ):
-    return CategoryService(db).get_categories(skip=skip, limit=limit)
+    """Nested category hierarchy, optionally only the subtree under root_id"""
+    if root_id is None:
+        tree = category_catalog.current(db).tree
+        if is_not_modified(request, tree.etag, tree.last_modified):
+            return not_modified(tree.etag, tree.last_modified)
+        return RawJSONResponse.negotiated(
+            request,
+            tree.body,
+            tree.encoded,
+            headers=validator_headers(tree.etag, tree.last_modified),
+        )
+
+    service = CategoryService(db)
+    etag, last_modified = collection_etag(service.get_tree_validators())
+    etag = make_etag("tree", root_id, etag)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    tree = service.get_tree(root_id)
+    if not tree:
+        raise HTTPException(status_code=404, detail="Category not found")
+    set_validators(response, etag, last_modified)
+    return tree
 
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-async def get_category(category_id: UUID, db: Session = Depends(get_db)):
-    category = CategoryService(db).get_category(category_id)
-    if not category:
+async def get_category(
+    category_id: UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    cached = category_catalog.current(db).get(category_id)
+    if cached is None:
+        # Possibly created by another worker since our last version check
+        cached = category_catalog.current(db, recheck=True).get(category_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Category not found")
-    return category
+
+    if is_not_modified(request, cached.etag, cached.last_modified):
+        return not_modified(cached.etag, cached.last_modified)
+    return RawJSONResponse(
+        cached.body, headers=validator_headers(cached.etag, cached.last_modified)
+    )
 
 
 @router.put("/{category_id}", response_model=CategoryResponse)
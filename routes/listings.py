@@ -1,12 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    File,
+    HTTPException,
+    Request,
+    UploadFile,
+    status,
+    Query,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+import csv
+import io
+import json
+from enum import Enum
 from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
-from database import get_db
-from schemas.listing import ListingCreate, ListingUpdate, ListingResponse
+from config import settings
+from database import SessionLocal, get_db
+from schemas.listing import (
+    HotInventoryState,
+    ListingBulkUpdate,
+    ListingBulkUpdateResult,
+    ListingCardResponse,
+    ListingCreate,
+    ListingFacets,
+    ListingImportResult,
+    ListingResponse,
+    ListingRow,
+    ListingUpdate,
+)
 from services.listing import ListingService
-from services.auth import get_current_user, check_seller_role
+from services.listing_card import ListingCardService
+from services.listing_import import ListingImportService
+from services.auth import check_admin_role, get_current_user, check_seller_role
+from services.hot_inventory import hot_inventory
 from models.listing import ListingStatus
+from models.user import User
+from models.roles import UserRole
+from http_cache import (
+    collection_etag,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    total_count_headers,
+    validator_headers,
+)
+from coalescing import read_flights
+from responses import RawJSONResponse
+from http_compression import precompress
+from fieldsets import dump_include, fieldset_key, parse_fields
+from cache import (
+    CachedResponse,
+    TaggedCache,
+    browse_page_tags,
+    get_total_count,
+    listing_browse_cache,
+    listing_detail_cache,
+)
 
 router = APIRouter(prefix="/listings", tags=["Listings"])
 
@@ -15,13 +69,56 @@ router = APIRouter(prefix="/listings", tags=["Listings"])
 async def create_listing(
     listing: ListingCreate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(check_seller_role),
+    current_user: User = Depends(check_seller_role),
 ):
-    return ListingService(db).create_listing(listing, current_user["id"])
+    return ListingService(db).create_listing(listing, current_user.id)
+
+
+_listing_rows_adapter = TypeAdapter(List[ListingRow])
+
+
+def _build_browse_page(db: Session, skip: int, limit: int, filters: dict, fields=None):
+    rows = ListingService(db).get_listing_rows(
+        skip=skip, limit=limit, fields=fields, **filters
+    )
+    etag, last_modified = collection_etag(
+        (row.id, row.version, row.updated_at) for row in rows
+    )
+    body = _listing_rows_adapter.dump_json(
+        [ListingRow.from_row(row) for row in rows], include=dump_include(fields)
+    )
+    return CachedResponse(
+        body=body,
+        etag=etag,
+        last_modified=last_modified,
+        encoded=precompress(body),
+    )
+
+
+def _refresh_browse_page(cache_key, skip: int, limit: int, filters: dict, fields=None):
+    """Background revalidation of a stale browse page"""
+    generation = listing_browse_cache.generation()
+    db = SessionLocal()
+    try:
+        page = _build_browse_page(db, skip, limit, filters, fields)
+    finally:
+        db.close()
+    listing_browse_cache.set(
+        cache_key,
+        page,
+        generation,
+        tags=browse_page_tags(
+            filters.get("category_id"),
+            filters.get("seller_id"),
+            filters.get("include_descendants", False),
+        ),
+    )
 
 
 @router.get("/", response_model=List[ListingResponse])
 async def get_listings(
+    request: Request,
+    background_tasks: BackgroundTasks,
     skip: int = 0,
     limit: int = 100,
     category_id: Optional[UUID] = None,
@@ -30,9 +127,224 @@ async def get_listings(
     status: Optional[ListingStatus] = None,
     seller_id: Optional[UUID] = None,
     search: Optional[str] = None,
+    include_descendants: bool = False,
+    fields: Optional[str] = Query(
+        None, description="Comma separated response fields to return"
+    ),
     db: Session = Depends(get_db),
 ):
-    return ListingService(db).get_listings(
+    fieldset = parse_fields(fields, ListingResponse)
+    filters = ListingService.normalize_filters(
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        status=status,
+        seller_id=seller_id,
+        search=search,
+        include_descendants=include_descendants,
+    )
+    cache_key = (
+        "browse",
+        skip,
+        limit,
+        tuple(sorted(filters.items())),
+        fieldset_key(fieldset),
+    )
+    cached, state = listing_browse_cache.lookup(cache_key)
+    if state == TaggedCache.STALE and listing_browse_cache.claim_refresh(cache_key):
+        background_tasks.add_task(
+            _refresh_browse_page, cache_key, skip, limit, filters, fieldset
+        )
+
+    if cached is None:
+        generation = listing_browse_cache.generation()
+        service = ListingService(db)
+        etag, last_modified = collection_etag(
+            service.get_listings_validators(skip=skip, limit=limit, **filters)
+        )
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        cached = _build_browse_page(db, skip, limit, filters, fieldset)
+        listing_browse_cache.set(
+            cache_key,
+            cached,
+            generation,
+            tags=browse_page_tags(category_id, seller_id, include_descendants),
+        )
+    elif is_not_modified(request, cached.etag, cached.last_modified):
+        return not_modified(cached.etag, cached.last_modified)
+
+    total, exact = get_total_count(
+        ("listings", cache_key[3]),
+        browse_page_tags(category_id, seller_id, include_descendants),
+        lambda: ListingService(db).count_listings(**filters),
+    )
+    return RawJSONResponse.negotiated(
+        request,
+        cached.body,
+        cached.encoded,
+        headers={
+            **validator_headers(cached.etag, cached.last_modified),
+            **total_count_headers(total, exact),
+        },
+    )
+
+
+def _load_listing_detail(listing_id: UUID) -> CachedResponse:
+    """Coalesced cache fill; runs on its own session, shared by every waiter"""
+    generation = listing_detail_cache.generation()
+    db = SessionLocal()
+    try:
+        listing = ListingService(db).get_listing_by_id(listing_id)
+        if not listing:
+            raise HTTPException(status_code=404, detail="Listing not found")
+        body = ListingResponse.model_validate(listing).model_dump_json().encode()
+        version, updated_at = listing.version, listing.updated_at
+    finally:
+        db.close()
+
+    cached = CachedResponse(
+        body=body,
+        etag=make_etag("listing", listing_id, version),
+        last_modified=updated_at,
+        encoded=precompress(body),
+    )
+    listing_detail_cache.set(str(listing_id), cached, generation)
+    return cached
+
+
+class CatalogFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+_CATALOG_MEDIA_TYPES = {
+    CatalogFormat.NDJSON: "application/x-ndjson",
+    CatalogFormat.CSV: "text/csv",
+}
+
+
+def _export_record(row) -> dict:
+    record = row._asdict()
+    record["price"] = f"{record['price']:.2f}"
+    record["status"] = record["status"].value if record["status"] else None
+    for key in ("created_at", "updated_at"):
+        if record[key] is not None:
+            record[key] = record[key].isoformat()
+    return record
+
+
+def _export_chunks(export_format: CatalogFormat, filters: dict):
+    """Encode listings batch by batch; each yielded chunk is one cursor batch"""
+    db = SessionLocal()
+    try:
+        batches = ListingService(db).iter_listing_batches(
+            settings.LISTING_EXPORT_BATCH_SIZE, **filters
+        )
+        if export_format == CatalogFormat.NDJSON:
+            for batch in batches:
+                yield "".join(
+                    json.dumps(_export_record(row), separators=(",", ":")) + "\n"
+                    for row in batch
+                )
+        else:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow([column.key for column in ListingService.EXPORT_COLUMNS])
+            for batch in batches:
+                writer.writerows(_export_record(row).values() for row in batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+@router.get("/export")
+async def export_listings(
+    format: CatalogFormat = CatalogFormat.NDJSON,
+    category_id: Optional[UUID] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    status: Optional[ListingStatus] = None,
+    seller_id: Optional[UUID] = None,
+    search: Optional[str] = None,
+    include_descendants: bool = False,
+):
+    """Stream every listing matching the browse filters as NDJSON or CSV"""
+    filters = ListingService.normalize_filters(
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        status=status,
+        seller_id=seller_id,
+        search=search,
+        include_descendants=include_descendants,
+    )
+    return StreamingResponse(
+        _export_chunks(format, filters),
+        media_type=_CATALOG_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="listings.{format.value}"'
+        },
+    )
+
+
+@router.get("/facets", response_model=ListingFacets)
+async def get_listing_facets(
+    category_id: Optional[UUID] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    status: Optional[ListingStatus] = None,
+    seller_id: Optional[UUID] = None,
+    search: Optional[str] = None,
+    include_descendants: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Counts per category, status and price bucket for the browse filters"""
+    filters = ListingService.normalize_filters(
+        category_id=category_id,
+        min_price=min_price,
+        max_price=max_price,
+        status=status,
+        seller_id=seller_id,
+        search=search,
+        include_descendants=include_descendants,
+    )
+    cache_key = ("facets", tuple(sorted(filters.items())))
+    body, state = listing_browse_cache.lookup(cache_key)
+    if state != TaggedCache.FRESH:
+        generation = listing_browse_cache.generation()
+        body = ListingService(db).get_facets(**filters).model_dump_json().encode()
+        listing_browse_cache.set(
+            cache_key,
+            body,
+            generation,
+            tags=browse_page_tags(category_id, seller_id, include_descendants),
+        )
+    return RawJSONResponse(body)
+
+
+@router.get("/cards", response_model=List[ListingCardResponse])
+async def get_listing_cards(
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[UUID] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    status: Optional[ListingStatus] = None,
+    seller_id: Optional[UUID] = None,
+    search: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Browse cards served from the listing_cards read model (no joins).
+
+    ``search`` matches titles only, as cards do not carry descriptions.
+    """
+    return ListingCardService(db).get_cards(
         skip=skip,
         limit=limit,
         category_id=category_id,
@@ -44,12 +356,122 @@ async def get_listings(
     )
 
 
+@router.post("/import", response_model=ListingImportResult)
+async def import_listings(
+    file: UploadFile = File(...),
+    format: Optional[CatalogFormat] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(check_seller_role),
+):
+    """Create or update the seller's listings from a CSV or JSONL catalog.
+
+    Rows are matched on ``external_key``; the result reports per-batch
+    progress and per-row validation errors.
+    """
+    if format is None:
+        filename = (file.filename or "").lower()
+        format = (
+            CatalogFormat.CSV if filename.endswith(".csv") else CatalogFormat.NDJSON
+        )
+    return await run_in_threadpool(
+        ListingImportService(db).import_file, file.file, format.value, current_user.id
+    )
+
+
+@router.post("/bulk-update", response_model=ListingBulkUpdateResult)
+async def bulk_update_listings(
+    bulk_update: ListingBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Change status or price of every listing matching the filter at once.
+
+    Sellers are limited to their own listings; admins may target any seller.
+    """
+    seller_id = bulk_update.filter.seller_id
+    if current_user.role.name == UserRole.SELLER:
+        if seller_id and str(seller_id) != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Sellers can only update their own listings",
+            )
+        seller_id = current_user.id
+    elif current_user.role.name != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only sellers and admins can access this endpoint",
+        )
+
+    affected = ListingService(db).bulk_update(
+        bulk_update.operation,
+        seller_id=seller_id,
+        category_id=bulk_update.filter.category_id,
+        current_status=bulk_update.filter.status,
+        new_status=bulk_update.status,
+        amount=bulk_update.amount,
+        all_listings=bulk_update.filter.all,
+    )
+    return ListingBulkUpdateResult(affected=affected)
+
+
 @router.get("/{listing_id}", response_model=ListingResponse)
-async def get_listing(listing_id: UUID, db: Session = Depends(get_db)):
-    listing = ListingService(db).get_listing(listing_id)
-    if not listing:
+async def get_listing(
+    listing_id: UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    cache_key = str(listing_id)
+    cached = listing_detail_cache.get(cache_key)
+    if cached is None:
+        if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+            # Revalidation on a cold cache: the version alone decides a 304
+            validator = ListingService(db).get_listing_validator(listing_id)
+            if not validator:
+                raise HTTPException(status_code=404, detail="Listing not found")
+            etag = make_etag("listing", listing_id, validator[0])
+            if is_not_modified(request, etag, validator[1]):
+                return not_modified(etag, validator[1])
+        cached = await read_flights.do(
+            "GET /listings/{listing_id}",
+            cache_key,
+            _load_listing_detail,
+            listing_id,
+        )
+    if is_not_modified(request, cached.etag, cached.last_modified):
+        return not_modified(cached.etag, cached.last_modified)
+
+    return RawJSONResponse.negotiated(
+        request,
+        cached.body,
+        cached.encoded,
+        headers=validator_headers(cached.etag, cached.last_modified),
+    )
+
+
+@router.put("/{listing_id}/hot-inventory", response_model=HotInventoryState)
+async def set_hot_inventory(
+    listing_id: UUID,
+    enabled: bool,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(check_admin_role),
+):
+    """Switch flash-sale mode: stock sold from an in-memory ledger.
+
+    Only available when the app runs as a single worker process.
+    """
+    if enabled and settings.WEB_CONCURRENCY > 1:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Hot inventory needs the app to run as a single worker process",
+        )
+    toggle = hot_inventory.enable if enabled else hot_inventory.disable
+    if not await run_in_threadpool(toggle, db, str(listing_id)):
         raise HTTPException(status_code=404, detail="Listing not found")
-    return listing
+    return HotInventoryState(
+        listing_id=listing_id,
+        hot_inventory=enabled,
+        available=hot_inventory.available(listing_id),
+    )
 
 
 @router.put("/{listing_id}", response_model=ListingResponse)
@@ -57,10 +479,10 @@ async def update_listing(
     listing_id: UUID,
     listing: ListingUpdate,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    current_user: User = Depends(get_current_user),
 ):
     updated_listing = ListingService(db).update_listing(
-        listing_id, listing, current_user["id"]
+        listing_id, listing, current_user.id
     )
     if not updated_listing:
         raise HTTPException(status_code=404, detail="Listing not found")
@@ -71,7 +493,7 @@ async def update_listing(
 async def delete_listing(
     listing_id: UUID,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    current_user: User = Depends(get_current_user),
 ):
-    if not ListingService(db).delete_listing(listing_id, current_user["id"]):
+    if not ListingService(db).delete_listing(listing_id, current_user.id):
         raise HTTPException(status_code=404, detail="Listing not found")
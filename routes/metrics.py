@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from cache import cache_stats
+from coalescing import read_flights
+from idempotency import idempotency_store
+from services.checkout_queue import checkout_queue
+from services.hot_inventory import hot_inventory
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """Hit ratio, size and eviction counters for the in-process response caches"""
+    return cache_stats()
+
+
+@router.get("/coalescing")
+async def get_coalescing_metrics():
+    """Per-route counts of reads that shared another request's in-flight query"""
+    return read_flights.stats()
+
+
+@router.get("/hot-inventory")
+async def get_hot_inventory_metrics():
+    """Flash-sale ledger: hot listings, units allocated and units written back"""
+    return hot_inventory.stats()
+
+
+@router.get("/idempotency")
+async def get_idempotency_metrics():
+    """Stored responses, replays, waits on in-flight duplicates and key conflicts"""
+    return idempotency_store.stats()
+
+
+@router.get("/checkout-queue")
+async def get_checkout_queue_metrics():
+    """Queued checkout workers: batches committed, jobs done and failed"""
+    return checkout_queue.stats()
@@ -1,24 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import TypeAdapter
+from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
 from database import get_db
-from schemas.order import OrderResponse, OrderCreate
+from schemas.order import OrderResponse, OrderCreate, OrderRow
+from models.order import OrderStatus
 from services.order import OrderService
 from services.auth import get_current_user, check_admin_role
+from cache import get_total_count, orders_tag
+from http_cache import total_count_headers
+from fieldsets import dump_include, parse_fields
+from responses import RawJSONResponse
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+_order_rows_adapter = TypeAdapter(List[OrderRow])
+
 
 @router.get("/", response_model=List[OrderResponse])
 async def get_user_orders(
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[str] = Query(
+        None, description="Comma separated response fields to return"
+    ),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
     """Get all orders for the current user"""
-    return OrderService(db).get_user_orders(current_user["id"], skip, limit)
+    fieldset = parse_fields(fields, OrderResponse)
+    service = OrderService(db)
+    total, exact = get_total_count(
+        ("orders", current_user.id),
+        (orders_tag(current_user.id),),
+        lambda: service.count_orders(buyer_id=current_user.id),
+    )
+    rows = service.get_order_rows(
+        skip, limit, buyer_id=current_user.id, fields=fieldset
+    )
+    return RawJSONResponse(
+        _order_rows_adapter.dump_json(rows, include=dump_include(fieldset)),
+        headers=total_count_headers(total, exact),
+    )
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
@@ -28,7 +52,7 @@ async def get_order(
     current_user: dict = Depends(get_current_user),
 ):
     """Get specific order details"""
-    order = OrderService(db).get_order(order_id, current_user["id"])
+    order = OrderService(db).get_order_by_id(order_id, current_user.id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
@@ -41,19 +65,35 @@ async def cancel_order(
     current_user: dict = Depends(get_current_user),
 ):
     """Cancel an order"""
-    try:
-        return OrderService(db).cancel_order(order_id, current_user["id"])
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    order = OrderService(db).cancel_order(order_id, current_user.id)
+    if not order:
+        raise HTTPException(
+            status_code=400, detail="Order not found or no longer pending"
+        )
+    return order
 
 
 @router.get("/admin/all", response_model=List[OrderResponse])
 async def get_all_orders(
     skip: int = 0,
     limit: int = 100,
-    status: str = None,
+    status: OrderStatus = None,
+    fields: Optional[str] = Query(
+        None, description="Comma separated response fields to return"
+    ),
     db: Session = Depends(get_db),
     current_user: dict = Depends(check_admin_role),
 ):
     """Admin endpoint to get all orders"""
-    return OrderService(db).get_all_orders(skip, limit, status)
+    fieldset = parse_fields(fields, OrderResponse)
+    service = OrderService(db)
+    total, exact = get_total_count(
+        ("orders", None, status),
+        (orders_tag(),),
+        lambda: service.count_orders(status=status),
+    )
+    rows = service.get_order_rows(skip, limit, status=status, fields=fieldset)
+    return RawJSONResponse(
+        _order_rows_adapter.dump_json(rows, include=dump_include(fieldset)),
+        headers=total_count_headers(total, exact),
+    )
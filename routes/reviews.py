@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import TypeAdapter
+from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
-from database import get_db
-from schemas.review import ReviewCreate, ReviewUpdate, ReviewResponse
+from database import SessionLocal, get_db
+from schemas.review import ReviewCreate, ReviewRow, ReviewUpdate, ReviewResponse
 from services.review import ReviewService
 from services.auth import get_current_user
+from coalescing import read_flights
+from responses import RawJSONResponse
+from fieldsets import dump_include, fieldset_key, parse_fields
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
@@ -23,12 +27,42 @@ async def create_review(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+_review_rows_adapter = TypeAdapter(List[ReviewRow])
+
+
+def _load_listing_reviews(listing_id: UUID, skip: int, limit: int, fields=None):
+    """Coalesced read; runs on its own session, shared by every waiter"""
+    db = SessionLocal()
+    try:
+        rows = ReviewService(db).get_listing_review_rows(
+            listing_id, skip, limit, fields
+        )
+    finally:
+        db.close()
+    return _review_rows_adapter.dump_json(rows, include=dump_include(fields))
+
+
 @router.get("/listing/{listing_id}", response_model=List[ReviewResponse])
 async def get_listing_reviews(
-    listing_id: UUID, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    listing_id: UUID,
+    skip: int = 0,
+    limit: int = 100,
+    fields: Optional[str] = Query(
+        None, description="Comma separated response fields to return"
+    ),
 ):
     """Get all reviews for a specific listing"""
-    return ReviewService(db).get_listing_reviews(listing_id, skip, limit)
+    fieldset = parse_fields(fields, ReviewResponse)
+    body = await read_flights.do(
+        "GET /reviews/listing/{listing_id}",
+        (str(listing_id), skip, limit, fieldset_key(fieldset)),
+        _load_listing_reviews,
+        listing_id,
+        skip,
+        limit,
+        fieldset,
+    )
+    return RawJSONResponse(body)
 
 
 @router.put("/{review_id}", response_model=ReviewResponse)
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, Field, model_validator
+from enum import Enum
+from typing import List, Optional
 from uuid import UUID
 from decimal import Decimal
+from models.checkout_job import CheckoutJobStatus
 
 
 class CartItemBase(BaseModel):
@@ -25,6 +27,91 @@ class CartItemResponse(CartItemBase):
         from_attributes = True
 
 
+class CartSummaryItem(CartItemResponse):
+    title: Optional[str] = None
+    # None once the listing is deleted
+    current_price: Optional[Decimal] = None
+    price_change: Decimal
+    subtotal: Decimal
+    out_of_stock: bool
+
+
 class CartSummary(BaseModel):
-    items: List[CartItemResponse]
+    items: List[CartSummaryItem]
+    # At the prices checkout charges (price_at_add)
     total: Decimal
+    # At today's listing prices
+    current_total: Decimal
+    out_of_stock_items: int
+
+
+class CartOperationType(str, Enum):
+    ADD = "add"
+    UPDATE = "update"
+    REMOVE = "remove"
+
+
+class CartOperation(BaseModel):
+    op: CartOperationType
+    # add takes listing_id; update and remove take the cart item_id
+    listing_id: Optional[UUID] = None
+    item_id: Optional[UUID] = None
+    quantity: Optional[int] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def validate_operation(self):
+        if self.op == CartOperationType.ADD:
+            if self.listing_id is None or self.quantity is None:
+                raise ValueError(
+                    "Fields 'listing_id' and 'quantity' are required for add"
+                )
+        elif self.item_id is None:
+            raise ValueError(f"Field 'item_id' is required for {self.op.value}")
+        elif self.op == CartOperationType.UPDATE and self.quantity is None:
+            raise ValueError("Field 'quantity' is required for update")
+        return self
+
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1)
+
+
+class AnonymousCartItem(BaseModel):
+    listing_id: UUID
+    quantity: int
+    title: str
+    price: Decimal
+    out_of_stock: bool
+
+
+class AnonymousCart(BaseModel):
+    # Send back as X-Cart-Token on the next request
+    token: str
+    items: List[AnonymousCartItem]
+    total: Decimal
+
+
+class CheckoutMode(str, Enum):
+    SYNC = "sync"
+    QUEUED = "queued"
+
+
+class CheckoutJobResponse(BaseModel):
+    id: UUID
+    status: CheckoutJobStatus
+    order_id: Optional[UUID] = None
+    error: Optional[str] = None
+    # Poll this until status is DONE or FAILED
+    status_url: str
+    order_url: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job) -> "CheckoutJobResponse":
+        return cls(
+            id=job.id,
+            status=job.status,
+            order_id=job.order_id,
+            error=job.error,
+            status_url=f"/cart/checkout/jobs/{job.id}",
+            order_url=job.order_id and f"/orders/{job.order_id}",
+        )
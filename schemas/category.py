@@ -1,11 +1,12 @@
 from pydantic import BaseModel
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
 
 
 class CategoryBase(BaseModel):
     name: str
     description: Optional[str] = None
+    parent_id: Optional[UUID] = None
 
 
 class CategoryCreate(CategoryBase):
@@ -21,3 +22,7 @@ class CategoryResponse(CategoryBase):
 
     class Config:
         from_attributes = True
+
+
+class CategoryTreeNode(CategoryResponse):
+    children: List["CategoryTreeNode"] = []
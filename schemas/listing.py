@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field, validator
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator, validator
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional
 from uuid import UUID
 from decimal import Decimal
 from models.listing import ListingStatus
@@ -37,3 +39,159 @@ class ListingResponse(ListingBase):
 
     class Config:
         from_attributes = True
+
+
+@dataclass(slots=True)
+class ListingRow:
+    """Column projection of ListingResponse for list endpoints.
+
+    Built straight from a result row and dumped through a TypeAdapter, so it
+    skips ORM identity tracking and pydantic validation. Field order matches
+    ListingResponse, which keeps the JSON byte-identical. Columns left out
+    of a sparse fieldset arrive as None and are excluded from the dump.
+    """
+
+    title: str
+    description: Optional[str]
+    price: Decimal
+    quantity: int
+    category_id: str
+    status: Optional[ListingStatus]
+    id: str
+    seller_id: str
+
+    @classmethod
+    def from_row(cls, row) -> "ListingRow":
+        return cls(
+            row.title,
+            row.description,
+            None if row.price is None else round(Decimal(str(row.price)), 2),
+            row.quantity,
+            row.category_id,
+            row.status,
+            row.id,
+            row.seller_id,
+        )
+
+
+class ListingImportRow(ListingCreate):
+    external_key: str = Field(..., min_length=1, max_length=100)
+
+    @validator("status", pre=True)
+    def default_status(cls, v):
+        # An explicit null in a catalog row means "not provided", as an
+        # empty CSV cell does
+        return ListingStatus.ACTIVE if v is None else v
+
+
+class ListingImportError(BaseModel):
+    row: int
+    external_key: Optional[str] = None
+    detail: str
+
+
+class ListingImportBatch(BaseModel):
+    batch: int
+    rows: int
+    created: int
+    updated: int
+    failed: int
+
+
+class ListingImportResult(BaseModel):
+    processed: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ListingImportError] = []
+    batches: List[ListingImportBatch] = []
+
+
+class ListingCardResponse(BaseModel):
+    listing_id: UUID
+    title: str
+    price: Decimal
+    quantity: int
+    status: Optional[ListingStatus] = None
+    category_id: UUID
+    category_name: str
+    seller_id: UUID
+    seller_username: str
+    average_rating: Optional[float] = None
+    review_count: int
+
+    class Config:
+        from_attributes = True
+
+    @validator("price")
+    def validate_price(cls, v):
+        return round(v, 2)
+
+
+class CategoryFacet(BaseModel):
+    category_id: UUID
+    count: int
+
+
+class PriceBucketFacet(BaseModel):
+    min: Decimal
+    max: Optional[Decimal] = None
+    count: int
+
+
+class ListingFacets(BaseModel):
+    total: int
+    categories: List[CategoryFacet]
+    statuses: Dict[ListingStatus, int]
+    price_buckets: List[PriceBucketFacet]
+
+
+class ListingBulkFilter(BaseModel):
+    seller_id: Optional[UUID] = None
+    category_id: Optional[UUID] = None
+    status: Optional[ListingStatus] = None
+    # Required to update every listing in scope when no filter is set
+    all: bool = False
+
+    @model_validator(mode="after")
+    def validate_scope(self):
+        if not (self.seller_id or self.category_id or self.status or self.all):
+            raise ValueError("Set a filter, or 'all': true to update every listing")
+        return self
+
+
+class ListingBulkOperation(str, Enum):
+    SET_STATUS = "set_status"
+    PRICE_PERCENT = "price_percent"
+    PRICE_ABSOLUTE = "price_absolute"
+
+
+class ListingBulkUpdate(BaseModel):
+    filter: ListingBulkFilter
+    operation: ListingBulkOperation
+    status: Optional[ListingStatus] = None
+    amount: Optional[Decimal] = None
+
+    @model_validator(mode="after")
+    def validate_operation(self):
+        if self.operation == ListingBulkOperation.SET_STATUS:
+            if self.status is None:
+                raise ValueError("Field 'status' is required for set_status")
+        elif self.amount is None:
+            raise ValueError(f"Field 'amount' is required for {self.operation.value}")
+        elif (
+            self.operation == ListingBulkOperation.PRICE_PERCENT and self.amount <= -100
+        ):
+            raise ValueError("Percent change must be greater than -100")
+        return self
+
+
+class ListingBulkUpdateResult(BaseModel):
+    affected: int
+
+
+class HotInventoryState(BaseModel):
+    listing_id: UUID
+    hot_inventory: bool
+    # Units the in-memory ledger can still sell (None when not hot)
+    available: Optional[int] = None
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from dataclasses import dataclass
 from uuid import UUID
 from typing import List, Optional
 from decimal import Decimal
@@ -23,6 +24,17 @@ class OrderItemResponse(OrderItemBase):
         from_attributes = True
 
 
+@dataclass(slots=True)
+class OrderItemRow:
+    """Column projection of OrderItemResponse (same field order)"""
+
+    listing_id: str
+    quantity: Decimal
+    id: str
+    price_at_time: Decimal
+    order_id: str
+
+
 class OrderBase(BaseModel):
     buyer_id: UUID
     total_amount: Decimal = Field(..., gt=0)
@@ -45,6 +57,17 @@ class OrderResponse(OrderBase):
         from_attributes = True
 
 
+@dataclass(slots=True)
+class OrderRow:
+    """Column projection of OrderResponse (same field order)"""
+
+    buyer_id: str
+    total_amount: Decimal
+    status: OrderStatus
+    id: str
+    items: List[OrderItemRow]
+
+
 # For order history and listing
 class OrderSummary(BaseModel):
     id: UUID
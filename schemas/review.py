@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from dataclasses import dataclass
 from typing import Optional
 from uuid import UUID
 
@@ -24,3 +25,14 @@ class ReviewResponse(ReviewBase):
 
     class Config:
         from_attributes = True
+
+
+@dataclass(slots=True)
+class ReviewRow:
+    """Column projection of ReviewResponse (same field order)"""
+
+    listing_id: str
+    rating: int
+    comment: Optional[str]
+    id: str
+    reviewer_id: str
@@ -137,7 +137,7 @@ async def get_current_user(
 
 async def check_seller_role(current_user: User = Depends(get_current_user)):
     """Check if current user has seller role."""
-    if current_user.role != UserRole.SELLER.value:
+    if current_user.role.name != UserRole.SELLER:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only sellers can access this endpoint",
@@ -147,7 +147,7 @@ async def check_seller_role(current_user: User = Depends(get_current_user)):
 
 async def check_admin_role(current_user: User = Depends(get_current_user)):
     """Check if current user has admin role."""
-    if current_user.role != UserRole.ADMIN.value:
+    if current_user.role.name != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can access this endpoint",
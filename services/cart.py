@@ -1,12 +1,50 @@
+import logging
 from uuid import UUID
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from models.cart import CartItem
 from models.listing import Listing, ListingStatus
 from models.order import Order, OrderItem, OrderStatus
-from schemas.cart import CartItemCreate, CartSummary
+from models.user import User
+from schemas.cart import (
+    AnonymousCart,
+    AnonymousCartItem,
+    CartItemCreate,
+    CartOperation,
+    CartOperationType,
+    CartSummary,
+    CartSummaryItem,
+)
 from decimal import Decimal
-from sqlalchemy import and_
+from typing import Dict, List, NamedTuple, Optional, Set
+from sqlalchemy import Integer, and_, cast, delete, func, insert, or_, select, update
+from cache import invalidate_cart, invalidate_listing, invalidate_orders
+from cart_token import encode_cart
+from config import settings
+from models.reservation import StockReservation
+from services.hot_inventory import ListingSwitching, hot_inventory
+from services.listing_card import ListingCardService
+from services.reservation import Hold, ReservationService, reservation_expiry
+from services.stock import StockService
+
+logger = logging.getLogger("api")
+
+
+class PreparedCheckout(NamedTuple):
+    """An uncommitted checkout and what to do once its fate is known"""
+
+    order: Order
+    user_id: str
+    # Ledger units allocated to the order
+    hot: Dict[str, int]
+    # Listings whose rows changed, with their tags for invalidation
+    listing_ids: List[str]
+    category_ids: Set[str]
+    seller_ids: Set[str]
+
+
+def _cents(cents: int) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
 
 
 class CartService:
@@ -14,12 +52,13 @@ class CartService:
         self.db = db
 
     def add_to_cart(self, user_id: UUID, item: CartItemCreate) -> CartItem:
+        user_id, listing_id = str(user_id), str(item.listing_id)
         # Check if listing exists and has enough quantity
         listing = (
             self.db.query(Listing)
             .filter(
                 and_(
-                    Listing.id == item.listing_id,
+                    Listing.id == listing_id,
                     Listing.status == ListingStatus.ACTIVE,
                 )
             )
@@ -36,44 +75,129 @@ class CartService:
         existing_item = (
             self.db.query(CartItem)
             .filter(
-                and_(
-                    CartItem.user_id == user_id, CartItem.listing_id == item.listing_id
-                )
+                and_(CartItem.user_id == user_id, CartItem.listing_id == listing_id)
             )
             .first()
         )
+        new_quantity = item.quantity
+        if existing_item:
+            new_quantity += existing_item.quantity
+        hold = self._hold(user_id, listing, new_quantity)
 
         if existing_item:
-            new_quantity = existing_item.quantity + item.quantity
-            if new_quantity > listing.quantity:
-                raise ValueError("Not enough items in stock")
             existing_item.quantity = new_quantity
             cart_item = existing_item
         else:
             cart_item = CartItem(
                 user_id=user_id,
-                listing_id=item.listing_id,
+                listing_id=listing_id,
                 quantity=item.quantity,
                 price_at_add=listing.price,
             )
             self.db.add(cart_item)
 
         self.db.commit()
+        invalidate_cart(user_id)
+        if hold:
+            reservation_expiry.schedule(hold)
         self.db.refresh(cart_item)
         return cart_item
 
+    def _hold(self, user_id: str, listing: Listing, quantity: int) -> Optional[Hold]:
+        """Reserve ``quantity`` units for the cart when reservations are on"""
+        # Flash-sale listings are never held; the ledger decides at checkout
+        hot_units = hot_inventory.available(listing.id)
+        if hot_units is not None:
+            if quantity > hot_units:
+                raise ValueError("Not enough items in stock")
+            return None
+        if not settings.STOCK_RESERVATIONS_ENABLED:
+            if quantity > listing.available_quantity:
+                raise ValueError("Not enough items in stock")
+            return None
+        hold = ReservationService(self.db).hold(user_id, listing.id, quantity)
+        if not hold:
+            self.db.rollback()
+            raise ValueError("Not enough items in stock")
+        return hold
+
     def get_cart_items(self, user_id: UUID) -> list[CartItem]:
-        return self.db.query(CartItem).filter(CartItem.user_id == user_id).all()
+        return self.db.query(CartItem).filter(CartItem.user_id == str(user_id)).all()
 
     def get_cart_summary(self, user_id: UUID) -> CartSummary:
-        items = self.get_cart_items(user_id)
-        total = sum(item.price_at_add * item.quantity for item in items)
-        return CartSummary(items=items, total=Decimal(total))
+        """Cart lines against live listings, totals included, in one query.
+
+        Money is summed in integer cents by window aggregates over the
+        joined rows, so the Float columns never accumulate rounding error.
+        A line is out of stock when its listing is gone or inactive, or
+        holds fewer units than the line (counting the buyer's own hold).
+        """
+        user_id = str(user_id)
+        at_add = cast(func.round(CartItem.price_at_add * 100), Integer)
+        live = cast(func.round(Listing.price * 100), Integer)
+        rows = self.db.execute(
+            select(
+                CartItem.listing_id,
+                CartItem.quantity,
+                CartItem.id,
+                at_add.label("at_add"),
+                live.label("live"),
+                Listing.title,
+                Listing.status,
+                (
+                    Listing.available_quantity
+                    + func.coalesce(StockReservation.quantity, 0)
+                ).label("available"),
+                func.sum(at_add * CartItem.quantity).over().label("total"),
+                func.sum(func.coalesce(live, at_add) * CartItem.quantity)
+                .over()
+                .label("current_total"),
+            )
+            .outerjoin(Listing, Listing.id == CartItem.listing_id)
+            .outerjoin(
+                StockReservation,
+                and_(
+                    StockReservation.listing_id == CartItem.listing_id,
+                    StockReservation.user_id == user_id,
+                ),
+            )
+            .where(CartItem.user_id == user_id)
+            .order_by(CartItem.added_at, CartItem.id)
+        ).all()
+
+        items = []
+        for row in rows:
+            available = hot_inventory.available(row.listing_id)
+            if available is None:
+                available = row.available
+            items.append(
+                CartSummaryItem(
+                    listing_id=row.listing_id,
+                    quantity=row.quantity,
+                    id=row.id,
+                    price_at_add=_cents(row.at_add),
+                    title=row.title,
+                    current_price=None if row.live is None else _cents(row.live),
+                    # A listing repriced to 0 is a change; only a missing one is not
+                    price_change=_cents(
+                        (row.at_add if row.live is None else row.live) - row.at_add
+                    ),
+                    subtotal=_cents(row.at_add * row.quantity),
+                    out_of_stock=row.status != ListingStatus.ACTIVE
+                    or available < row.quantity,
+                )
+            )
+        return CartSummary(
+            items=items,
+            total=_cents(rows[0].total if rows else 0),
+            current_total=_cents(rows[0].current_total if rows else 0),
+            out_of_stock_items=sum(item.out_of_stock for item in items),
+        )
 
     def update_cart_item(self, user_id: UUID, item_id: UUID, quantity: int) -> CartItem:
         cart_item = (
             self.db.query(CartItem)
-            .filter(and_(CartItem.id == item_id, CartItem.user_id == user_id))
+            .filter(and_(CartItem.id == str(item_id), CartItem.user_id == str(user_id)))
             .first()
         )
 
@@ -83,75 +207,435 @@ class CartService:
         listing = (
             self.db.query(Listing).filter(Listing.id == cart_item.listing_id).first()
         )
-        if listing.quantity < quantity:
-            raise ValueError("Not enough items in stock")
+        if not listing:
+            raise ValueError(f"Listing {cart_item.listing_id} is no longer available")
+        hold = self._hold(cart_item.user_id, listing, quantity)
 
         cart_item.quantity = quantity
         self.db.commit()
+        invalidate_cart(user_id)
+        if hold:
+            reservation_expiry.schedule(hold)
         self.db.refresh(cart_item)
         return cart_item
 
+    def apply_operations(
+        self, user_id: UUID, operations: List[CartOperation]
+    ) -> CartSummary:
+        """Apply a batch of adds, updates and removes in one transaction.
+
+        The operations are folded over the loaded cart first, so each listing
+        is validated and written once whatever the number of operations on
+        it; every touched listing comes from a single IN query. Any invalid
+        operation rejects the whole batch.
+        """
+        user_id = str(user_id)
+        if len(operations) > settings.CART_BATCH_MAX_OPERATIONS:
+            raise ValueError(
+                f"At most {settings.CART_BATCH_MAX_OPERATIONS} operations per batch"
+            )
+        items = {item.listing_id: item for item in self.get_cart_items(user_id)}
+        by_id = {item.id: item for item in items.values()}
+        quantities = {listing_id: item.quantity for listing_id, item in items.items()}
+        added = set()
+        for operation in operations:
+            if operation.op == CartOperationType.ADD:
+                listing_id = str(operation.listing_id)
+                quantities[listing_id] = (
+                    quantities.get(listing_id, 0) + operation.quantity
+                )
+                added.add(listing_id)
+                continue
+            item = by_id.get(str(operation.item_id))
+            if not item:
+                raise ValueError(f"Cart item {operation.item_id} not found")
+            if operation.op == CartOperationType.UPDATE:
+                quantities[item.listing_id] = operation.quantity
+            else:
+                quantities[item.listing_id] = 0
+                del by_id[item.id]
+
+        changed = {
+            listing_id: quantity
+            for listing_id, quantity in quantities.items()
+            if listing_id not in items or items[listing_id].quantity != quantity
+        }
+        kept = [k for k, quantity in changed.items() if quantity]
+        listings = {
+            listing.id: listing
+            for listing in self.db.query(Listing).filter(Listing.id.in_(kept))
+        }
+        holds = []
+        for listing_id in kept:
+            listing = listings.get(listing_id)
+            if not listing or (
+                listing_id in added and listing.status != ListingStatus.ACTIVE
+            ):
+                self.db.rollback()
+                raise ValueError(f"Listing {listing_id} not found or not active")
+            hold = self._hold(user_id, listing, changed[listing_id])
+            if hold:
+                holds.append(hold)
+
+        removed = [k for k, quantity in changed.items() if not quantity and k in items]
+        if removed:
+            ReservationService(self.db).release(user_id, removed)
+            self.db.execute(
+                delete(CartItem)
+                .where(CartItem.id.in_([items[k].id for k in removed]))
+                .execution_options(synchronize_session=False)
+            )
+        updated = [k for k in kept if k in items]
+        if updated:
+            self.db.execute(
+                update(CartItem),
+                [{"id": items[k].id, "quantity": changed[k]} for k in updated],
+            )
+        created = [k for k in kept if k not in items]
+        if created:
+            self.db.execute(
+                insert(CartItem),
+                [
+                    {
+                        "user_id": user_id,
+                        "listing_id": k,
+                        "quantity": changed[k],
+                        "price_at_add": listings[k].price,
+                    }
+                    for k in created
+                ],
+            )
+        self.db.commit()
+        invalidate_cart(user_id)
+        reservation_expiry.schedule(*holds)
+        self.db.expire_all()
+        return self.get_cart_summary(user_id)
+
     def remove_from_cart(self, user_id: UUID, item_id: UUID) -> bool:
-        result = (
+        cart_item = (
             self.db.query(CartItem)
-            .filter(and_(CartItem.id == item_id, CartItem.user_id == user_id))
-            .delete()
+            .filter(and_(CartItem.id == str(item_id), CartItem.user_id == str(user_id)))
+            .first()
         )
+        if not cart_item:
+            return False
+        ReservationService(self.db).release(user_id, [cart_item.listing_id])
+        self.db.delete(cart_item)
         self.db.commit()
-        return result > 0
+        invalidate_cart(user_id)
+        return True
 
     def clear_cart(self, user_id: UUID):
-        self.db.query(CartItem).filter(CartItem.user_id == user_id).delete()
+        ReservationService(self.db).release(user_id)
+        self.db.query(CartItem).filter(CartItem.user_id == str(user_id)).delete()
         self.db.commit()
+        invalidate_cart(user_id)
+
+    def _anonymous_listings(self, listing_ids):
+        return {
+            row.id: row
+            for row in self.db.query(
+                Listing.id,
+                Listing.title,
+                Listing.price,
+                Listing.status,
+                Listing.available_quantity.label("available"),
+            ).filter(Listing.id.in_(list(listing_ids)))
+        }
+
+    def anonymous_cart(self, items: Dict[str, int]) -> AnonymousCart:
+        """Price a token cart against the live listings; reads only.
+
+        Lines whose listing was deleted are dropped from the reissued token.
+        """
+        listings = self._anonymous_listings(items)
+        lines, kept, total = [], {}, 0
+        for listing_id, quantity in items.items():
+            listing = listings.get(listing_id)
+            if not listing:
+                continue
+            available = hot_inventory.available(listing_id)
+            if available is None:
+                available = listing.available
+            price = round(listing.price * 100)
+            lines.append(
+                AnonymousCartItem(
+                    listing_id=listing_id,
+                    quantity=quantity,
+                    title=listing.title,
+                    price=_cents(price),
+                    out_of_stock=listing.status != ListingStatus.ACTIVE
+                    or available < quantity,
+                )
+            )
+            kept[listing_id] = quantity
+            total += price * quantity
+        return AnonymousCart(token=encode_cart(kept), items=lines, total=_cents(total))
+
+    def set_anonymous_item(
+        self, items: Dict[str, int], listing_id: UUID, quantity: int
+    ) -> Dict[str, int]:
+        """Return the token cart with ``listing_id`` at ``quantity`` units.
+
+        Checked like ``add_to_cart``, but nothing is written or held.
+        """
+        listing_id = str(listing_id)
+        if quantity > settings.CART_TOKEN_MAX_QUANTITY:
+            raise ValueError(
+                f"At most {settings.CART_TOKEN_MAX_QUANTITY} units per item"
+            )
+        listing = self._anonymous_listings([listing_id]).get(listing_id)
+        if not listing or listing.status != ListingStatus.ACTIVE:
+            raise ValueError("Listing not found or not active")
+        available = hot_inventory.available(listing_id)
+        if quantity > (listing.available if available is None else available):
+            raise ValueError("Not enough items in stock")
+        return {**items, listing_id: quantity}
+
+    def merge_anonymous(
+        self,
+        user_id: UUID,
+        items: Dict[str, int],
+        issued_at: int,
+        strict: bool = False,
+    ) -> bool:
+        """Fold a token cart into the buyer's cart in one batch.
+
+        Each line ends up at the larger of the two quantities. A token is
+        merged once: one issued no later than the last merged token is
+        ignored, so a client that keeps sending it does not refill the cart
+        a checkout emptied. At login (``strict`` off) lines of inactive
+        listings are skipped and a batch refused for stock leaves the cart
+        untouched and returns False; at checkout every problem raises
+        ValueError.
+        """
+        if not items:
+            return True
+        user_id = str(user_id)
+        # In the merge's transaction, so a merge that fails spends nothing
+        spent = self.db.execute(
+            update(User)
+            .where(
+                User.id == user_id,
+                or_(
+                    User.cart_token_merged_at.is_(None),
+                    User.cart_token_merged_at < issued_at,
+                ),
+            )
+            .values(cart_token_merged_at=issued_at)
+            .execution_options(synchronize_session=False)
+        )
+        if not spent.rowcount:
+            return True
+        current = {item.listing_id: item for item in self.get_cart_items(user_id)}
+        listings = self._anonymous_listings(items)
+        operations = []
+        for listing_id, quantity in items.items():
+            listing = listings.get(listing_id)
+            if not strict and (not listing or listing.status != ListingStatus.ACTIVE):
+                continue
+            existing = current.get(listing_id)
+            if not existing:
+                operations.append(
+                    CartOperation(
+                        op=CartOperationType.ADD,
+                        listing_id=listing_id,
+                        quantity=quantity,
+                    )
+                )
+            elif existing.quantity < quantity:
+                operations.append(
+                    CartOperation(
+                        op=CartOperationType.UPDATE,
+                        item_id=existing.id,
+                        quantity=quantity,
+                    )
+                )
+        if not operations:
+            self.db.commit()
+            return True
+        try:
+            self.apply_operations(user_id, operations)
+        except ValueError:
+            self.db.rollback()
+            if strict:
+                raise
+            logger.info("Anonymous cart not merged for user %s", user_id)
+            return False
+        return True
 
     def process_checkout(self, user_id: UUID) -> Order:
+        """Turn the cart into a PENDING order with a constant number of queries.
+
+        All reads (cart rows, then every listing with the buyer's holds in
+        one IN) happen before the first write, so SQLite's write lock is held
+        only for the hold release, one guarded stock UPDATE, the order and
+        order item inserts and the cart delete, whatever the size of the cart.
+        Units of hot listings are allocated from the in-memory ledger instead
+        and never touch the listing row here.
+        """
+        prepared = None
+        try:
+            prepared = self.prepare_checkout(user_id)
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            if prepared:
+                self.abandon_checkout(prepared)
+            raise
+        self.finish_checkout(prepared)
+        self.db.refresh(prepared.order)
+        return prepared.order
+
+    def prepare_checkout(self, user_id: UUID) -> PreparedCheckout:
+        """Every write of a checkout, left uncommitted.
+
+        On ValueError the caller rolls back (the transaction, or a savepoint
+        when several checkouts share one commit). After committing, pass the
+        result to ``finish_checkout``; if the commit fails, to
+        ``abandon_checkout``.
+        """
+        user_id = str(user_id)
         cart_items = self.get_cart_items(user_id)
         if not cart_items:
             raise ValueError("Cart is empty")
 
-        # Verify stock and calculate total
-        total = Decimal(0)
-        order_items = []
-
+        wanted: Dict[str, int] = {}
         for cart_item in cart_items:
-            listing = (
-                self.db.query(Listing)
-                .filter(Listing.id == cart_item.listing_id)
-                .first()
+            wanted[cart_item.listing_id] = (
+                wanted.get(cart_item.listing_id, 0) + cart_item.quantity
             )
-
+        listings = {
+            row.id: row
+            for row in self.db.query(
+                Listing.id,
+                Listing.title,
+                Listing.available_quantity.label("available"),
+                func.coalesce(StockReservation.quantity, 0).label("held"),
+                Listing.status,
+                Listing.category_id,
+                Listing.seller_id,
+                Listing.hot_inventory,
+            )
+            .outerjoin(
+                StockReservation,
+                and_(
+                    StockReservation.listing_id == Listing.id,
+                    StockReservation.user_id == user_id,
+                ),
+            )
+            .filter(Listing.id.in_(list(wanted)))
+        }
+        for listing_id in wanted:
+            listing = listings.get(listing_id)
             if not listing or listing.status != ListingStatus.ACTIVE:
-                raise ValueError(f"Listing {listing.id} is no longer available")
+                raise ValueError(f"Listing {listing_id} is no longer available")
+        try:
+            hot = hot_inventory.take(wanted)
+        except ListingSwitching as e:
+            raise ListingSwitching(
+                e.listing_ids,
+                ", ".join(listings[listing_id].title for listing_id in e.listing_ids)
+                + " is starting or ending a flash sale, please try again",
+            ) from None
+        if hot is None:
+            raise ValueError(
+                "Not enough stock for "
+                + ", ".join(
+                    listings[listing_id].title
+                    for listing_id in hot_inventory.split(wanted)[0]
+                )
+            )
 
-            if listing.quantity < cart_item.quantity:
-                raise ValueError(f"Not enough stock for {listing.title}")
+        try:
+            cold = {k: v for k, v in wanted.items() if k not in hot}
+            for listing_id, quantity in cold.items():
+                listing = listings[listing_id]
+                # Hot listings are checked against the ledger, not the
+                # lagging row; one flagged hot but not in the ledger was
+                # switched on after the read above
+                if listing.hot_inventory:
+                    raise ListingSwitching(
+                        [listing_id],
+                        f"{listing.title} just went on flash sale, please try again",
+                    )
+                if listing.available + listing.held < quantity:
+                    raise ValueError(f"Not enough stock for {listing.title}")
+            order = self._write_order(user_id, cart_items, cold, hot)
+        except BaseException:
+            hot_inventory.release(hot)
+            raise
+        cold_listings = [listings[listing_id] for listing_id in cold]
+        return PreparedCheckout(
+            order,
+            user_id,
+            hot,
+            list(cold),
+            {listing.category_id for listing in cold_listings},
+            {listing.seller_id for listing in cold_listings},
+        )
 
-            # Update listing quantity
-            listing.quantity -= cart_item.quantity
-            if listing.quantity == 0:
-                listing.status = ListingStatus.SOLD_OUT
+    def finish_checkout(self, prepared: PreparedCheckout) -> None:
+        """Settle the ledger units and drop the caches of a committed checkout"""
+        hot_inventory.confirm(prepared.hot)
+        if prepared.listing_ids:
+            invalidate_listing(
+                *prepared.listing_ids,
+                category_ids=prepared.category_ids,
+                seller_ids=prepared.seller_ids,
+            )
+        invalidate_orders(prepared.user_id)
+        invalidate_cart(prepared.user_id)
 
-            total += Decimal(cart_item.price_at_add * cart_item.quantity)
+    def abandon_checkout(self, prepared: PreparedCheckout) -> None:
+        """Give back the ledger units of a checkout that was rolled back"""
+        hot_inventory.release(prepared.hot)
 
-            order_items.append(
-                OrderItem(
-                    listing_id=listing.id,
-                    quantity=cart_item.quantity,
-                    price_at_purchase=cart_item.price_at_add,
-                )
-            )
+    def _write_order(
+        self,
+        user_id: str,
+        cart_items: List[CartItem],
+        cold: Dict[str, int],
+        hot: Dict[str, int],
+    ) -> Order:
+        """Write side of checkout; ``hot`` units are already allocated"""
+        # The buyer's own holds become part of the sale; any left on hot
+        # listings or listings no longer in the cart are simply released
+        stock = StockService(self.db)
+        held = ReservationService(self.db).consume(user_id)
+        stock.unreserve({k: v for k, v in held.items() if k not in cold})
+        # A concurrent checkout that got there first fails the guard
+        if not stock.decrement(cold, held):
+            raise ValueError("Stock changed during checkout, please try again")
 
-        # Create order
         order = Order(
-            user_id=user_id,
-            total_amount=total,
+            buyer_id=user_id,
+            total_amount=sum(
+                Decimal(str(item.price_at_add)) * item.quantity for item in cart_items
+            ),
             status=OrderStatus.PENDING,
-            items=order_items,
         )
-
         self.db.add(order)
-        self.clear_cart(user_id)  # Clear the cart after successful checkout
-        self.db.commit()
-        self.db.refresh(order)
-
+        self.db.flush()
+        self.db.execute(
+            insert(OrderItem),
+            [
+                {
+                    "order_id": order.id,
+                    "listing_id": item.listing_id,
+                    "quantity": item.quantity,
+                    "price_at_time": item.price_at_add,
+                    # Hot sales reach the listing row through the write-behind
+                    "stock_applied": item.listing_id not in hot,
+                }
+                for item in cart_items
+            ],
+        )
+        # Only the rows that were checked out; items added meanwhile stay
+        self.db.execute(
+            delete(CartItem)
+            .where(CartItem.id.in_([item.id for item in cart_items]))
+            .execution_options(synchronize_session=False)
+        )
+        ListingCardService(self.db).refresh_listings(cold)
         return order
@@ -1,24 +1,188 @@
 from sqlalchemy.orm import Session
-from models.category import Category
-from schemas.category import CategoryCreate, CategoryUpdate
-from typing import List, Optional
+from sqlalchemy import delete, insert, literal, select, true, update
+from fastapi import HTTPException, status
+from models.category import Category, CategoryClosure
+from schemas.category import CategoryCreate, CategoryTreeNode, CategoryUpdate
+from services.listing_card import ListingCardService
+from services.category_catalog import (
+    CATEGORY_CATALOG,
+    CategoryCatalog,
+    CategorySnapshot,
+    bump_catalog_version,
+    catalog_version,
+)
+from cache import invalidate_listing
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
 from uuid import UUID
 
+_closure = CategoryClosure.__table__
+
 
 class CategoryService:
     def __init__(self, db: Session):
         self.db = db
 
     def get_categories(self, skip: int = 0, limit: int = 100) -> List[Category]:
-        return self.db.query(Category).offset(skip).limit(limit).all()
+        return (
+            self.db.query(Category)
+            .order_by(Category.created_at, Category.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
 
     def get_category_by_id(self, category_id: UUID) -> Optional[Category]:
-        return self.db.query(Category).filter(Category.id == category_id).first()
+        return self.db.query(Category).filter(Category.id == str(category_id)).first()
+
+    def get_tree_validators(self) -> List[Tuple[str, int, datetime]]:
+        """(id, version, updated_at) of every category, for the tree ETag"""
+        return (
+            self.db.query(Category.id, Category.version, Category.updated_at)
+            .order_by(Category.created_at, Category.id)
+            .all()
+        )
+
+    def get_tree(self, root_id: Optional[UUID] = None) -> List[CategoryTreeNode]:
+        """The category forest, or the subtree under ``root_id``, from one query"""
+        query = self.db.query(
+            Category.id, Category.name, Category.description, Category.parent_id
+        )
+        if root_id:
+            query = query.join(
+                CategoryClosure, CategoryClosure.descendant_id == Category.id
+            ).filter(CategoryClosure.ancestor_id == str(root_id))
+
+        nodes: Dict[str, dict] = {}
+        for row in query.order_by(Category.name):
+            nodes[row.id] = {**row._asdict(), "children": []}
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node["parent_id"])
+            (parent["children"] if parent else roots).append(node)
+        return [CategoryTreeNode.model_validate(node) for node in roots]
+
+    def load_snapshot(self) -> CategorySnapshot:
+        """Every category and the full tree, stamped with the catalog version"""
+        # Read the stamp first: a change committed mid-load then only makes
+        # the snapshot look older than it is, never newer
+        version = catalog_version(self.db, CATEGORY_CATALOG)
+        return CategorySnapshot(
+            version,
+            self.db.query(Category).order_by(Category.created_at, Category.id).all(),
+            self.get_tree(),
+        )
+
+    def descendant_ids(self, category_id: UUID):
+        """Subquery of ``category_id`` and every category below it"""
+        return select(_closure.c.descendant_id).where(
+            _closure.c.ancestor_id == str(category_id)
+        )
+
+    def _require_parent(self, parent_id: Optional[str]) -> None:
+        if parent_id and not self.get_category_by_id(parent_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Parent category not found",
+            )
+
+    def _link(self, category_id: str, parent_id: Optional[str]) -> None:
+        """Closure rows for a new leaf: itself plus every ancestor of its parent"""
+        self.db.execute(
+            insert(_closure).values(
+                ancestor_id=category_id, descendant_id=category_id, depth=0
+            )
+        )
+        if parent_id:
+            self.db.execute(
+                insert(_closure).from_select(
+                    ["ancestor_id", "descendant_id", "depth"],
+                    select(
+                        _closure.c.ancestor_id,
+                        literal(category_id),
+                        _closure.c.depth + 1,
+                    ).where(_closure.c.descendant_id == parent_id),
+                )
+            )
+
+    def _move(self, category_id: str, parent_id: Optional[str]) -> None:
+        """Re-hang the subtree rooted at ``category_id`` under ``parent_id``"""
+        subtree = select(_closure.c.descendant_id).where(
+            _closure.c.ancestor_id == category_id
+        )
+        if parent_id:
+            self._require_parent(parent_id)
+            if self.db.execute(
+                select(literal(1)).where(
+                    _closure.c.ancestor_id == category_id,
+                    _closure.c.descendant_id == parent_id,
+                )
+            ).first():
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="A category cannot be moved under itself or its subcategories",
+                )
+
+        # Cut the subtree loose from its old ancestors...
+        self.db.execute(
+            delete(_closure).where(
+                _closure.c.descendant_id.in_(subtree),
+                _closure.c.ancestor_id.not_in(subtree),
+            )
+        )
+        if parent_id:
+            # ...and join every new ancestor to every subtree node
+            above = _closure.alias("above")
+            below = _closure.alias("below")
+            self.db.execute(
+                insert(_closure).from_select(
+                    ["ancestor_id", "descendant_id", "depth"],
+                    select(
+                        above.c.ancestor_id,
+                        below.c.descendant_id,
+                        above.c.depth + below.c.depth + 1,
+                    )
+                    .select_from(above.join(below, true()))
+                    .where(
+                        above.c.descendant_id == parent_id,
+                        below.c.ancestor_id == category_id,
+                    ),
+                )
+            )
+
+    def rebuild_closure(self) -> int:
+        """Recompute the closure table from parent_id with one recursive query"""
+        tree = select(
+            Category.id.label("ancestor_id"),
+            Category.id.label("descendant_id"),
+            literal(0).label("depth"),
+        ).cte("tree", recursive=True)
+        tree = tree.union_all(
+            select(tree.c.ancestor_id, Category.id, tree.c.depth + 1).where(
+                Category.parent_id == tree.c.descendant_id
+            )
+        )
+        self.db.execute(delete(_closure))
+        self.db.execute(
+            insert(_closure).from_select(
+                ["ancestor_id", "descendant_id", "depth"], select(tree)
+            )
+        )
+        self.db.commit()
+        return self.db.query(CategoryClosure).count()
 
     def create_category(self, category: CategoryCreate) -> Category:
-        db_category = Category(name=category.name, description=category.description)
+        parent_id = str(category.parent_id) if category.parent_id else None
+        self._require_parent(parent_id)
+        db_category = Category(
+            name=category.name, description=category.description, parent_id=parent_id
+        )
         self.db.add(db_category)
+        self.db.flush()
+        self._link(db_category.id, parent_id)
+        bump_catalog_version(self.db, CATEGORY_CATALOG)
         self.db.commit()
+        category_catalog.reload(self.db)
         self.db.refresh(db_category)
         return db_category
 
@@ -29,10 +193,27 @@ class CategoryService:
         if not db_category:
             return None
 
-        for key, value in category.model_dump(exclude_unset=True).items():
+        values = category.model_dump(exclude_unset=True)
+        moved = False
+        if "parent_id" in values:
+            parent_id = values.pop("parent_id")
+            parent_id = str(parent_id) if parent_id else None
+            if parent_id != db_category.parent_id:
+                self._move(db_category.id, parent_id)
+                db_category.parent_id = parent_id
+                moved = True
+
+        for key, value in values.items():
             setattr(db_category, key, value)
+        db_category.version = Category.version + 1
 
+        ListingCardService(self.db).refresh_category(category_id)
+        bump_catalog_version(self.db, CATEGORY_CATALOG)
         self.db.commit()
+        category_catalog.reload(self.db)
+        if moved:
+            # Descendant-inclusive browse pages may have changed membership
+            invalidate_listing()
         self.db.refresh(db_category)
         return db_category
 
@@ -41,6 +222,54 @@ class CategoryService:
         if not db_category:
             return False
 
+        # Subcategories move up to the deleted category's parent
+        node = db_category.id
+        above = select(_closure.c.ancestor_id).where(
+            _closure.c.descendant_id == node, _closure.c.depth > 0
+        )
+        below = select(_closure.c.descendant_id).where(
+            _closure.c.ancestor_id == node, _closure.c.depth > 0
+        )
+        self.db.execute(
+            update(_closure)
+            .where(
+                _closure.c.ancestor_id.in_(above), _closure.c.descendant_id.in_(below)
+            )
+            .values(depth=_closure.c.depth - 1)
+        )
+        self.db.execute(
+            delete(_closure).where(
+                (_closure.c.ancestor_id == node) | (_closure.c.descendant_id == node)
+            )
+        )
+        self.db.execute(
+            update(Category)
+            .where(Category.parent_id == node)
+            .values(parent_id=db_category.parent_id, version=Category.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
         self.db.delete(db_category)
+        ListingCardService(self.db).refresh_category(category_id)
+        bump_catalog_version(self.db, CATEGORY_CATALOG)
         self.db.commit()
+        category_catalog.reload(self.db)
+        invalidate_listing()
         return True
+
+
+# Process-wide category catalog, swapped whenever a category change commits
+category_catalog = CategoryCatalog(lambda db: CategoryService(db).load_snapshot())
+
+
+if __name__ == "__main__":
+    # python -m services.category  -> rebuild the closure table from parent_id
+    import models  # noqa: F401  (register every mapper)
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {CategoryService(db).rebuild_closure()} closure rows")
+    finally:
+        db.close()
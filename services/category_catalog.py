@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from cache import CachedResponse
+from config import settings
+from http_cache import collection_etag, make_etag
+from http_compression import precompress
+from models.catalog_version import CatalogVersion
+from models.category import Category
+from schemas.category import CategoryResponse, CategoryTreeNode
+
+CATEGORY_CATALOG = "categories"
+
+_versions = CatalogVersion.__table__
+_tree_adapter = TypeAdapter(List[CategoryTreeNode])
+
+
+def catalog_version(db: Session, name: str) -> int:
+    version = db.execute(
+        select(_versions.c.version).where(_versions.c.name == name)
+    ).scalar()
+    return version or 0
+
+
+def bump_catalog_version(db: Session, name: str) -> None:
+    """Advance the stamp inside the caller's transaction.
+
+    One upsert statement, so two first bumps cannot both try to insert.
+    """
+    statement = insert(_versions).values(name=name, version=1)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_versions.c.name],
+            set_={"version": _versions.c.version + 1},
+        )
+    )
+
+
+class CategorySnapshot:
+    """Immutable view of every category with its JSON bytes precomputed.
+
+    Pages are slices of the per-category bodies joined on demand, so any
+    skip/limit is served without touching the database or pydantic.
+    """
+
+    __slots__ = ("version", "_ids", "_bodies", "_validators", "_by_id", "tree")
+
+    def __init__(
+        self, version: int, categories: Sequence[Category], tree: List[CategoryTreeNode]
+    ):
+        self.version = version
+        self._ids: Tuple[str, ...] = tuple(category.id for category in categories)
+        self._bodies: Tuple[bytes, ...] = tuple(
+            CategoryResponse.model_validate(category).model_dump_json().encode()
+            for category in categories
+        )
+        self._validators: Tuple[Tuple[str, int, Optional[datetime]], ...] = tuple(
+            (category.id, category.version, category.updated_at)
+            for category in categories
+        )
+        self._by_id: Dict[str, CachedResponse] = {
+            category.id: CachedResponse(
+                body=body,
+                etag=make_etag("category", category.id, category.version),
+                last_modified=category.updated_at,
+            )
+            for category, body in zip(categories, self._bodies)
+        }
+        tree_etag, tree_modified = collection_etag(self._validators)
+        tree_body = _tree_adapter.dump_json(tree)
+        self.tree = CachedResponse(
+            body=tree_body,
+            etag=make_etag("tree", None, tree_etag),
+            last_modified=tree_modified,
+            encoded=precompress(tree_body),
+        )
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def page(self, skip: int = 0, limit: int = 100) -> CachedResponse:
+        window = slice(max(skip, 0), max(skip, 0) + max(limit, 0))
+        etag, last_modified = collection_etag(self._validators[window])
+        return CachedResponse(
+            body=b"[" + b",".join(self._bodies[window]) + b"]",
+            etag=etag,
+            last_modified=last_modified,
+        )
+
+    def get(self, category_id) -> Optional[CachedResponse]:
+        return self._by_id.get(str(category_id))
+
+
+class CategoryCatalog:
+    """Holds the current CategorySnapshot and swaps it atomically.
+
+    The worker that commits a category change reloads straight away; other
+    workers notice the bumped version stamp on their next check, at most
+    every CATEGORY_CATALOG_RECHECK_SECONDS.
+    """
+
+    def __init__(self, loader: Callable[[Session], CategorySnapshot]):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CategorySnapshot] = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def current(self, db: Session, recheck: bool = False) -> CategorySnapshot:
+        """The live snapshot; ``recheck`` forces a look at the version stamp"""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if (
+            snapshot is not None
+            and not recheck
+            and now - self._checked_at < settings.CATEGORY_CATALOG_RECHECK_SECONDS
+        ):
+            return snapshot
+        self._checked_at = now
+        if snapshot is not None and snapshot.version == catalog_version(
+            db, CATEGORY_CATALOG
+        ):
+            return snapshot
+        return self.reload(db)
+
+    def reload(self, db: Session) -> CategorySnapshot:
+        with self._lock:
+            snapshot = self._loader(db)
+            current = self._snapshot
+            # Never swap back to an older version loaded by a slower thread
+            if current is None or snapshot.version >= current.version:
+                self._snapshot = snapshot
+                self.reloads += 1
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "categories": len(snapshot) if snapshot else 0,
+            "reloads": self.reloads,
+        }
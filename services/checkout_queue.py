@@ -0,0 +1,274 @@
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import and_, bindparam, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from config import settings
+from database import SessionLocal
+from models.checkout_job import CheckoutJob, CheckoutJobStatus
+from services.cart import CartService
+from services.hot_inventory import ListingSwitching
+
+logger = logging.getLogger("api")
+
+_jobs = CheckoutJob.__table__
+_OPEN = [CheckoutJobStatus.QUEUED, CheckoutJobStatus.PROCESSING]
+
+
+class CheckoutQueueService:
+    """The checkout_jobs table as a durable queue; the caller commits claims"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, user_id: UUID) -> CheckoutJob:
+        """Check the cart with one read and queue its checkout.
+
+        A buyer has at most one open job (a unique index enforces it);
+        asking again returns it.
+        """
+        user_id = str(user_id)
+        job = self._open_job(user_id)
+        if job:
+            return job
+        summary = CartService(self.db).get_cart_summary(user_id)
+        if not summary.items:
+            raise ValueError("Cart is empty")
+        short = [
+            item.title or str(item.listing_id)
+            for item in summary.items
+            if item.out_of_stock
+        ]
+        if short:
+            raise ValueError("Not enough stock for " + ", ".join(short))
+
+        job = CheckoutJob(user_id=user_id, status=CheckoutJobStatus.QUEUED)
+        self.db.add(job)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # A concurrent request queued this buyer's checkout first
+            self.db.rollback()
+            return self._open_job(user_id)
+        self.db.refresh(job)
+        return job
+
+    def _open_job(self, user_id: str) -> Optional[CheckoutJob]:
+        return (
+            self.db.query(CheckoutJob)
+            .filter(CheckoutJob.user_id == user_id, CheckoutJob.status.in_(_OPEN))
+            .first()
+        )
+
+    def get_job(self, job_id: UUID, user_id: UUID) -> Optional[CheckoutJob]:
+        return (
+            self.db.query(CheckoutJob)
+            .filter(CheckoutJob.id == str(job_id), CheckoutJob.user_id == str(user_id))
+            .first()
+        )
+
+    def claim(self, owner: str, limit: int) -> List[Tuple[str, str]]:
+        """Lease up to ``limit`` of the oldest claimable jobs to ``owner``.
+
+        Claimable are queued jobs and PROCESSING jobs whose lease ran out,
+        which a crashed worker left behind. Returns (job id, user id).
+        """
+        now = datetime.utcnow()
+        claimable = or_(
+            CheckoutJob.status == CheckoutJobStatus.QUEUED,
+            and_(
+                CheckoutJob.status == CheckoutJobStatus.PROCESSING,
+                CheckoutJob.lease_expires_at <= now,
+            ),
+        )
+        oldest = (
+            select(CheckoutJob.id)
+            .where(claimable)
+            .order_by(CheckoutJob.created_at)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        return [
+            tuple(row)
+            for row in self.db.execute(
+                update(CheckoutJob)
+                .where(CheckoutJob.id.in_(oldest), claimable)
+                .values(
+                    status=CheckoutJobStatus.PROCESSING,
+                    claimed_by=owner,
+                    lease_expires_at=now
+                    + timedelta(seconds=settings.CHECKOUT_QUEUE_LEASE_SECONDS),
+                )
+                .returning(CheckoutJob.id, CheckoutJob.user_id)
+                .execution_options(synchronize_session=False)
+            )
+        ]
+
+    def complete(self, owner: str, results: List[dict]) -> bool:
+        """Record job results (b_id, status, order_id, error) of ``owner``.
+
+        Each row is only written while the job is still PROCESSING under
+        the owner's claim. Returns False when any was not; the caller must
+        roll back, as another worker has taken that job over.
+        """
+        if not results:
+            return True
+        written = self.db.execute(
+            update(_jobs)
+            .where(
+                _jobs.c.id == bindparam("b_id"),
+                _jobs.c.status == CheckoutJobStatus.PROCESSING,
+                _jobs.c.claimed_by == owner,
+            )
+            .values(lease_expires_at=None),
+            results,
+        ).rowcount
+        return written == len(results)
+
+    def requeue(self, owner: str, job_ids: List[str]) -> int:
+        """Put ``owner``'s PROCESSING jobs among ``job_ids`` back in the queue"""
+        return self.db.execute(
+            update(CheckoutJob)
+            .where(
+                CheckoutJob.id.in_(job_ids),
+                CheckoutJob.status == CheckoutJobStatus.PROCESSING,
+                CheckoutJob.claimed_by == owner,
+            )
+            .values(
+                status=CheckoutJobStatus.QUEUED,
+                claimed_by=None,
+                lease_expires_at=None,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+
+def _result(job_id: str, order_id: Optional[str] = None, error: Optional[str] = None):
+    return {
+        "b_id": job_id,
+        "status": CheckoutJobStatus.FAILED if error else CheckoutJobStatus.DONE,
+        "order_id": order_id,
+        "error": error,
+    }
+
+
+class CheckoutQueue:
+    """Worker threads draining checkout_jobs in batches.
+
+    Each batch runs every claimed checkout in its own SAVEPOINT, so a
+    failing cart only rolls back itself, then marks the jobs and commits
+    once: CHECKOUT_QUEUE_BATCH_SIZE checkouts share one write transaction.
+    Claims are leases held by this queue's owner id: jobs a crashed process
+    left PROCESSING are claimed again once their lease runs out, and a
+    batch that lost a lease meanwhile rolls back instead of writing over
+    the new claim.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self.owner = str(uuid.uuid4())
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.batches = 0
+        self.done = 0
+        self.failed = 0
+
+    def notify(self) -> None:
+        """Wake the workers for a newly queued job"""
+        self._wakeup.set()
+
+    def run_once(self) -> int:
+        """Claim and process one batch; returns the number of jobs claimed"""
+        db = self._session_factory()
+        try:
+            queue = CheckoutQueueService(db)
+            claimed = queue.claim(self.owner, settings.CHECKOUT_QUEUE_BATCH_SIZE)
+            db.commit()
+            if not claimed:
+                return 0
+
+            cart = CartService(db)
+            prepared, results, retry = [], [], []
+            for job_id, user_id in claimed:
+                try:
+                    with db.begin_nested():
+                        checkout = cart.prepare_checkout(user_id)
+                except ListingSwitching:
+                    # Not the cart's fault: back in the queue for a later batch
+                    retry.append(job_id)
+                    continue
+                except ValueError as e:
+                    results.append(_result(job_id, error=str(e)[:500]))
+                    continue
+                except Exception:
+                    logger.exception("Queued checkout %s failed", job_id)
+                    results.append(_result(job_id, error="Checkout failed"))
+                    continue
+                prepared.append(checkout)
+                results.append(_result(job_id, order_id=checkout.order.id))
+
+            try:
+                if not queue.complete(self.owner, results):
+                    raise RuntimeError("Checkout jobs were claimed by another worker")
+                if retry:
+                    queue.requeue(self.owner, retry)
+                db.commit()
+            except Exception:
+                db.rollback()
+                for checkout in prepared:
+                    cart.abandon_checkout(checkout)
+                queue.requeue(self.owner, [job_id for job_id, _ in claimed])
+                db.commit()
+                raise
+            for checkout in prepared:
+                cart.finish_checkout(checkout)
+            self.batches += 1
+            self.done += len(prepared)
+            self.failed += len(results) - len(prepared)
+            return len(claimed)
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("Checkout queue batch failed")
+                processed = 0
+            if not processed:
+                self._wakeup.wait(settings.CHECKOUT_QUEUE_POLL_SECONDS)
+                self._wakeup.clear()
+
+    def start(self) -> None:
+        """Start the workers; interrupted jobs come back as their leases end"""
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"checkout-worker-{i}", daemon=True)
+            for i in range(settings.CHECKOUT_QUEUE_WORKERS)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._threads),
+            "batches": self.batches,
+            "done": self.done,
+            "failed": self.failed,
+        }
+
+
+checkout_queue = CheckoutQueue()
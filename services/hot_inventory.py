@@ -0,0 +1,405 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+from sqlalchemy import case, exists, false, func, select, update
+from sqlalchemy.orm import Session
+from cache import invalidate_listing
+from config import settings
+from database import SessionLocal
+from models.listing import Listing, ListingStatus
+from models.order import OrderItem
+from services.listing_card import ListingCardService
+from services.reservation import ReservationService
+from services.stock import StockService
+
+logger = logging.getLogger("api")
+
+# (listing_id, units, category_id, seller_id) of one written-back listing
+Row = Tuple[str, int, str, str]
+
+
+class ListingSwitching(ValueError):
+    """Listings were still switching in or out of hot mode after the wait.
+
+    Nothing was taken; the checkout can simply be retried.
+    """
+
+    def __init__(
+        self,
+        listing_ids: Iterable[str],
+        message: str = "A flash sale is starting or ending, please try again",
+    ):
+        super().__init__(message)
+        self.listing_ids = sorted(listing_ids)
+
+
+class HotInventoryService:
+    """Database side of flash-sale listings: the flag and the write-behind.
+
+    A hot listing's sales are recorded as order items with
+    ``stock_applied = False`` and deducted from the listing later, many
+    at a time, so checkouts never queue on the listing row.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def hot_stock(self, listing_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Units still allocatable per hot listing.
+
+        That is the available quantity less the sales not yet written
+        back, so a ledger rebuilt after a crash never sells a unit twice.
+        Hot listings carry no holds (``set_hot`` releases them), so the
+        available quantity is every unit on the row.
+        """
+        pending = (
+            select(
+                OrderItem.listing_id,
+                func.sum(OrderItem.quantity).label("units"),
+            )
+            .where(OrderItem.stock_applied == false())
+            .group_by(OrderItem.listing_id)
+            .subquery()
+        )
+        units = Listing.available_quantity - func.coalesce(pending.c.units, 0)
+        query = (
+            select(
+                Listing.id,
+                case((Listing.status == ListingStatus.ACTIVE, units), else_=0),
+            )
+            .outerjoin(pending, pending.c.listing_id == Listing.id)
+            .where(Listing.hot_inventory.is_(True))
+        )
+        if listing_ids is not None:
+            query = query.where(Listing.id.in_([str(i) for i in listing_ids]))
+        return {
+            listing_id: max(int(units), 0)
+            for listing_id, units in self.db.execute(query)
+        }
+
+    def write_back(self, limit: int) -> List[Row]:
+        """Deduct up to ``limit`` pending sales from their listings.
+
+        The items are claimed with one UPDATE … RETURNING, so a sale is
+        written back once even if an order cancel races for it. Returns
+        (listing_id, units, category_id, seller_id) per listing written;
+        the caller commits.
+        """
+        # A read on the partial index first: an idle write-behind never
+        # takes the write lock
+        if not self.db.execute(
+            select(exists().where(OrderItem.stock_applied == false()))
+        ).scalar():
+            return []
+        pending = (
+            select(OrderItem.id)
+            .where(OrderItem.stock_applied == false())
+            .limit(limit)
+            .scalar_subquery()
+        )
+        claimed = self.db.execute(
+            update(OrderItem)
+            .where(OrderItem.id.in_(pending), OrderItem.stock_applied == false())
+            .values(stock_applied=True)
+            .returning(OrderItem.listing_id, OrderItem.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            return []
+        totals: Dict[str, int] = {}
+        for listing_id, quantity in claimed:
+            totals[listing_id] = totals.get(listing_id, 0) + int(quantity)
+        StockService(self.db).settle(totals)
+        ListingCardService(self.db).refresh_listings(totals)
+        return [
+            (listing_id, totals[listing_id], category_id, seller_id)
+            for listing_id, category_id, seller_id in self.db.execute(
+                select(Listing.id, Listing.category_id, Listing.seller_id).where(
+                    Listing.id.in_(list(totals))
+                )
+            )
+        ]
+
+    def claim_pending(self, order_id: str) -> Dict[str, int]:
+        """Take an order's not yet written back sales off the write-behind.
+
+        Returns their units per listing; those never reached the listing
+        row, so a cancel gives them back to the ledger only.
+        """
+        claimed = self.db.execute(
+            update(OrderItem)
+            .where(
+                OrderItem.order_id == str(order_id),
+                OrderItem.stock_applied == false(),
+            )
+            .values(stock_applied=True)
+            .returning(OrderItem.listing_id, OrderItem.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        totals: Dict[str, int] = {}
+        for listing_id, quantity in claimed:
+            totals[listing_id] = totals.get(listing_id, 0) + int(quantity)
+        return totals
+
+    def set_hot(self, listing_id: str, enabled: bool) -> bool:
+        """Flag or unflag a listing; returns False if it does not exist.
+
+        Switching on releases every cart hold on the listing: the held
+        units go into the ledger and are sold first come, first served,
+        holders included.
+        """
+        result = self.db.execute(
+            update(Listing)
+            .where(Listing.id == str(listing_id))
+            .values(hot_inventory=enabled)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+        if enabled:
+            ReservationService(self.db).release_listing(str(listing_id))
+        return True
+
+    def clear_hot(self) -> int:
+        """Unflag every hot listing; returns how many there were"""
+        return self.db.execute(
+            update(Listing)
+            .where(Listing.hot_inventory.is_(True))
+            .values(hot_inventory=False)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+
+class HotInventoryLedger:
+    """In-memory stock counters for hot listings, with write-behind.
+
+    ``take`` decides sales under one lock without touching the database;
+    a background thread writes the recorded sales back every
+    HOT_INVENTORY_FLUSH_INTERVAL_SECONDS. On start the ledger recovers by
+    writing back whatever a previous process left pending, then rebuilds
+    its counters from the database.
+
+    The counters live in one process, so hot inventory needs the app to
+    run as a single worker process: with WEB_CONCURRENCY above 1 it
+    cannot be switched on, and listings left hot are handed back to the
+    guarded SQL updates on start.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._lock = threading.Condition()
+        self._stock: Dict[str, int] = {}
+        # Units taken by checkouts that have not committed or rolled back
+        self._unsettled: Dict[str, int] = {}
+        # Listings being switched in or out of hot mode
+        self._switching: Set[str] = set()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.allocated = 0
+        self.written = 0
+
+    def split(self, quantities: Mapping[str, int]) -> Tuple[dict, dict]:
+        """(hot, cold) parts of a listing id -> units mapping"""
+        hot, cold = {}, {}
+        for listing_id, units in quantities.items():
+            (hot if listing_id in self._stock else cold)[listing_id] = units
+        return hot, cold
+
+    def take(self, quantities: Mapping[str, int]) -> Optional[Dict[str, int]]:
+        """Allocate the hot part of ``quantities`` (listing id -> units).
+
+        Returns the units taken per hot listing (empty when none is hot),
+        or None, taking nothing, when any hot listing is short. A listing
+        being switched is waited for, so it is sold in its new mode; if it
+        is still switching after HOT_INVENTORY_SWITCH_TIMEOUT_SECONDS,
+        ListingSwitching is raised. Pass the result to ``confirm`` once the
+        order is committed, or to ``release`` if it is not.
+        """
+        with self._lock:
+            if not self._lock.wait_for(
+                lambda: self._switching.isdisjoint(quantities),
+                settings.HOT_INVENTORY_SWITCH_TIMEOUT_SECONDS,
+            ):
+                raise ListingSwitching(self._switching.intersection(quantities))
+            hot = {k: units for k, units in quantities.items() if k in self._stock}
+            if any(self._stock[k] < units for k, units in hot.items()):
+                return None
+            for listing_id, units in hot.items():
+                self._stock[listing_id] -= units
+                self._unsettled[listing_id] = self._unsettled.get(listing_id, 0) + units
+            self.allocated += sum(hot.values())
+            return hot
+
+    def _settle(self, quantities: Mapping[str, int]) -> None:
+        for listing_id, units in quantities.items():
+            left = self._unsettled.get(listing_id, 0) - units
+            if left > 0:
+                self._unsettled[listing_id] = left
+            else:
+                self._unsettled.pop(listing_id, None)
+        self._lock.notify_all()
+
+    def confirm(self, quantities: Mapping[str, int]) -> None:
+        """The order of a ``take`` is committed; its sales are now pending"""
+        if quantities:
+            with self._lock:
+                self._settle(quantities)
+
+    def release(self, quantities: Mapping[str, int]) -> None:
+        """Give back the units of a ``take`` whose order was not stored"""
+        if not quantities:
+            return
+        with self._lock:
+            self._settle(quantities)
+            self._restore(quantities)
+
+    def restore(self, quantities: Mapping[str, int]) -> None:
+        """Give back the units of a cancelled order (hot listings only)"""
+        with self._lock:
+            self._restore(quantities)
+
+    def _restore(self, quantities: Mapping[str, int]) -> None:
+        for listing_id, units in quantities.items():
+            if listing_id in self._stock:
+                self._stock[listing_id] += units
+                self.allocated -= units
+
+    def available(self, listing_id: str) -> Optional[int]:
+        return self._stock.get(str(listing_id))
+
+    def load(self, db: Session, listing_ids: Optional[Iterable[str]] = None) -> None:
+        stock = HotInventoryService(db).hot_stock(listing_ids)
+        with self._lock:
+            if listing_ids is None:
+                self._stock = stock
+            else:
+                self._stock.update(stock)
+
+    def flush(self) -> int:
+        """Write back every pending sale; returns the units written"""
+        written = 0
+        db = self._session_factory()
+        try:
+            while True:
+                service = HotInventoryService(db)
+                rows = service.write_back(settings.HOT_INVENTORY_FLUSH_BATCH_SIZE)
+                if not rows:
+                    break
+                db.commit()
+                invalidate_listing(
+                    *(listing_id for listing_id, _, _, _ in rows),
+                    category_ids={category_id for _, _, category_id, _ in rows},
+                    seller_ids={seller_id for _, _, _, seller_id in rows},
+                )
+                written += sum(units for _, units, _, _ in rows)
+        except Exception:
+            db.rollback()
+            logger.exception("Hot inventory write-behind failed")
+        finally:
+            db.close()
+        self.written += written
+        return written
+
+    def enable(self, db: Session, listing_id: str) -> bool:
+        """Switch a listing to ledger allocation"""
+        listing_id = str(listing_id)
+        with self._lock:
+            if listing_id in self._stock:
+                return True
+            self._switching.add(listing_id)
+        try:
+            service = HotInventoryService(db)
+            if not service.set_hot(listing_id, True):
+                db.rollback()
+                return False
+            db.commit()
+            # Cold checkouts are refused from the commit on, so the counter
+            # read now cannot be undercut by one still in flight
+            stock = service.hot_stock([listing_id])
+            with self._lock:
+                self._stock.update(stock)
+        finally:
+            with self._lock:
+                self._switching.discard(listing_id)
+                self._lock.notify_all()
+        return True
+
+    def disable(self, db: Session, listing_id: str) -> bool:
+        """Hand a listing back to guarded SQL updates, writing back first.
+
+        Checkouts of the listing wait while it is handed back instead of
+        failing, and those already holding ledger units are waited for, so
+        every sale is on the row before cold checkouts see it.
+        """
+        listing_id = str(listing_id)
+        with self._lock:
+            self._switching.add(listing_id)
+            if not self._lock.wait_for(
+                lambda: listing_id not in self._unsettled,
+                settings.HOT_INVENTORY_SWITCH_TIMEOUT_SECONDS,
+            ):
+                logger.warning(
+                    "Hot inventory: checkouts of %s still open at hand back",
+                    listing_id,
+                )
+        try:
+            self.flush()
+            if not HotInventoryService(db).set_hot(listing_id, False):
+                db.rollback()
+                return False
+            db.commit()
+        finally:
+            with self._lock:
+                self._stock.pop(listing_id, None)
+                self._switching.discard(listing_id)
+                self._lock.notify_all()
+        # Sales that committed after the wait gave up
+        self.flush()
+        return True
+
+    def _run(self) -> None:
+        # Runs with no hot listing too: sales committed around a hand back
+        # are still pending. An idle flush is one indexed read.
+        while not self._stopping.wait(settings.HOT_INVENTORY_FLUSH_INTERVAL_SECONDS):
+            self.flush()
+
+    def start(self) -> None:
+        """Recover pending sales, rebuild the ledger, start the write-behind"""
+        self.flush()
+        db = self._session_factory()
+        try:
+            if settings.WEB_CONCURRENCY > 1:
+                cleared = HotInventoryService(db).clear_hot()
+                db.commit()
+                if cleared:
+                    logger.error(
+                        "Hot inventory needs a single worker process; %s hot "
+                        "listings handed back to guarded stock updates",
+                        cleared,
+                    )
+            else:
+                self.load(db)
+        finally:
+            db.close()
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="hot-inventory-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "listings": len(self._stock),
+            "allocated": self.allocated,
+            "written": self.written,
+        }
+
+
+hot_inventory = HotInventoryLedger()
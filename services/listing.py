@@ -1,35 +1,234 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import Integer, Row, and_, case, cast, func, or_, update
 from models.listing import Listing, ListingStatus
 from models.user import User
-from schemas.listing import ListingCreate, ListingUpdate
-from typing import List, Optional
+from schemas.listing import (
+    CategoryFacet,
+    ListingBulkOperation,
+    ListingCreate,
+    ListingFacets,
+    ListingUpdate,
+    PriceBucketFacet,
+)
+from typing import Iterator, List, Optional, Sequence, Tuple
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from enum import Enum
 from uuid import UUID
 from fastapi import HTTPException, status
+from cache import invalidate_listing
+from config import settings
+from fieldsets import Fieldset, project
+from services.category import CategoryService
+from services.listing_card import ListingCardService
 
 
 class ListingService:
+    # Browse pages and their validators must list the same rows in the same
+    # order, so a page's ETag describes exactly the page that is served
+    PAGE_ORDER = (Listing.created_at, Listing.id)
+
     def __init__(self, db: Session):
         self.db = db
 
-    def get_listings(
+    def _filtered_query(
         self,
-        skip: int = 0,
-        limit: int = 100,
+        *entities,
         category_id: Optional[UUID] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
         status: Optional[ListingStatus] = None,
-    ) -> List[Listing]:
-        query = self.db.query(Listing)
+        seller_id: Optional[UUID] = None,
+        search: Optional[str] = None,
+        include_descendants: bool = False,
+    ):
+        query = self.db.query(*(entities or (Listing,)))
 
-        if category_id:
-            query = query.filter(Listing.category_id == category_id)
+        if category_id and include_descendants:
+            query = query.filter(
+                Listing.category_id.in_(
+                    CategoryService(self.db).descendant_ids(category_id)
+                )
+            )
+        elif category_id:
+            query = query.filter(Listing.category_id == str(category_id))
+        if min_price is not None:
+            query = query.filter(Listing.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Listing.price <= max_price)
         if status:
-            query = query.filter(Listing.status == status)
+            query = query.filter(Listing.status == ListingStatus(status))
+        if seller_id:
+            query = query.filter(Listing.seller_id == str(seller_id))
+        if search:
+            pattern = f"%{search}%"
+            query = query.filter(
+                or_(Listing.title.ilike(pattern), Listing.description.ilike(pattern))
+            )
+
+        return query
+
+    @staticmethod
+    def normalize_filters(**filters) -> dict:
+        """Canonical browse filters: unset or false values dropped, search folded"""
+        normalized = {}
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                if not value:
+                    continue
+            elif key == "search":
+                value = " ".join(value.lower().split())
+                if not value:
+                    continue
+            elif key in ("min_price", "max_price"):
+                value = float(value)
+            elif isinstance(value, Enum):
+                value = value.value
+            else:
+                value = str(value)
+            normalized[key] = value
+        return normalized
+
+    def get_listings(self, skip: int = 0, limit: int = 100, **filters) -> List[Listing]:
+        return (
+            self._filtered_query(**filters)
+            .order_by(*self.PAGE_ORDER)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    # ListingRow fields
+    ROW_COLUMNS = (
+        Listing.title,
+        Listing.description,
+        Listing.price,
+        Listing.quantity,
+        Listing.category_id,
+        Listing.status,
+        Listing.id,
+        Listing.seller_id,
+    )
+
+    def get_listing_rows(
+        self, skip: int = 0, limit: int = 100, fields: Fieldset = None, **filters
+    ) -> List[Row]:
+        """Browse page as plain column rows, without loading ORM entities.
+
+        Only the ``fields`` columns are read, plus id, version and updated_at
+        for the page validators.
+        """
+        columns = project(self.ROW_COLUMNS, fields and fields | {"id"})
+        return (
+            self._filtered_query(
+                *columns, Listing.version, Listing.updated_at, **filters
+            )
+            .order_by(*self.PAGE_ORDER)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    EXPORT_COLUMNS = (
+        Listing.id,
+        Listing.title,
+        Listing.description,
+        Listing.price,
+        Listing.quantity,
+        Listing.category_id,
+        Listing.status,
+        Listing.seller_id,
+        Listing.created_at,
+        Listing.updated_at,
+    )
+
+    def iter_listing_batches(
+        self, batch_size: int = 1000, **filters
+    ) -> Iterator[Sequence[Row]]:
+        """Stream matching listings as column rows in batches of ``batch_size``.
+
+        Uses a server-side cursor and plain column rows, so neither the
+        driver nor the identity map holds more than one batch at a time.
+        """
+        statement = (
+            self._filtered_query(*self.EXPORT_COLUMNS, **filters)
+            .order_by(Listing.id)
+            .statement.execution_options(yield_per=batch_size)
+        )
+        yield from self.db.execute(statement).partitions()
+
+    def get_facets(self, **filters) -> ListingFacets:
+        """Category, status and price bucket counts from one GROUP BY pass"""
+        bounds = settings.LISTING_FACET_PRICE_BUCKETS
+        bucket = case(
+            *((Listing.price < bound, index) for index, bound in enumerate(bounds)),
+            else_=len(bounds),
+        ).label("bucket")
+        rows = (
+            self._filtered_query(
+                Listing.category_id,
+                Listing.status,
+                bucket,
+                func.count().label("count"),
+                **filters,
+            )
+            .group_by(Listing.category_id, Listing.status, bucket)
+            .all()
+        )
+
+        categories, statuses, buckets = {}, {}, [0] * (len(bounds) + 1)
+        for category_id, listing_status, bucket_index, count in rows:
+            categories[category_id] = categories.get(category_id, 0) + count
+            if listing_status is not None:
+                statuses[listing_status] = statuses.get(listing_status, 0) + count
+            buckets[bucket_index] += count
+
+        lower_bounds = (0, *bounds)
+        upper_bounds = (*bounds, None)
+        return ListingFacets(
+            total=sum(buckets),
+            categories=[
+                CategoryFacet(category_id=category_id, count=count)
+                for category_id, count in sorted(
+                    categories.items(), key=lambda item: -item[1]
+                )
+            ],
+            statuses=statuses,
+            price_buckets=[
+                PriceBucketFacet(min=low, max=high, count=count)
+                for low, high, count in zip(lower_bounds, upper_bounds, buckets)
+            ],
+        )
 
-        return query.offset(skip).limit(limit).all()
+    def count_listings(self, **filters) -> int:
+        return self._filtered_query(func.count(Listing.id), **filters).scalar()
+
+    def get_listings_validators(
+        self, skip: int = 0, limit: int = 100, **filters
+    ) -> List[Tuple[str, int, datetime]]:
+        """(id, version, updated_at) for the rows of a browse page"""
+        return (
+            self._filtered_query(
+                Listing.id, Listing.version, Listing.updated_at, **filters
+            )
+            .order_by(*self.PAGE_ORDER)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def get_listing_validator(self, listing_id: UUID) -> Optional[Tuple[int, datetime]]:
+        """(version, updated_at) of a listing without loading the full row"""
+        return (
+            self.db.query(Listing.version, Listing.updated_at)
+            .filter(Listing.id == str(listing_id))
+            .first()
+        )
 
     def get_listing_by_id(self, listing_id: UUID) -> Optional[Listing]:
-        return self.db.query(Listing).filter(Listing.id == listing_id).first()
+        return self.db.query(Listing).filter(Listing.id == str(listing_id)).first()
 
     def get_user_listings(
         self, user_id: UUID, skip: int = 0, limit: int = 100
@@ -47,12 +246,19 @@ class ListingService:
             title=listing.title,
             description=listing.description,
             price=listing.price,
-            category_id=listing.category_id,
-            seller_id=seller_id,
-            status=ListingStatus.AVAILABLE,
+            quantity=listing.quantity,
+            category_id=str(listing.category_id),
+            seller_id=str(seller_id),
+            status=listing.status or ListingStatus.ACTIVE,
         )
         self.db.add(db_listing)
+        self.db.flush()
+        ListingCardService(self.db).refresh_listings([db_listing.id])
         self.db.commit()
+        invalidate_listing(
+            category_ids=(db_listing.category_id,),
+            seller_ids=(db_listing.seller_id,),
+        )
         self.db.refresh(db_listing)
         return db_listing
 
@@ -61,35 +267,139 @@ class ListingService:
     ) -> Optional[Listing]:
         db_listing = (
             self.db.query(Listing)
-            .filter(and_(Listing.id == listing_id, Listing.seller_id == user_id))
+            .filter(
+                and_(Listing.id == str(listing_id), Listing.seller_id == str(user_id))
+            )
             .first()
         )
 
         if not db_listing:
             return None
 
-        for key, value in listing.model_dump(exclude_unset=True).items():
+        changes = listing.model_dump(exclude_unset=True)
+        # The in-memory ledger owns a hot listing's stock until it is turned off
+        if db_listing.hot_inventory and "quantity" in changes:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Turn off hot inventory before changing the quantity",
+            )
+
+        old_category_id = db_listing.category_id
+        for key, value in changes.items():
+            if isinstance(value, UUID):
+                value = str(value)
             setattr(db_listing, key, value)
+        # In SQL: a stock update may have bumped it since the read
+        db_listing.version = Listing.version + 1
 
+        ListingCardService(self.db).refresh_listings([db_listing.id])
         self.db.commit()
+        invalidate_listing(
+            listing_id,
+            category_ids=(old_category_id, db_listing.category_id),
+            seller_ids=(db_listing.seller_id,),
+        )
         self.db.refresh(db_listing)
         return db_listing
 
     def delete_listing(self, listing_id: UUID, user_id: UUID) -> bool:
-        result = (
-            self.db.query(Listing)
-            .filter(and_(Listing.id == listing_id, Listing.seller_id == user_id))
-            .delete()
+        criteria = and_(
+            Listing.id == str(listing_id), Listing.seller_id == str(user_id)
         )
+        db_listing = self.db.query(Listing.category_id).filter(criteria).first()
+        if not db_listing:
+            return False
+
+        result = self.db.query(Listing).filter(criteria).delete()
+        ListingCardService(self.db).refresh_listings([str(listing_id)])
         self.db.commit()
+        invalidate_listing(
+            listing_id,
+            category_ids=(db_listing.category_id,),
+            seller_ids=(str(user_id),),
+        )
         return result > 0
 
+    def bulk_update(
+        self,
+        operation: ListingBulkOperation,
+        seller_id: Optional[UUID] = None,
+        category_id: Optional[UUID] = None,
+        current_status: Optional[ListingStatus] = None,
+        new_status: Optional[ListingStatus] = None,
+        amount: Optional[Decimal] = None,
+        all_listings: bool = False,
+    ) -> int:
+        """Apply one operation to every matching listing in a single UPDATE.
+
+        Without any filter ``all_listings`` must be set explicitly.
+        """
+        criteria = []
+        if seller_id:
+            criteria.append(Listing.seller_id == str(seller_id))
+        if category_id:
+            criteria.append(Listing.category_id == str(category_id))
+        if current_status:
+            criteria.append(Listing.status == current_status)
+        if not criteria and not all_listings:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Set a filter, or filter.all to update every listing",
+            )
+
+        if operation == ListingBulkOperation.SET_STATUS:
+            values = {"status": new_status}
+        else:
+            # Integer cents throughout, so a change lands on exact cents
+            # instead of accumulating float error
+            cents = cast(func.round(Listing.price * 100), Integer)
+            if operation == ListingBulkOperation.PRICE_PERCENT:
+                # cents * (100 + amount) / 100 with amount as the exact
+                # ratio n / d, rounded half up by integer division
+                n, d = amount.quantize(
+                    Decimal("0.0001"), ROUND_HALF_UP
+                ).as_integer_ratio()
+                scale = 100 * d
+                new_cents = (cents * (scale + n) * 2 + scale) // (scale * 2)
+            else:
+                new_cents = cents + int(
+                    (amount * 100).quantize(Decimal(1), ROUND_HALF_UP)
+                )
+            values = {"price": case((new_cents < 0, 0), else_=new_cents) / 100}
+
+        statement = (
+            update(Listing)
+            .where(*criteria)
+            .values(
+                **values,
+                version=Listing.version + 1,
+                updated_at=datetime.utcnow(),
+            )
+            .returning(Listing.id, Listing.category_id, Listing.seller_id)
+            .execution_options(synchronize_session=False)
+        )
+        affected = self.db.execute(statement).all()
+        ListingCardService(self.db).refresh_listings(
+            listing_id for listing_id, _, _ in affected
+        )
+        self.db.commit()
+
+        if affected:
+            invalidate_listing(
+                *(listing_id for listing_id, _, _ in affected),
+                category_ids={category for _, category, _ in affected},
+                seller_ids={seller for _, _, seller in affected},
+            )
+        return len(affected)
+
     def update_listing_status(
         self, listing_id: UUID, status: ListingStatus, user_id: UUID
     ) -> Optional[Listing]:
         db_listing = (
             self.db.query(Listing)
-            .filter(and_(Listing.id == listing_id, Listing.seller_id == user_id))
+            .filter(
+                and_(Listing.id == str(listing_id), Listing.seller_id == str(user_id))
+            )
             .first()
         )
 
@@ -97,6 +407,13 @@ class ListingService:
             return None
 
         db_listing.status = status
+        db_listing.version = Listing.version + 1
+        ListingCardService(self.db).refresh_listings([db_listing.id])
         self.db.commit()
+        invalidate_listing(
+            listing_id,
+            category_ids=(db_listing.category_id,),
+            seller_ids=(db_listing.seller_id,),
+        )
         self.db.refresh(db_listing)
         return db_listing
@@ -0,0 +1,159 @@
+from typing import Iterable, List, Optional
+from uuid import UUID
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from models.category import Category
+from models.listing import Listing, ListingStatus
+from models.listing_card import ListingCard
+from models.review import Review
+from models.user import User
+
+_cards = ListingCard.__table__
+
+_CARD_COLUMNS = [
+    ListingCard.listing_id,
+    ListingCard.title,
+    ListingCard.price,
+    ListingCard.quantity,
+    ListingCard.status,
+    ListingCard.category_id,
+    ListingCard.category_name,
+    ListingCard.seller_id,
+    ListingCard.seller_username,
+    ListingCard.average_rating,
+    ListingCard.review_count,
+    ListingCard.created_at,
+    ListingCard.updated_at,
+]
+
+
+def _card_source(*criteria):
+    """SELECT producing listing_cards rows for the listings matching criteria"""
+    average_rating = (
+        select(func.avg(Review.rating))
+        .where(Review.listing_id == Listing.id)
+        .scalar_subquery()
+    )
+    review_count = (
+        select(func.count(Review.id))
+        .where(Review.listing_id == Listing.id)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            Listing.id,
+            Listing.title,
+            Listing.price,
+            Listing.quantity,
+            Listing.status,
+            Listing.category_id,
+            Category.name,
+            Listing.seller_id,
+            User.username,
+            average_rating,
+            review_count,
+            Listing.created_at,
+            Listing.updated_at,
+        )
+        .join(Category, Category.id == Listing.category_id)
+        .join(User, User.id == Listing.seller_id)
+        .where(*criteria)
+    )
+
+
+class ListingCardService:
+    """Keeps the listing_cards read model in step with its source tables.
+
+    Refreshes run inside the caller's transaction, so call them before the
+    commit of the write they follow. They flush first so pending ORM changes
+    are visible to the INSERT ... SELECT.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _refresh(self, *criteria) -> None:
+        affected = select(Listing.id).where(*criteria)
+        self.db.execute(delete(_cards).where(_cards.c.listing_id.in_(affected)))
+        self.db.execute(
+            insert(_cards).from_select(
+                [column.key for column in _CARD_COLUMNS], _card_source(*criteria)
+            )
+        )
+
+    def refresh_listings(self, listing_ids: Iterable) -> None:
+        listing_ids = list({str(listing_id) for listing_id in listing_ids})
+        if not listing_ids:
+            return
+        self.db.flush()
+        # Deleted listings have no source row, so drop their cards explicitly
+        self.db.execute(delete(_cards).where(_cards.c.listing_id.in_(listing_ids)))
+        self._refresh(Listing.id.in_(listing_ids))
+
+    def refresh_category(self, category_id: UUID) -> None:
+        self.db.flush()
+        self.db.execute(delete(_cards).where(_cards.c.category_id == str(category_id)))
+        self._refresh(Listing.category_id == str(category_id))
+
+    def refresh_seller(self, seller_id: UUID) -> None:
+        self.db.flush()
+        self.db.execute(delete(_cards).where(_cards.c.seller_id == str(seller_id)))
+        self._refresh(Listing.seller_id == str(seller_id))
+
+    def rebuild(self) -> int:
+        """Recreate every card from the source tables"""
+        self.db.execute(delete(_cards))
+        self.db.execute(
+            insert(_cards).from_select(
+                [column.key for column in _CARD_COLUMNS], _card_source()
+            )
+        )
+        self.db.commit()
+        return self.db.query(func.count(ListingCard.listing_id)).scalar()
+
+    def get_cards(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        category_id: Optional[UUID] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        status: Optional[ListingStatus] = None,
+        seller_id: Optional[UUID] = None,
+        search: Optional[str] = None,
+    ) -> List[ListingCard]:
+        query = self.db.query(ListingCard)
+
+        if category_id:
+            query = query.filter(ListingCard.category_id == str(category_id))
+        if min_price is not None:
+            query = query.filter(ListingCard.price >= min_price)
+        if max_price is not None:
+            query = query.filter(ListingCard.price <= max_price)
+        if status:
+            query = query.filter(ListingCard.status == ListingStatus(status))
+        if seller_id:
+            query = query.filter(ListingCard.seller_id == str(seller_id))
+        if search:
+            query = query.filter(ListingCard.title.ilike(f"%{search}%"))
+
+        # ListingService.PAGE_ORDER, so cards page exactly like /listings
+        return (
+            query.order_by(ListingCard.created_at, ListingCard.listing_id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+
+if __name__ == "__main__":
+    # python -m services.listing_card  -> rebuild the read model from scratch
+    import models  # noqa: F401  (register every mapper)
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {ListingCardService(db).rebuild()} listing cards")
+    finally:
+        db.close()
@@ -0,0 +1,285 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID, uuid4
+from pydantic import ValidationError
+from sqlalchemy import bindparam, case, false, insert, update
+from sqlalchemy.orm import Session
+from cache import invalidate_listing
+from config import settings
+from models.category import Category
+from models.listing import Listing
+from schemas.listing import (
+    ListingImportBatch,
+    ListingImportError,
+    ListingImportResult,
+    ListingImportRow,
+)
+from services.listing_card import ListingCardService
+
+# (row number, parsed fields or None, parse error or None)
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+_listings = Listing.__table__
+
+
+def _validation_message(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+class ListingImportService:
+    """Validate and upsert seller catalogs in batches keyed by external_key"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._known_categories: set = set()
+
+    def import_file(
+        self, file: BinaryIO, file_format: str, seller_id: UUID
+    ) -> ListingImportResult:
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            rows = (
+                self._parse_csv(text)
+                if file_format == "csv"
+                else self._parse_jsonl(text)
+            )
+            return self.import_rows(self._decoded(rows), seller_id)
+        finally:
+            text.detach()
+
+    @staticmethod
+    def _decoded(rows: Iterator[ParsedRow]) -> Iterator[ParsedRow]:
+        """End the rows with an error at the first byte that is not UTF-8.
+
+        Decoding happens lazily while batches are read, so earlier batches
+        may already be committed; the rest of the file is not imported.
+        """
+        row_number = 0
+        try:
+            for row_number, record, error in rows:
+                yield row_number, record, error
+        except UnicodeDecodeError:
+            yield (
+                row_number + 1,
+                None,
+                "File is not UTF-8 encoded; this and later rows were not imported",
+            )
+
+    def import_rows(
+        self, rows: Iterator[ParsedRow], seller_id: UUID
+    ) -> ListingImportResult:
+        result = ListingImportResult()
+        batch_number = 0
+        while True:
+            batch = list(islice(rows, settings.LISTING_IMPORT_BATCH_SIZE))
+            if not batch:
+                return result
+            batch_number += 1
+            self._import_batch(batch_number, batch, str(seller_id), result)
+
+    @staticmethod
+    def _parse_csv(text: io.TextIOBase) -> Iterator[ParsedRow]:
+        reader = csv.DictReader(text)
+        for row_number, record in enumerate(reader, start=1):
+            # Empty cells mean "not provided" so model defaults apply
+            yield row_number, {
+                key: value for key, value in record.items() if key and value != ""
+            }, None
+
+    @staticmethod
+    def _parse_jsonl(text: io.TextIOBase) -> Iterator[ParsedRow]:
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, None, f"Invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield row_number, None, "Each line must be a JSON object"
+                continue
+            yield row_number, record, None
+
+    def _resolve_categories(self, category_ids: set) -> None:
+        """Load every category id not seen yet with one IN query"""
+        missing = category_ids - self._known_categories
+        if missing:
+            self._known_categories.update(
+                category_id
+                for (category_id,) in self.db.query(Category.id).filter(
+                    Category.id.in_(missing)
+                )
+            )
+
+    def _import_batch(
+        self,
+        batch_number: int,
+        batch: List[ParsedRow],
+        seller_id: str,
+        result: ListingImportResult,
+    ) -> None:
+        failed = 0
+
+        def fail(row_number: int, detail: str, external_key: Optional[str] = None):
+            nonlocal failed
+            failed += 1
+            if len(result.errors) < settings.LISTING_IMPORT_MAX_ERRORS:
+                result.errors.append(
+                    ListingImportError(
+                        row=row_number, external_key=external_key, detail=detail
+                    )
+                )
+
+        # Later rows win when a key repeats within the batch
+        valid: Dict[str, Tuple[int, ListingImportRow]] = {}
+        for row_number, record, error in batch:
+            if error:
+                fail(row_number, error)
+                continue
+            try:
+                row = ListingImportRow.model_validate(record)
+            except ValidationError as e:
+                fail(row_number, _validation_message(e), record.get("external_key"))
+                continue
+            valid[row.external_key] = (row_number, row)
+
+        self._resolve_categories({str(row.category_id) for _, row in valid.values()})
+        for external_key, (row_number, row) in list(valid.items()):
+            if str(row.category_id) not in self._known_categories:
+                del valid[external_key]
+                fail(row_number, "Category not found", external_key)
+
+        existing = {
+            row.external_key: row
+            for row in self.db.query(
+                Listing.external_key,
+                Listing.id,
+                Listing.category_id,
+                Listing.reserved_quantity,
+                Listing.hot_inventory,
+            ).filter(
+                Listing.seller_id == seller_id,
+                Listing.external_key.in_(list(valid)),
+            )
+        }
+        for external_key, (row_number, row) in list(valid.items()):
+            listing = existing.get(external_key)
+            if listing is None:
+                continue
+            if listing.hot_inventory:
+                del valid[external_key]
+                fail(
+                    row_number,
+                    "Turn off hot inventory before changing the quantity",
+                    external_key,
+                )
+            elif row.quantity < listing.reserved_quantity:
+                del valid[external_key]
+                fail(
+                    row_number,
+                    f"quantity: {listing.reserved_quantity} units are reserved "
+                    "in carts",
+                    external_key,
+                )
+
+        inserts, updates = [], []
+        # listing id -> (row number, external key) of each update
+        updated_rows: Dict[str, Tuple[int, str]] = {}
+        touched_categories = set()
+        for external_key, (row_number, row) in valid.items():
+            values = {
+                "title": row.title,
+                "description": row.description,
+                "price": float(row.price),
+                "quantity": row.quantity,
+                "category_id": str(row.category_id),
+                "status": row.status,
+            }
+            touched_categories.add(values["category_id"])
+            if external_key in existing:
+                listing = existing[external_key]
+                touched_categories.add(listing.category_id)
+                values["b_quantity"] = values.pop("quantity")
+                updates.append({"b_id": listing.id, **values})
+                updated_rows[listing.id] = row_number, external_key
+            else:
+                inserts.append(
+                    {
+                        "id": str(uuid4()),
+                        "seller_id": seller_id,
+                        "external_key": external_key,
+                        "version": 1,
+                        **values,
+                    }
+                )
+
+        if inserts:
+            self.db.execute(insert(_listings), inserts)
+        if updates:
+            # Re-checked in the statement: a listing may have turned hot or
+            # gained reservations since the read above
+            quantity = bindparam("b_quantity")
+            reserved = _listings.c.reserved_quantity
+            updated = self.db.execute(
+                update(_listings)
+                .where(
+                    _listings.c.id == bindparam("b_id"),
+                    _listings.c.hot_inventory == false(),
+                )
+                .values(
+                    quantity=case((quantity > reserved, quantity), else_=reserved),
+                    version=_listings.c.version + 1,
+                ),
+                updates,
+            ).rowcount
+            if updated < len(updates):
+                # Skipped by the guard: report them instead of counting them
+                turned_hot = {
+                    listing_id
+                    for (listing_id,) in self.db.query(Listing.id).filter(
+                        Listing.id.in_(list(updated_rows)),
+                        Listing.hot_inventory.is_(True),
+                    )
+                }
+                for listing_id in turned_hot:
+                    row_number, external_key = updated_rows[listing_id]
+                    fail(
+                        row_number,
+                        "Turn off hot inventory before changing the quantity",
+                        external_key,
+                    )
+                updates = [
+                    values for values in updates if values["b_id"] not in turned_hot
+                ]
+        ListingCardService(self.db).refresh_listings(
+            [values["id"] for values in inserts]
+            + [values["b_id"] for values in updates]
+        )
+        self.db.commit()
+
+        if inserts or updates:
+            invalidate_listing(
+                *(values["b_id"] for values in updates),
+                category_ids=touched_categories,
+                seller_ids=(seller_id,),
+            )
+
+        result.processed += len(batch)
+        result.created += len(inserts)
+        result.updated += len(updates)
+        result.failed += failed
+        result.batches.append(
+            ListingImportBatch(
+                batch=batch_number,
+                rows=len(batch),
+                created=len(inserts),
+                updated=len(updates),
+                failed=failed,
+            )
+        )
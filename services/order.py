@@ -1,87 +1,187 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func, insert
 from models.order import Order, OrderItem, OrderStatus
 from models.listing import Listing, ListingStatus
-from schemas.order import OrderCreate, OrderUpdate
-from typing import List, Optional
+from schemas.order import OrderCreate, OrderItemRow, OrderRow, OrderUpdate
+from typing import Dict, List, Optional
 from uuid import UUID
 from fastapi import HTTPException, status
 from decimal import Decimal
+from fieldsets import Fieldset, project
+from cache import invalidate_listing, invalidate_orders
+from services.hot_inventory import (
+    HotInventoryService,
+    ListingSwitching,
+    hot_inventory,
+)
+from services.listing_card import ListingCardService
+from services.stock import StockService
 
 
 class OrderService:
     def __init__(self, db: Session):
         self.db = db
 
+    def _orders_query(self, *entities, buyer_id=None, status=None):
+        query = self.db.query(*(entities or (Order,)))
+        if buyer_id:
+            query = query.filter(Order.buyer_id == str(buyer_id))
+        if status:
+            query = query.filter(Order.status == OrderStatus(status))
+        return query
+
     def get_orders(
         self, buyer_id: UUID, skip: int = 0, limit: int = 100
     ) -> List[Order]:
-        return (
-            self.db.query(Order)
-            .filter(Order.buyer_id == buyer_id)
+        return self._orders_query(buyer_id=buyer_id).offset(skip).limit(limit).all()
+
+    def get_all_orders(
+        self, skip: int = 0, limit: int = 100, status: Optional[str] = None
+    ) -> List[Order]:
+        return self._orders_query(status=status).offset(skip).limit(limit).all()
+
+    def get_order_rows(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        buyer_id: Optional[UUID] = None,
+        status: Optional[str] = None,
+        fields: Fieldset = None,
+    ) -> List[OrderRow]:
+        """Orders page with their items as column projections (two queries).
+
+        The items query is skipped when ``fields`` leaves out ``items``.
+        """
+        columns = project(
+            (Order.buyer_id, Order.total_amount, Order.status, Order.id),
+            fields and fields | {"id"},
+        )
+        orders = {
+            order_id: OrderRow(buyer, total_amount, order_status, order_id, [])
+            for buyer, total_amount, order_status, order_id in self._orders_query(
+                *columns, buyer_id=buyer_id, status=status
+            )
             .offset(skip)
             .limit(limit)
-            .all()
-        )
+        }
+        if orders and (fields is None or "items" in fields):
+            items = self.db.query(
+                OrderItem.listing_id,
+                OrderItem.quantity,
+                OrderItem.id,
+                OrderItem.price_at_time,
+                OrderItem.order_id,
+            ).filter(OrderItem.order_id.in_(list(orders)))
+            for item in items:
+                orders[item.order_id].items.append(OrderItemRow(*item))
+        return list(orders.values())
+
+    def count_orders(
+        self, buyer_id: Optional[UUID] = None, status: Optional[str] = None
+    ) -> int:
+        return self._orders_query(
+            func.count(Order.id), buyer_id=buyer_id, status=status
+        ).scalar()
 
     def get_order_by_id(self, order_id: UUID, buyer_id: UUID) -> Optional[Order]:
         return (
             self.db.query(Order)
-            .filter(and_(Order.id == order_id, Order.buyer_id == buyer_id))
+            .filter(and_(Order.id == str(order_id), Order.buyer_id == str(buyer_id)))
             .first()
         )
 
     def create_order(self, order: OrderCreate) -> Order:
-        # Calculate total and verify listings
-        total_amount = Decimal("0")
-        order_items = []
-
+        quantities: Dict[str, int] = {}
         for item in order.items:
-            listing = (
-                self.db.query(Listing)
-                .filter(
-                    and_(
-                        Listing.id == item.listing_id,
-                        Listing.status == ListingStatus.AVAILABLE,
-                    )
+            if item.quantity != int(item.quantity):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Quantities must be whole units",
                 )
-                .first()
-            )
+            listing_id = str(item.listing_id)
+            quantities[listing_id] = quantities.get(listing_id, 0) + int(item.quantity)
 
-            if not listing:
+        prices = dict(
+            self.db.query(Listing.id, Listing.price).filter(
+                Listing.id.in_(list(quantities)),
+                Listing.status == ListingStatus.ACTIVE,
+            )
+        )
+        for listing_id in quantities:
+            if listing_id not in prices:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Listing {item.listing_id} not available",
+                    detail=f"Listing {listing_id} not available",
                 )
 
-            total_amount += listing.price * item.quantity
-            order_items.append(
-                {
-                    "listing_id": listing.id,
-                    "quantity": item.quantity,
-                    "price_at_time": listing.price,
-                }
+        try:
+            hot = hot_inventory.take(quantities)
+        except ListingSwitching as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": "1"},
+            )
+        if hot is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Not enough stock for the requested quantities",
             )
+        try:
+            db_order = self._store_order(order.buyer_id, quantities, prices, hot)
+        except BaseException:
+            hot_inventory.release(hot)
+            raise
+        hot_inventory.confirm(hot)
+        cold = [listing_id for listing_id in quantities if listing_id not in hot]
+        if cold:
+            invalidate_listing(*cold)
+        invalidate_orders(order.buyer_id)
+        self.db.refresh(db_order)
+        return db_order
 
-            # Update listing status
-            listing.status = ListingStatus.SOLD
+    def _store_order(
+        self,
+        buyer_id: UUID,
+        quantities: Dict[str, int],
+        prices: Dict[str, Decimal],
+        hot: Dict[str, int],
+    ) -> Order:
+        """Write side of create_order; ``hot`` units are already allocated"""
+        cold = {k: v for k, v in quantities.items() if k not in hot}
+        if not StockService(self.db).decrement(cold):
+            self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Not enough stock for the requested quantities",
+            )
 
-        # Create order
         db_order = Order(
-            buyer_id=order.buyer_id,
-            total_amount=total_amount,
+            buyer_id=str(buyer_id),
+            total_amount=sum(
+                Decimal(str(prices[listing_id])) * quantity
+                for listing_id, quantity in quantities.items()
+            ),
             status=OrderStatus.PENDING,
         )
         self.db.add(db_order)
         self.db.flush()  # Get order ID without committing
+        self.db.execute(
+            insert(OrderItem),
+            [
+                {
+                    "order_id": db_order.id,
+                    "listing_id": listing_id,
+                    "quantity": quantity,
+                    "price_at_time": prices[listing_id],
+                    "stock_applied": listing_id not in hot,
+                }
+                for listing_id, quantity in quantities.items()
+            ],
+        )
 
-        # Create order items
-        for item in order_items:
-            db_order_item = OrderItem(order_id=db_order.id, **item)
-            self.db.add(db_order_item)
-
+        ListingCardService(self.db).refresh_listings(cold)
         self.db.commit()
-        self.db.refresh(db_order)
         return db_order
 
     def update_order_status(
@@ -100,6 +200,7 @@ class OrderService:
 
         db_order.status = status
         self.db.commit()
+        invalidate_orders(db_order.buyer_id)
         self.db.refresh(db_order)
         return db_order
 
@@ -126,10 +227,21 @@ class OrderService:
         # Update order status
         db_order.status = OrderStatus.CANCELLED
 
-        # Return listings to available
+        # Return the units to stock; flash-sale units not yet written back
+        # never left the listing row and only go back to the ledger
+        quantities: Dict[str, int] = {}
         for item in db_order.items:
-            item.listing.status = ListingStatus.AVAILABLE
+            quantities[item.listing_id] = quantities.get(item.listing_id, 0) + int(
+                item.quantity
+            )
+        pending = HotInventoryService(self.db).claim_pending(db_order.id)
+        applied = {k: v - pending.get(k, 0) for k, v in quantities.items()}
+        StockService(self.db).restock({k: v for k, v in applied.items() if v})
 
+        ListingCardService(self.db).refresh_listings(quantities)
         self.db.commit()
+        hot_inventory.restore(quantities)
+        invalidate_listing(*quantities)
+        invalidate_orders(buyer_id)
         self.db.refresh(db_order)
         return db_order
@@ -0,0 +1,232 @@
+import heapq
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from config import settings
+from database import SessionLocal
+from models.reservation import StockReservation
+from services.stock import StockService
+
+logger = logging.getLogger("api")
+
+_reservations = StockReservation.__table__
+
+# (expires_at, reservation id) of a hold, as scheduled for expiry
+Hold = Tuple[datetime, str]
+
+
+def _per_listing(rows: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for listing_id, quantity in rows:
+        totals[listing_id] = totals.get(listing_id, 0) + quantity
+    return totals
+
+
+class ReservationService:
+    """Cart holds on listing stock that lapse after a TTL.
+
+    Every change runs in the caller's transaction. Holds are taken out by
+    deleting their rows with RETURNING before touching the listing
+    counters, so a hold is never released twice even when checkout and
+    the expiry worker race for it.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _take(self, *criteria) -> List[Tuple[str, int]]:
+        return self.db.execute(
+            delete(_reservations)
+            .where(*criteria)
+            .returning(_reservations.c.listing_id, _reservations.c.quantity)
+        ).all()
+
+    def hold(self, user_id: str, listing_id: str, quantity: int) -> Optional[Hold]:
+        """Set the buyer's hold on a listing to ``quantity`` units.
+
+        The TTL restarts. Returns the new hold for ``reservation_expiry``,
+        or None when the extra units are not available (roll back then).
+        """
+        user_id, listing_id = str(user_id), str(listing_id)
+        previous = sum(
+            units
+            for _, units in self._take(
+                _reservations.c.user_id == user_id,
+                _reservations.c.listing_id == listing_id,
+            )
+        )
+        stock = StockService(self.db)
+        extra = quantity - previous
+        if extra > 0 and not stock.reserve(listing_id, extra):
+            return None
+        if extra < 0:
+            stock.unreserve({listing_id: -extra})
+
+        hold = (
+            datetime.utcnow()
+            + timedelta(seconds=settings.STOCK_RESERVATION_TTL_SECONDS),
+            str(uuid.uuid4()),
+        )
+        self.db.execute(
+            insert(_reservations).values(
+                id=hold[1],
+                user_id=user_id,
+                listing_id=listing_id,
+                quantity=quantity,
+                expires_at=hold[0],
+            )
+        )
+        return hold
+
+    def release(self, user_id: str, listing_ids: Optional[List[str]] = None) -> None:
+        """Drop the buyer's holds (on ``listing_ids`` only, if given)"""
+        criteria = [_reservations.c.user_id == str(user_id)]
+        if listing_ids is not None:
+            criteria.append(_reservations.c.listing_id.in_(listing_ids))
+        StockService(self.db).unreserve(_per_listing(self._take(*criteria)))
+
+    def release_listing(self, listing_id: str) -> int:
+        """Drop every buyer's hold on a listing; returns the units released"""
+        released = _per_listing(
+            self._take(_reservations.c.listing_id == str(listing_id))
+        )
+        StockService(self.db).unreserve(released)
+        return sum(released.values())
+
+    def consume(self, user_id: str) -> Dict[str, int]:
+        """Remove the buyer's holds at checkout.
+
+        Returns the held units per listing; pass them to
+        ``StockService.decrement`` as ``held`` to turn them into sales.
+        """
+        return _per_listing(self._take(_reservations.c.user_id == str(user_id)))
+
+    def expire(self, reservation_ids: List[str]) -> int:
+        """Release those of the given holds that are past their expiry.
+
+        Returns the number of units released.
+        """
+        released = _per_listing(
+            self._take(
+                _reservations.c.id.in_(reservation_ids),
+                _reservations.c.expires_at <= datetime.utcnow(),
+            )
+        )
+        StockService(self.db).unreserve(released)
+        return sum(released.values())
+
+    def pending(self) -> List[Hold]:
+        """Every outstanding hold, to seed the expiry heap on startup"""
+        return [
+            tuple(row)
+            for row in self.db.execute(
+                select(_reservations.c.expires_at, _reservations.c.id)
+            )
+        ]
+
+
+class ReservationExpiry:
+    """Min-heap of hold expiry times drained by one background thread.
+
+    The thread sleeps until the earliest expiry and releases every due hold
+    in batches of STOCK_RESERVATION_EXPIRY_BATCH_SIZE, by id, so expiry
+    never scans the reservations table. Heap entries of holds that were
+    extended, checked out or released in the meantime fall through the
+    ``expires_at <= now`` guard in ``ReservationService.expire``.
+    """
+
+    RETRY_SECONDS = 1.0
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._heap: List[Hold] = []
+        self._wakeup = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.released = 0
+
+    def schedule(self, *holds: Hold) -> None:
+        if not holds:
+            return
+        with self._wakeup:
+            earliest = self._heap[0] if self._heap else None
+            for hold in holds:
+                heapq.heappush(self._heap, hold)
+            if self._heap[0] != earliest:
+                self._wakeup.notify()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _due(self, now: datetime) -> List[str]:
+        with self._wakeup:
+            due = []
+            while (
+                self._heap
+                and self._heap[0][0] <= now
+                and len(due) < settings.STOCK_RESERVATION_EXPIRY_BATCH_SIZE
+            ):
+                due.append(heapq.heappop(self._heap)[1])
+            return due
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Release one batch of due holds; returns the units released"""
+        now = now or datetime.utcnow()
+        reservation_ids = self._due(now)
+        if not reservation_ids:
+            return 0
+        db = self._session_factory()
+        try:
+            units = ReservationService(db).expire(reservation_ids)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Releasing expired stock reservations failed")
+            retry_at = now + timedelta(seconds=self.RETRY_SECONDS)
+            self.schedule(*((retry_at, rid) for rid in reservation_ids))
+            return 0
+        finally:
+            db.close()
+        self.released += units
+        return units
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                wait = None
+                if self._heap:
+                    wait = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                if wait is None or wait > 0:
+                    self._wakeup.wait(wait)
+                    continue
+            self.run_once()
+
+    def start(self) -> None:
+        """Load outstanding holds and start the worker thread"""
+        db = self._session_factory()
+        try:
+            self.schedule(*ReservationService(db).pending())
+        finally:
+            db.close()
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="reservation-expiry", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+reservation_expiry = ReservationExpiry()
@@ -3,8 +3,10 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from models.review import Review
 from models.order import Order, OrderStatus
-from schemas.review import ReviewCreate, ReviewUpdate
+from schemas.review import ReviewCreate, ReviewRow, ReviewUpdate
+from services.listing_card import ListingCardService
 from fastapi import HTTPException, status
+from fieldsets import Fieldset, project
 
 
 class ReviewService:
@@ -49,6 +51,7 @@ class ReviewService:
         )
 
         self.db.add(review)
+        ListingCardService(self.db).refresh_listings([review_data.listing_id])
         self.db.commit()
         self.db.refresh(review)
         return review
@@ -58,12 +61,37 @@ class ReviewService:
     ) -> list[Review]:
         return (
             self.db.query(Review)
-            .filter(Review.listing_id == listing_id)
+            .filter(Review.listing_id == str(listing_id))
             .offset(skip)
             .limit(limit)
             .all()
         )
 
+    def get_listing_review_rows(
+        self,
+        listing_id: UUID,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Fieldset = None,
+    ) -> list[ReviewRow]:
+        columns = project(
+            (
+                Review.listing_id,
+                Review.rating,
+                Review.comment,
+                Review.id,
+                Review.reviewer_id,
+            ),
+            fields,
+        )
+        rows = (
+            self.db.query(*columns)
+            .filter(Review.listing_id == str(listing_id))
+            .offset(skip)
+            .limit(limit)
+        )
+        return [ReviewRow(*row) for row in rows]
+
     def update_review(
         self, review_id: UUID, user_id: UUID, review_data: ReviewUpdate
     ) -> Review:
@@ -81,15 +109,18 @@ class ReviewService:
         if review_data.comment is not None:
             review.comment = review_data.comment
 
+        ListingCardService(self.db).refresh_listings([review.listing_id])
         self.db.commit()
         self.db.refresh(review)
         return review
 
     def delete_review(self, review_id: UUID, user_id: UUID) -> bool:
-        result = (
-            self.db.query(Review)
-            .filter(and_(Review.id == review_id, Review.reviewer_id == user_id))
-            .delete()
-        )
+        criteria = and_(Review.id == str(review_id), Review.reviewer_id == str(user_id))
+        review = self.db.query(Review.listing_id).filter(criteria).first()
+        if not review:
+            return False
+
+        result = self.db.query(Review).filter(criteria).delete()
+        ListingCardService(self.db).refresh_listings([review.listing_id])
         self.db.commit()
         return result > 0
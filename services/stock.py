@@ -0,0 +1,148 @@
+from typing import Mapping, Optional
+from sqlalchemy import and_, case, literal, update
+from sqlalchemy.orm import Session
+from models.listing import Listing, ListingStatus
+
+
+def _per_listing(quantities: Mapping[str, int]):
+    """CASE expression mapping each listing id to its units (0 otherwise)"""
+    if not quantities:
+        return literal(0)
+    return case(
+        {str(listing_id): units for listing_id, units in quantities.items()},
+        value=Listing.id,
+        else_=0,
+    )
+
+
+class StockService:
+    """Stock changes as guarded SQL updates instead of read-modify-write.
+
+    Quantities are never read into Python and written back, so concurrent
+    checkouts cannot oversell and need no lock beyond the UPDATE itself.
+    Units reserved by other carts (``reserved_quantity``) are never sold.
+    The statements run in the caller's transaction.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def decrement(
+        self, quantities: Mapping[str, int], held: Optional[Mapping[str, int]] = None
+    ) -> bool:
+        """Take ``quantities`` (listing id -> units) off active listings.
+
+        One UPDATE covers every listing, each row guarded by
+        ``available_quantity + held >= :n``, where ``held`` are units the
+        buyer had reserved and are now consumed; listings reaching zero
+        become SOLD_OUT. Returns False when any listing is inactive or
+        short, in which case the other rows may already be decremented and
+        the caller must roll back.
+        """
+        if not quantities:
+            return True
+        taken = _per_listing(quantities)
+        released = _per_listing(held or {})
+        result = self.db.execute(
+            update(Listing)
+            .where(
+                Listing.id.in_([str(listing_id) for listing_id in quantities]),
+                Listing.status == ListingStatus.ACTIVE,
+                # Hot listings are sold through services.hot_inventory only
+                Listing.hot_inventory.is_(False),
+                Listing.available_quantity + released >= taken,
+            )
+            .values(
+                quantity=Listing.quantity - taken,
+                reserved_quantity=Listing.reserved_quantity - released,
+                status=case(
+                    (
+                        Listing.quantity == taken,
+                        literal(ListingStatus.SOLD_OUT, Listing.status.type),
+                    ),
+                    else_=Listing.status,
+                ),
+                version=Listing.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == len(quantities)
+
+    def settle(self, quantities: Mapping[str, int]) -> None:
+        """Deduct sales that were already allocated elsewhere (no guard).
+
+        Used by the hot inventory write-behind, whose ledger has decided
+        every sale before it reaches the database.
+        """
+        if not quantities:
+            return
+        taken = _per_listing(quantities)
+        self.db.execute(
+            update(Listing)
+            .where(Listing.id.in_([str(listing_id) for listing_id in quantities]))
+            .values(
+                quantity=Listing.quantity - taken,
+                status=case(
+                    (
+                        and_(
+                            Listing.quantity == taken,
+                            Listing.status == ListingStatus.ACTIVE,
+                        ),
+                        literal(ListingStatus.SOLD_OUT, Listing.status.type),
+                    ),
+                    else_=Listing.status,
+                ),
+                version=Listing.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def reserve(self, listing_id: str, units: int) -> bool:
+        """Hold ``units`` of an active listing if that many are available"""
+        result = self.db.execute(
+            update(Listing)
+            .where(
+                Listing.id == str(listing_id),
+                Listing.status == ListingStatus.ACTIVE,
+                # Hot listings are never held (see HotInventoryService.set_hot)
+                Listing.hot_inventory.is_(False),
+                Listing.available_quantity >= units,
+            )
+            .values(reserved_quantity=Listing.reserved_quantity + units)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def unreserve(self, quantities: Mapping[str, int]) -> None:
+        """Release held units (listing id -> units) back to availability"""
+        if not quantities:
+            return
+        remaining = Listing.reserved_quantity - _per_listing(quantities)
+        self.db.execute(
+            update(Listing)
+            .where(Listing.id.in_([str(listing_id) for listing_id in quantities]))
+            .values(reserved_quantity=case((remaining > 0, remaining), else_=0))
+            .execution_options(synchronize_session=False)
+        )
+
+    def restock(self, quantities: Mapping[str, int]) -> None:
+        """Put ``quantities`` back, reactivating listings that had sold out"""
+        if not quantities:
+            return
+        returned = _per_listing(quantities)
+        self.db.execute(
+            update(Listing)
+            .where(Listing.id.in_([str(listing_id) for listing_id in quantities]))
+            .values(
+                quantity=Listing.quantity + returned,
+                status=case(
+                    (
+                        Listing.status == ListingStatus.SOLD_OUT,
+                        literal(ListingStatus.ACTIVE, Listing.status.type),
+                    ),
+                    else_=Listing.status,
+                ),
+                version=Listing.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
@@ -1,12 +1,27 @@
 import pytest
 import os
+import shutil
+import tempfile
+from types import SimpleNamespace
 from fastapi import status
+from fastapi.testclient import TestClient
 from tests.utils.string_generators import generate_random_string
 from tests.constants import UserRole, TestData
 from tests.controllers import AuthenticationController, AuthenticationEndpoints
 
 os.environ["SECRET_KEY"] = "your-secret-key"  # Must match the default in config.py
 
+# The in-process app (``api``) gets a scratch database and log file instead of
+# the ./marketplace.db and ./api.log a developer's server uses. Set before
+# anything imports database.
+SCRATCH_DIR = tempfile.mkdtemp(prefix="marketplace-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'marketplace.db')}"
+os.environ["API_LOG_FILE"] = os.path.join(SCRATCH_DIR, "api.log")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
 
 @pytest.fixture
 def controller():
@@ -92,3 +107,98 @@ def auth_user(controller, valid_headers, generate_unique_user):
         print(
             f"Note: User cleanup failed (this is expected if user was deleted in test): {e}"
         )
+
+
+@pytest.fixture(scope="session")
+def api():
+    """Fixture that serves the app in-process, background workers included.
+
+    Unlike the live server, its caches and metrics are the ones the test
+    process can inspect and reconfigure. It runs on the scratch database.
+    """
+    import main
+    from database import engine
+    from logging_config import file_handler
+
+    with TestClient(main.app) as client:
+        yield client
+    engine.dispose()
+    file_handler.close()
+
+
+@pytest.fixture
+def marketplace(api):
+    """
+    Fixture that seeds an admin, a seller, a buyer and a category.
+
+    Users are written straight to the database, since admins cannot
+    register, and authenticate with tokens signed by the app. ``user`` adds
+    more; ``category`` and ``listing`` create through the API as the admin
+    and (by default) the seller.
+    """
+    from database import SessionLocal
+    from models.roles import Role
+    from models.user import User
+    from services.auth import create_access_token
+
+    def user(role_name):
+        username = f"{role_name.value}_{generate_random_string(8)}"
+        with SessionLocal() as db:
+            role = db.query(Role).filter(Role.name == role_name.value).first()
+            if role is None:
+                role = Role(name=role_name.value)
+                db.add(role)
+            account = User(
+                username=username,
+                email=f"{username}@example.com",
+                password="unused",
+                role=role,
+            )
+            db.add(account)
+            db.commit()
+            user_id = account.id
+        token = create_access_token({"sub": username})
+        return SimpleNamespace(
+            id=user_id,
+            username=username,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    admin, seller, buyer = (
+        user(UserRole.ADMIN),
+        user(UserRole.SELLER),
+        user(UserRole.BUYER),
+    )
+
+    def category(**fields):
+        body = {"name": f"Category {generate_random_string(6)}", **fields}
+        response = api.post("/categories/", json=body, headers=admin.headers)
+        assert response.status_code == status.HTTP_201_CREATED, response.text
+        return response.json()
+
+    category_id = category()["id"]
+
+    def listing(headers=None, **fields):
+        body = {
+            "title": f"Listing {generate_random_string(6)}",
+            "price": "10.00",
+            "quantity": 5,
+            "category_id": category_id,
+            **fields,
+        }
+        response = api.post("/listings/", json=body, headers=headers or seller.headers)
+        assert response.status_code == status.HTTP_201_CREATED, response.text
+        return response.json()
+
+    return SimpleNamespace(
+        admin=admin.headers,
+        seller=seller.headers,
+        buyer=buyer.headers,
+        admin_id=admin.id,
+        seller_id=seller.id,
+        buyer_id=buyer.id,
+        category_id=category_id,
+        user=user,
+        category=category,
+        listing=listing,
+    )
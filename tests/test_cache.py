@@ -0,0 +1,241 @@
+import pytest
+from fastapi import status
+import cache
+from cache import CountCache, LRUCache, TaggedCache, get_total_count
+from config import settings
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fixture that freezes the cache clock; advance it by assigning ``now``."""
+
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr(cache.time, "monotonic", lambda: Clock.now)
+    return Clock
+
+
+class TestLRUCache:
+    """Test cases for the bounded LRU cache."""
+
+    def test_entry_cap_evicts_least_recently_used(self):
+        """Test the entry cap evicts the entry read longest ago."""
+        lru = LRUCache("test", max_entries=2, max_bytes=10_000, ttl=60)
+        lru.set("a", b"1")
+        lru.set("b", b"2")
+        assert lru.get("a") == b"1"
+        lru.set("c", b"3")
+
+        assert lru.get("b") is None
+        assert lru.get("a") == b"1"
+        assert lru.stats()["evictions"] == 1
+
+    def test_byte_cap(self):
+        """Test the byte cap holds and oversized values are not stored."""
+        lru = LRUCache("test", max_entries=100, max_bytes=500, ttl=60)
+        assert not lru.set("big", b"x" * 600)
+        for key in range(10):
+            lru.set(key, b"x" * 100)
+        stats = lru.stats()
+        assert 0 < stats["bytes"] <= 500
+        assert stats["entries"] < 10
+
+    def test_entries_expire(self, clock):
+        """Test an entry is a miss once its TTL has passed."""
+        lru = LRUCache("test", max_entries=10, max_bytes=10_000, ttl=5)
+        lru.set("a", b"1")
+        clock.now += 4
+        assert lru.get("a") == b"1"
+        clock.now += 2
+        assert lru.get("a") is None
+        assert lru.stats()["expirations"] == 1
+
+    def test_load_racing_invalidation_is_dropped(self):
+        """Test a value loaded before an invalidation is not cached."""
+        lru = LRUCache("test", max_entries=10, max_bytes=10_000, ttl=60)
+        generation = lru.generation()
+        lru.invalidate("a")
+        assert not lru.set("a", b"old", generation)
+        assert lru.get("a") is None
+
+
+class TestListingDetailCache:
+    """Test cases for the listing detail response cache."""
+
+    def test_repeat_read_is_a_hit(self, api, marketplace):
+        """Test the second read of a listing is served from the cache."""
+        listing = marketplace.listing()
+        api.get(f"/listings/{listing['id']}")
+        hits = api.get("/metrics/cache").json()["listing_detail"]["hits"]
+
+        response = api.get(f"/listings/{listing['id']}")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["id"] == listing["id"]
+        assert api.get("/metrics/cache").json()["listing_detail"]["hits"] == hits + 1
+
+    def test_update_invalidates(self, api, marketplace):
+        """Test an updated listing is read back fresh."""
+        listing = marketplace.listing()
+        api.get(f"/listings/{listing['id']}")
+        api.put(
+            f"/listings/{listing['id']}",
+            json={"title": "Fresh title"},
+            headers=marketplace.seller,
+        )
+        assert api.get(f"/listings/{listing['id']}").json()["title"] == "Fresh title"
+
+    def test_delete_invalidates(self, api, marketplace):
+        """Test a deleted listing is no longer served."""
+        listing = marketplace.listing()
+        api.get(f"/listings/{listing['id']}")
+        deleted = api.delete(f"/listings/{listing['id']}", headers=marketplace.seller)
+        assert deleted.status_code == status.HTTP_204_NO_CONTENT
+        response = api.get(f"/listings/{listing['id']}")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_checkout_invalidates(self, api, marketplace):
+        """Test a checkout's stock change shows on the next read."""
+        listing = marketplace.listing(quantity=3)
+        api.get(f"/listings/{listing['id']}")
+        api.post(
+            "/cart/items",
+            json={"listing_id": listing["id"], "quantity": 2},
+            headers=marketplace.buyer,
+        )
+        checkout = api.post("/cart/checkout", headers=marketplace.buyer)
+        assert checkout.status_code == status.HTTP_201_CREATED, checkout.text
+
+        assert api.get(f"/listings/{listing['id']}").json()["quantity"] == 1
+
+    def test_metrics_expose_size(self, api):
+        """Test the cache metrics report the hit ratio and memory use."""
+        stats = api.get("/metrics/cache").json()["listing_detail"]
+        for key in ("hit_ratio", "bytes", "max_bytes", "entries", "max_entries"):
+            assert key in stats
+        assert stats["bytes"] <= stats["max_bytes"]
+
+
+class TestTaggedCache:
+    """Test cases for the tagged cache behind browse pages."""
+
+    def test_invalidate_tags_is_targeted(self):
+        """Test invalidating a tag drops only the entries carrying it."""
+        tagged = TaggedCache("test", 10, 10_000, ttl=60, stale_ttl=0)
+        tagged.set("books", b"1", tags={"category:books"})
+        tagged.set("games", b"2", tags={"category:games"})
+        tagged.invalidate_tags("category:books")
+
+        assert tagged.get("books") is None
+        assert tagged.get("games") == b"2"
+
+    def test_stale_entry_has_one_refresher(self, clock):
+        """Test a stale entry is still served and only one caller refreshes it."""
+        tagged = TaggedCache("test", 10, 10_000, ttl=5, stale_ttl=30)
+        tagged.set("page", b"1")
+        assert tagged.lookup("page") == (b"1", TaggedCache.FRESH)
+
+        clock.now += 10
+        assert tagged.lookup("page") == (b"1", TaggedCache.STALE)
+        assert tagged.claim_refresh("page")
+        assert not tagged.claim_refresh("page")
+
+        clock.now += 30
+        assert tagged.lookup("page") == (None, None)
+
+
+class TestListingBrowseCache:
+    """Test cases for the listing browse page cache."""
+
+    def _hits(self, api):
+        return api.get("/metrics/cache").json()["listing_browse"]["hits"]
+
+    def test_query_is_normalized(self, api, marketplace):
+        """Test the same filters in another order hit the same page."""
+        marketplace.listing()
+        api.get(f"/listings/?category_id={marketplace.category_id}&limit=10")
+        hits = self._hits(api)
+
+        api.get(f"/listings/?limit=10&category_id={marketplace.category_id}")
+        assert self._hits(api) == hits + 1
+
+    def test_write_evicts_only_its_category(self, api, marketplace):
+        """Test a new listing refreshes its category's page and no other."""
+        other_category = marketplace.category()["id"]
+        marketplace.listing()
+        marketplace.listing(category_id=other_category)
+        own_url = f"/listings/?category_id={marketplace.category_id}"
+        other_url = f"/listings/?category_id={other_category}"
+        api.get(own_url)
+        api.get(other_url)
+
+        marketplace.listing()
+        hits = self._hits(api)
+        assert len(api.get(other_url).json()) == 1
+        assert self._hits(api) == hits + 1
+        assert len(api.get(own_url).json()) == 2
+        assert self._hits(api) == hits + 1
+
+
+class TestTotalCounts:
+    """Test cases for cached total counts."""
+
+    def test_write_marks_count_as_estimate(self):
+        """Test a tagged write turns an exact count into an estimate."""
+        counts = CountCache("test", max_entries=10, ttl=60)
+        counts.set("page", 7, counts.generation(), tags={"category:a"})
+        assert counts.get("page") == (7, True)
+
+        counts.mark_dirty("category:a")
+        assert counts.get("page") == (7, False)
+
+    def test_count_racing_a_write_is_an_estimate(self):
+        """Test a count taken across a write is not reported exact."""
+        counts = CountCache("test", max_entries=10, ttl=60)
+        generation = counts.generation()
+        counts.mark_all_dirty()
+        counts.set("page", 7, generation)
+        assert counts.get("page") == (7, False)
+
+    def test_large_dirty_count_is_not_recounted(self, monkeypatch):
+        """Test dirty counts above the threshold are served without a recount."""
+        monkeypatch.setattr(cache, "total_count_cache", CountCache("test", 10, 60))
+        monkeypatch.setattr(settings, "TOTAL_COUNT_EXACT_THRESHOLD", 100)
+        tags = {"category:a"}
+        assert get_total_count("big", tags, lambda: 500) == (500, True)
+        assert get_total_count("small", tags, lambda: 5) == (5, True)
+        cache.total_count_cache.mark_dirty("category:a")
+
+        assert get_total_count("big", tags, lambda: 501) == (500, False)
+        assert get_total_count("small", tags, lambda: 6) == (6, True)
+
+    def test_listing_total_follows_writes(self, api, marketplace):
+        """Test the listing total header is exact and follows new listings."""
+        url = f"/listings/?category_id={marketplace.category_id}&limit=1"
+        marketplace.listing()
+        marketplace.listing()
+        response = api.get(url)
+        assert response.headers["x-total-count"] == "2"
+        assert response.headers["x-total-count-exact"] == "true"
+        assert len(response.json()) == 1
+
+        marketplace.listing()
+        assert api.get(url).headers["x-total-count"] == "3"
+
+    def test_order_total_follows_checkout(self, api, marketplace):
+        """Test the buyer's order total counts a new checkout."""
+        assert (
+            api.get("/orders/", headers=marketplace.buyer).headers["x-total-count"]
+            == "0"
+        )
+        listing = marketplace.listing()
+        api.post(
+            "/cart/items",
+            json={"listing_id": listing["id"], "quantity": 1},
+            headers=marketplace.buyer,
+        )
+        api.post("/cart/checkout", headers=marketplace.buyer)
+
+        response = api.get("/orders/", headers=marketplace.buyer)
+        assert response.headers["x-total-count"] == "1"
+        assert response.headers["x-total-count-exact"] == "true"
@@ -0,0 +1,186 @@
+import threading
+from contextlib import contextmanager
+from fastapi import status
+from sqlalchemy import event
+from database import SessionLocal, engine
+from services.cart import CartService
+from tests.constants import UserRole
+
+
+@contextmanager
+def count_statements():
+    """Count the SQL statements this thread sends while the block runs."""
+    thread = threading.get_ident()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+class TestSetBasedCheckout:
+    """Test cases for the set-based checkout."""
+
+    def _fill_cart(self, api, marketplace, *listings, quantity=1):
+        for listing in listings:
+            response = api.post(
+                "/cart/items",
+                json={"listing_id": listing["id"], "quantity": quantity},
+                headers=marketplace.buyer,
+            )
+            assert response.status_code == status.HTTP_201_CREATED, response.text
+
+    def _quantity(self, api, listing):
+        return api.get(f"/listings/{listing['id']}").json()["quantity"]
+
+    def test_checkout_writes_one_order(self, api, marketplace):
+        """Test every cart line becomes an item of one order."""
+        listings = [marketplace.listing(price="2.50", quantity=4) for _ in range(3)]
+        self._fill_cart(api, marketplace, *listings, quantity=2)
+
+        response = api.post("/cart/checkout", headers=marketplace.buyer)
+        assert response.status_code == status.HTTP_201_CREATED
+        order = response.json()
+        assert order["total_amount"] == "15.00"
+        assert {item["listing_id"] for item in order["items"]} == {
+            listing["id"] for listing in listings
+        }
+        assert [self._quantity(api, listing) for listing in listings] == [2, 2, 2]
+        assert api.get("/cart/items", headers=marketplace.buyer).json() == []
+
+    def test_short_item_fails_the_whole_checkout(self, api, marketplace):
+        """Test one short listing leaves every listing and the cart untouched."""
+        plenty = marketplace.listing(quantity=5)
+        scarce = marketplace.listing(quantity=2)
+        self._fill_cart(api, marketplace, plenty, scarce, quantity=2)
+        api.put(
+            f"/listings/{scarce['id']}",
+            json={"quantity": 1},
+            headers=marketplace.seller,
+        )
+
+        response = api.post("/cart/checkout", headers=marketplace.buyer)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == f"Not enough stock for {scarce['title']}"
+        assert self._quantity(api, plenty) == 5
+        assert len(api.get("/cart/items", headers=marketplace.buyer).json()) == 2
+
+    def test_inactive_listing_fails_checkout(self, api, marketplace):
+        """Test a listing taken off sale after it was carted stops the checkout."""
+        listing = marketplace.listing()
+        self._fill_cart(api, marketplace, listing)
+        api.put(
+            f"/listings/{listing['id']}",
+            json={"status": "inactive"},
+            headers=marketplace.seller,
+        )
+
+        response = api.post("/cart/checkout", headers=marketplace.buyer)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"].endswith("is no longer available")
+
+    def test_empty_cart(self, api, marketplace):
+        """Test an empty cart cannot be checked out."""
+        response = api.post("/cart/checkout", headers=marketplace.buyer)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Cart is empty"
+
+    def test_statement_count_does_not_grow_with_the_cart(self, api, marketplace):
+        """Test a checkout sends the same statements whatever the cart size."""
+        counts = []
+        for lines in (1, 12):
+            buyer = marketplace.user(UserRole.BUYER)
+            for _ in range(lines):
+                api.post(
+                    "/cart/items",
+                    json={"listing_id": marketplace.listing()["id"], "quantity": 1},
+                    headers=buyer.headers,
+                )
+            with SessionLocal() as db, count_statements() as statements:
+                CartService(db).process_checkout(buyer.id)
+            counts.append(len(statements))
+        assert counts[0] == counts[1]
+
+
+class TestCartSummary:
+    """Test cases for the live cart summary."""
+
+    def _add(self, api, marketplace, listing, quantity=1):
+        api.post(
+            "/cart/items",
+            json={"listing_id": listing["id"], "quantity": quantity},
+            headers=marketplace.buyer,
+        )
+
+    def _summary(self, api, marketplace):
+        response = api.get("/cart/summary", headers=marketplace.buyer)
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+
+    def _reprice(self, api, marketplace, listing, **fields):
+        response = api.put(
+            f"/listings/{listing['id']}", json=fields, headers=marketplace.seller
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_totals_are_exact_cents(self, api, marketplace):
+        """Test subtotals and totals are summed in cents."""
+        self._add(api, marketplace, marketplace.listing(price="0.10"), quantity=3)
+        self._add(api, marketplace, marketplace.listing(price="0.20"), quantity=1)
+
+        summary = self._summary(api, marketplace)
+        assert [item["subtotal"] for item in summary["items"]] == ["0.30", "0.20"]
+        assert summary["total"] == summary["current_total"] == "0.50"
+        assert summary["out_of_stock_items"] == 0
+
+    def test_live_price_changes(self, api, marketplace):
+        """Test repricing, including to zero, shows against the carted price."""
+        dearer = marketplace.listing(price="10.00")
+        free = marketplace.listing(price="4.00")
+        self._add(api, marketplace, dearer, quantity=2)
+        self._add(api, marketplace, free)
+        self._summary(api, marketplace)
+        self._reprice(api, marketplace, dearer, price="12.50")
+        self._reprice(api, marketplace, free, price="0")
+
+        summary = self._summary(api, marketplace)
+        lines = {item["listing_id"]: item for item in summary["items"]}
+        assert lines[dearer["id"]]["current_price"] == "12.50"
+        assert lines[dearer["id"]]["price_change"] == "2.50"
+        assert lines[free["id"]]["current_price"] == "0.00"
+        assert lines[free["id"]]["price_change"] == "-4.00"
+        assert summary["total"] == "24.00"
+        assert summary["current_total"] == "25.00"
+
+    def test_out_of_stock_flags(self, api, marketplace):
+        """Test lines beyond the stock or on inactive listings are flagged."""
+        short = marketplace.listing(quantity=3)
+        hidden = marketplace.listing()
+        fine = marketplace.listing()
+        self._add(api, marketplace, short, quantity=3)
+        self._add(api, marketplace, hidden)
+        self._add(api, marketplace, fine)
+        self._reprice(api, marketplace, short, quantity=2)
+        self._reprice(api, marketplace, hidden, status="inactive")
+
+        summary = self._summary(api, marketplace)
+        flags = {item["listing_id"]: item["out_of_stock"] for item in summary["items"]}
+        assert flags == {short["id"]: True, hidden["id"]: True, fine["id"]: False}
+        assert summary["out_of_stock_items"] == 2
+
+    def test_summary_is_memoized_until_the_cart_changes(self, api, marketplace):
+        """Test repeat summaries are cache hits and cart writes refresh them."""
+        self._add(api, marketplace, marketplace.listing())
+        self._summary(api, marketplace)
+        hits = api.get("/metrics/cache").json()["cart_summary"]["hits"]
+        self._summary(api, marketplace)
+        assert api.get("/metrics/cache").json()["cart_summary"]["hits"] == hits + 1
+
+        self._add(api, marketplace, marketplace.listing(price="1.00"))
+        assert self._summary(api, marketplace)["total"] == "11.00"
@@ -0,0 +1,158 @@
+import pytest
+from fastapi import status
+import cart_token
+from cart_token import CART_TOKEN_HEADER, decode_cart, encode_cart
+from config import settings
+from database import SessionLocal
+from models.cart import CartItem
+
+LISTING_ID = "12345678-1234-5678-1234-567812345678"
+
+
+class TestCartToken:
+    """Test cases for signed anonymous cart tokens."""
+
+    def test_round_trip(self):
+        """Test a token decodes to the cart it was issued for."""
+        assert decode_cart(encode_cart({LISTING_ID: 3})) == {LISTING_ID: 3}
+        assert decode_cart(None) == {}
+
+    @pytest.mark.parametrize("part", [0, 1])
+    def test_tampered_token(self, part):
+        """Test changing the payload or the signature voids the token."""
+        pieces = encode_cart({LISTING_ID: 1}).split(".")
+        pieces[part] = ("A" if pieces[part][0] != "A" else "B") + pieces[part][1:]
+        with pytest.raises(ValueError, match="Invalid cart token"):
+            decode_cart(".".join(pieces))
+
+    def test_expired_token(self, monkeypatch):
+        """Test a token is refused once its TTL has passed."""
+        token = encode_cart({LISTING_ID: 1})
+        later = cart_token.time.time() + settings.CART_TOKEN_TTL_SECONDS + 1
+        monkeypatch.setattr(cart_token.time, "time", lambda: later)
+        with pytest.raises(ValueError, match="Cart token has expired"):
+            decode_cart(token)
+
+    def test_size_limits(self, monkeypatch):
+        """Test oversized tokens and carts with too many lines are refused."""
+        with pytest.raises(ValueError, match="too large"):
+            decode_cart("a" * (settings.CART_TOKEN_MAX_BYTES + 1))
+
+        monkeypatch.setattr(settings, "CART_TOKEN_MAX_ITEMS", 2)
+        items = {f"12345678-1234-5678-1234-56781234567{n}": 1 for n in range(3)}
+        with pytest.raises(ValueError, match="at most 2 items"):
+            encode_cart(items)
+
+    @pytest.mark.parametrize("token", ["no-dot", "a.b.c", "!!.!!"])
+    def test_malformed_token(self, token):
+        """Test tokens that are not two base64 parts are refused."""
+        with pytest.raises(ValueError):
+            decode_cart(token)
+
+
+class TestAnonymousCart:
+    """Test cases for the anonymous cart endpoints."""
+
+    def _cart_rows(self):
+        with SessionLocal() as db:
+            return db.query(CartItem).count()
+
+    def _put(self, api, listing, quantity, token=None):
+        return api.put(
+            f"/cart/anonymous/items/{listing['id']}",
+            json={"quantity": quantity},
+            headers={CART_TOKEN_HEADER: token} if token else {},
+        )
+
+    def test_browsing_writes_nothing(self, api, marketplace):
+        """Test building and editing a token cart adds no cart rows."""
+        lamp = marketplace.listing(price="4.25")
+        desk = marketplace.listing(price="1.00")
+        rows = self._cart_rows()
+
+        first = self._put(api, lamp, 2)
+        assert first.status_code == status.HTTP_200_OK
+        token = self._put(api, desk, 1, first.json()["token"]).json()["token"]
+        cart = api.get("/cart/anonymous", headers={CART_TOKEN_HEADER: token}).json()
+        assert cart["total"] == "9.50"
+        assert {item["listing_id"] for item in cart["items"]} == {
+            lamp["id"],
+            desk["id"],
+        }
+
+        removed = api.delete(
+            f"/cart/anonymous/items/{desk['id']}", headers={CART_TOKEN_HEADER: token}
+        ).json()
+        assert [item["listing_id"] for item in removed["items"]] == [lamp["id"]]
+        assert self._cart_rows() == rows
+
+    def test_items_are_checked(self, api, marketplace):
+        """Test token carts refuse more units than are in stock."""
+        listing = marketplace.listing(quantity=2)
+        response = self._put(api, listing, 3)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Not enough items in stock"
+
+    def test_bad_token_is_a_400(self, api):
+        """Test a forged token is refused."""
+        response = api.get("/cart/anonymous", headers={CART_TOKEN_HEADER: "x.y"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_merge_at_login(self, api, marketplace, generate_unique_user):
+        """Test logging in with a token folds it into the user's cart."""
+        listing = marketplace.listing()
+        token = self._put(api, listing, 2).json()["token"]
+        user = generate_unique_user()
+        assert api.post("/register", json=user).status_code == (
+            status.HTTP_204_NO_CONTENT
+        )
+
+        login = api.post(
+            "/login",
+            json={"username": user["username"], "password": user["password"]},
+            headers={CART_TOKEN_HEADER: token},
+        )
+        assert login.status_code == status.HTTP_200_OK
+        assert login.headers["x-cart-merged"] == "true"
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        items = api.get("/cart/items", headers=headers).json()
+        assert [(item["listing_id"], item["quantity"]) for item in items] == [
+            (listing["id"], 2)
+        ]
+
+    def test_merge_at_checkout(self, api, marketplace):
+        """Test a token sent with checkout is bought with the cart."""
+        listing = marketplace.listing(quantity=3)
+        token = self._put(api, listing, 2).json()["token"]
+
+        response = api.post(
+            "/cart/checkout",
+            headers={**marketplace.buyer, CART_TOKEN_HEADER: token},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["items"][0]["listing_id"] == listing["id"]
+        assert api.get(f"/listings/{listing['id']}").json()["quantity"] == 1
+
+    def test_token_is_merged_once(self, api, marketplace, monkeypatch):
+        """Test a token resent after checkout does not refill the cart."""
+        listing = marketplace.listing(quantity=5)
+        token = self._put(api, listing, 2).json()["token"]
+        headers = {**marketplace.buyer, CART_TOKEN_HEADER: token}
+        assert api.post("/cart/checkout", headers=headers).status_code == (
+            status.HTTP_201_CREATED
+        )
+
+        again = api.post("/cart/checkout", headers=headers)
+        assert again.status_code == status.HTTP_400_BAD_REQUEST
+        assert again.json()["detail"] == "Cart is empty"
+        assert api.get(f"/listings/{listing['id']}").json()["quantity"] == 3
+        assert len(api.get("/orders/", headers=marketplace.buyer).json()) == 1
+
+        # A cart the visitor builds afterwards is merged again
+        later = cart_token.time.time() + 1
+        monkeypatch.setattr(cart_token.time, "time", lambda: later)
+        token = self._put(api, listing, 1).json()["token"]
+        headers = {**marketplace.buyer, CART_TOKEN_HEADER: token}
+        assert api.post("/cart/checkout", headers=headers).status_code == (
+            status.HTTP_201_CREATED
+        )
@@ -0,0 +1,196 @@
+from uuid import uuid4
+from fastapi import status
+from sqlalchemy import select
+from config import settings
+from database import SessionLocal
+from models.category import Category, CategoryClosure
+from services.category import CategoryService
+from services.category_catalog import (
+    CATEGORY_CATALOG,
+    bump_catalog_version,
+    catalog_version,
+)
+
+
+class TestCategoryTree:
+    """Test cases for the closure-table category hierarchy."""
+
+    def _tree(self, marketplace):
+        """tools > power > drills, with a listing in drills"""
+        tools = marketplace.category(name="Tools")
+        power = marketplace.category(name="Power", parent_id=tools["id"])
+        drills = marketplace.category(name="Drills", parent_id=power["id"])
+        listing = marketplace.listing(category_id=drills["id"])
+        return tools, power, drills, listing
+
+    def _browse(self, api, category_id, include_descendants=True):
+        response = api.get(
+            f"/listings/?category_id={category_id}"
+            f"&include_descendants={str(include_descendants).lower()}"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        return [listing["id"] for listing in response.json()]
+
+    def _closure(self, *category_ids):
+        with SessionLocal() as db:
+            return set(
+                db.execute(
+                    select(
+                        CategoryClosure.ancestor_id,
+                        CategoryClosure.descendant_id,
+                        CategoryClosure.depth,
+                    ).where(CategoryClosure.descendant_id.in_(category_ids))
+                )
+            )
+
+    def test_subtree(self, api, marketplace):
+        """Test the tree endpoint nests a subtree under its root."""
+        tools, power, drills, _ = self._tree(marketplace)
+        response = api.get(f"/categories/tree?root_id={tools['id']}")
+        assert response.status_code == status.HTTP_200_OK
+        (root,) = response.json()
+        assert root["id"] == tools["id"]
+        assert root["children"][0]["id"] == power["id"]
+        assert root["children"][0]["children"][0]["id"] == drills["id"]
+        assert self._closure(drills["id"]) == {
+            (drills["id"], drills["id"], 0),
+            (power["id"], drills["id"], 1),
+            (tools["id"], drills["id"], 2),
+        }
+
+    def test_include_descendants(self, api, marketplace):
+        """Test browsing a category can include every subcategory's listings."""
+        tools, _, drills, listing = self._tree(marketplace)
+        assert self._browse(api, tools["id"]) == [listing["id"]]
+        assert self._browse(api, tools["id"], include_descendants=False) == []
+        assert self._browse(api, drills["id"], include_descendants=False) == [
+            listing["id"]
+        ]
+
+    def test_move_subtree(self, api, marketplace):
+        """Test moving a category carries its subtree and listings along."""
+        tools, power, drills, listing = self._tree(marketplace)
+        garden = marketplace.category(name="Garden")
+        assert self._browse(api, tools["id"]) == [listing["id"]]
+
+        moved = api.put(
+            f"/categories/{power['id']}",
+            json={"parent_id": garden["id"]},
+            headers=marketplace.admin,
+        )
+        assert moved.status_code == status.HTTP_200_OK
+        assert self._browse(api, tools["id"]) == []
+        assert self._browse(api, garden["id"]) == [listing["id"]]
+        assert self._closure(drills["id"]) == {
+            (drills["id"], drills["id"], 0),
+            (power["id"], drills["id"], 1),
+            (garden["id"], drills["id"], 2),
+        }
+
+    def test_move_under_own_subtree_is_rejected(self, api, marketplace):
+        """Test a category cannot become its own descendant."""
+        tools, _, drills, _ = self._tree(marketplace)
+        response = api.put(
+            f"/categories/{tools['id']}",
+            json={"parent_id": drills["id"]},
+            headers=marketplace.admin,
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_unknown_parent_is_rejected(self, api, marketplace):
+        """Test a category cannot hang under a parent that does not exist."""
+        response = api.post(
+            "/categories/",
+            json={
+                "name": "Orphan",
+                "parent_id": "00000000-0000-0000-0000-000000000000",
+            },
+            headers=marketplace.admin,
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_delete_lifts_children(self, api, marketplace):
+        """Test deleting a category hangs its children on its parent."""
+        tools, power, drills, listing = self._tree(marketplace)
+        deleted = api.delete(f"/categories/{power['id']}", headers=marketplace.admin)
+        assert deleted.status_code == status.HTTP_204_NO_CONTENT
+
+        assert api.get(f"/categories/{drills['id']}").json()["parent_id"] == tools["id"]
+        assert self._closure(drills["id"]) == {
+            (drills["id"], drills["id"], 0),
+            (tools["id"], drills["id"], 1),
+        }
+        assert self._browse(api, tools["id"]) == [listing["id"]]
+
+    def test_rebuild_matches_maintained_closure(self, marketplace):
+        """Test rebuilding from parent_id reproduces the maintained rows."""
+        _, power, drills, _ = self._tree(marketplace)
+        before = self._closure(power["id"], drills["id"])
+        with SessionLocal() as db:
+            CategoryService(db).rebuild_closure()
+        assert self._closure(power["id"], drills["id"]) == before
+
+
+class TestCategoryCatalog:
+    """Test cases for the in-memory category catalog."""
+
+    def test_bump_upserts_the_stamp(self):
+        """Test the first bump of a catalog inserts it and later bumps add one."""
+        name = f"catalog-{uuid4()}"
+        with SessionLocal() as db:
+            assert catalog_version(db, name) == 0
+            bump_catalog_version(db, name)
+            bump_catalog_version(db, name)
+            db.commit()
+            assert catalog_version(db, name) == 2
+
+    def test_writes_swap_the_snapshot(self, api, marketplace):
+        """Test a committed category change is served straight away."""
+        created = marketplace.category(name="Fresh")
+        listed = api.get("/categories/?limit=1000").json()
+        assert created["id"] in {category["id"] for category in listed}
+
+        api.put(
+            f"/categories/{created['id']}",
+            json={"name": "Renamed"},
+            headers=marketplace.admin,
+        )
+        assert api.get(f"/categories/{created['id']}").json()["name"] == "Renamed"
+
+    def test_other_worker_change_is_picked_up(self, api, marketplace, monkeypatch):
+        """Test a change committed elsewhere loads from the version stamp."""
+        api.get("/categories/")
+        with SessionLocal() as db:
+            category = Category(name="From another worker")
+            db.add(category)
+            db.flush()
+            db.add(
+                CategoryClosure(
+                    ancestor_id=category.id, descendant_id=category.id, depth=0
+                )
+            )
+            bump_catalog_version(db, CATEGORY_CATALOG)
+            db.commit()
+            category_id = category.id
+
+        # A miss by id rechecks the stamp right away
+        assert api.get(f"/categories/{category_id}").status_code == status.HTTP_200_OK
+
+        with SessionLocal() as db:
+            db.get(Category, category_id).name = "Renamed elsewhere"
+            bump_catalog_version(db, CATEGORY_CATALOG)
+            db.commit()
+        monkeypatch.setattr(settings, "CATEGORY_CATALOG_RECHECK_SECONDS", 0)
+        assert (
+            api.get(f"/categories/{category_id}").json()["name"] == "Renamed elsewhere"
+        )
+
+    def test_pages_are_slices_of_the_snapshot(self, api, marketplace):
+        """Test every page is a window of the full list with its own ETag."""
+        marketplace.category()
+        everything = api.get("/categories/?limit=1000").json()
+        first = api.get("/categories/?limit=1")
+        second = api.get("/categories/?skip=1&limit=1")
+
+        assert first.json() + second.json() == everything[:2]
+        assert first.headers["etag"] != second.headers["etag"]
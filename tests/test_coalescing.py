@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import pytest
+from fastapi import status
+from cache import listing_detail_cache
+from coalescing import SingleFlight
+
+
+class Gate:
+    """A call that blocks in the threadpool until released, counting runs."""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, *args):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestSingleFlight:
+    """Test cases for request coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test identical concurrent reads run the call once."""
+        flights = SingleFlight()
+        gate = Gate(result=42)
+        waiters = [
+            asyncio.ensure_future(flights.do("detail", "a", gate)) for _ in range(5)
+        ]
+        await asyncio.sleep(0.05)
+        gate.release.set()
+
+        assert await asyncio.gather(*waiters) == [42] * 5
+        assert gate.calls == 1
+        assert flights.stats()["detail"] == {
+            "requests": 5,
+            "executions": 1,
+            "coalesced": 4,
+            "coalescing_ratio": 0.8,
+        }
+
+    @pytest.mark.asyncio
+    async def test_distinct_keys_run_separately(self):
+        """Test reads of different keys are not coalesced."""
+        flights = SingleFlight()
+        gate = Gate(result="x")
+        gate.release.set()
+
+        await asyncio.gather(
+            flights.do("detail", "a", gate), flights.do("detail", "b", gate)
+        )
+        assert gate.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_reaches_every_waiter(self):
+        """Test a failing call raises in every waiter and is not kept."""
+        flights = SingleFlight()
+        gate = Gate(error=LookupError("gone"))
+        waiters = [
+            asyncio.ensure_future(flights.do("detail", "a", gate)) for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        gate.release.set()
+
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(result, LookupError) for result in results)
+        gate.error = None
+        assert await flights.do("detail", "a", gate) is None
+        assert gate.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_fail_followers(self):
+        """Test a follower still gets the result when the first caller leaves."""
+        flights = SingleFlight()
+        gate = Gate(result=42)
+        leader = asyncio.ensure_future(flights.do("detail", "a", gate))
+        await asyncio.sleep(0.05)
+        follower = asyncio.ensure_future(flights.do("detail", "a", gate))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        gate.release.set()
+
+        assert await follower == 42
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert gate.calls == 1
+
+
+class TestCoalescedListingReads:
+    """Test cases for coalesced listing detail reads."""
+
+    ROUTE = "GET /listings/{listing_id}"
+
+    def _executions(self, api):
+        stats = api.get("/metrics/coalescing").json().get(self.ROUTE, {})
+        return stats.get("executions", 0)
+
+    def test_cold_conditional_read_skips_the_load(self, api, marketplace):
+        """Test a matching conditional read on a cold cache is a bare 304."""
+        listing = marketplace.listing()
+        etag = api.get(f"/listings/{listing['id']}").headers["etag"]
+        listing_detail_cache.clear()
+        executions = self._executions(api)
+
+        response = api.get(
+            f"/listings/{listing['id']}", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert self._executions(api) == executions
+
+    def test_cold_read_loads_once(self, api, marketplace):
+        """Test a cold read goes through one coalesced load and fills the cache."""
+        listing = marketplace.listing()
+        listing_detail_cache.clear()
+        executions = self._executions(api)
+
+        assert api.get(f"/listings/{listing['id']}").json()["id"] == listing["id"]
+        assert api.get(f"/listings/{listing['id']}").json()["id"] == listing["id"]
+        assert self._executions(api) == executions + 1
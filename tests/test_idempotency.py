@@ -0,0 +1,177 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from fastapi import status
+from config import settings
+from idempotency import IdempotencyStore
+from services.auth import create_access_token
+from tests.constants import UserRole
+
+RUN, REPLAY, CONFLICT = (
+    IdempotencyStore.RUN,
+    IdempotencyStore.REPLAY,
+    IdempotencyStore.CONFLICT,
+)
+
+
+class TestIdempotencyStore:
+    """Test cases for the idempotency store."""
+
+    @pytest.mark.asyncio
+    async def test_completed_request_is_replayed(self):
+        """Test a stored response is replayed to the same request."""
+        store = IdempotencyStore()
+        fingerprint = b"f" * 16
+        assert await store.begin("key", fingerprint) == (RUN, None)
+        store.finish("key", b"response")
+
+        assert await store.begin("key", fingerprint) == (REPLAY, b"response")
+        assert store.stats()["replays"] == 1
+
+    @pytest.mark.asyncio
+    async def test_other_request_conflicts(self):
+        """Test a key reused for another body conflicts, running or done."""
+        store = IdempotencyStore()
+        await store.begin("key", b"a" * 16)
+        assert await store.begin("key", b"b" * 16) == (CONFLICT, None)
+        store.finish("key", b"response")
+        assert await store.begin("key", b"b" * 16) == (CONFLICT, None)
+
+    @pytest.mark.asyncio
+    async def test_duplicate_waits_for_the_running_request(self):
+        """Test a concurrent duplicate waits and then gets the stored response."""
+        store = IdempotencyStore()
+        fingerprint = b"f" * 16
+        await store.begin("key", fingerprint)
+        duplicate = asyncio.ensure_future(store.begin("key", fingerprint))
+        await asyncio.sleep(0.01)
+        assert not duplicate.done()
+
+        store.finish("key", b"response")
+        assert await duplicate == (REPLAY, b"response")
+        assert store.stats()["waits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_waiter_runs_when_nothing_was_stored(self):
+        """Test a duplicate runs itself when the first attempt stored nothing."""
+        store = IdempotencyStore()
+        fingerprint = b"f" * 16
+        await store.begin("key", fingerprint)
+        duplicate = asyncio.ensure_future(store.begin("key", fingerprint))
+        await asyncio.sleep(0.01)
+
+        store.finish("key", None)
+        assert await duplicate == (RUN, None)
+        assert store.stats()["in_flight"] == 1
+
+
+class TestIdempotentEndpoints:
+    """Test cases for Idempotency-Key handling on write endpoints."""
+
+    def _checkout(self, api, marketplace, key):
+        return api.post(
+            "/cart/checkout",
+            headers={**marketplace.buyer, "Idempotency-Key": key},
+        )
+
+    def test_checkout_retry_is_replayed(self, api, marketplace):
+        """Test a retried checkout returns the first order without a second one."""
+        listing = marketplace.listing(quantity=5)
+        api.post(
+            "/cart/items",
+            json={"listing_id": listing["id"], "quantity": 1},
+            headers=marketplace.buyer,
+        )
+        first = self._checkout(api, marketplace, "retry-1")
+        assert first.status_code == status.HTTP_201_CREATED
+        assert "idempotent-replayed" not in first.headers
+
+        retry = self._checkout(api, marketplace, "retry-1")
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert retry.json() == first.json()
+        assert len(api.get("/orders/", headers=marketplace.buyer).json()) == 1
+        assert api.get(f"/listings/{listing['id']}").json()["quantity"] == 4
+
+    def test_error_responses_are_replayed(self, api, marketplace):
+        """Test a 4xx is stored too, so a retry does not run again."""
+        assert (
+            self._checkout(api, marketplace, "empty").status_code
+            == status.HTTP_400_BAD_REQUEST
+        )
+        api.post(
+            "/cart/items",
+            json={"listing_id": marketplace.listing()["id"], "quantity": 1},
+            headers=marketplace.buyer,
+        )
+        retry = self._checkout(api, marketplace, "empty")
+        assert retry.status_code == status.HTTP_400_BAD_REQUEST
+        assert retry.headers["idempotent-replayed"] == "true"
+
+    def test_key_reused_for_another_body(self, api, marketplace):
+        """Test the same key with a different body is a 422."""
+        marketplace.listing()
+        url = "/listings/bulk-update"
+        headers = {**marketplace.seller, "Idempotency-Key": "bulk-1"}
+        body = {"filter": {"all": True}, "operation": "price_absolute"}
+        first = api.post(url, json={**body, "amount": "1"}, headers=headers)
+        assert first.status_code == status.HTTP_200_OK
+
+        other = api.post(url, json={**body, "amount": "2"}, headers=headers)
+        assert other.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    def test_retry_with_a_refreshed_token_is_replayed(self, api, marketplace):
+        """Test a retry sent with a new token for the same user is replayed."""
+        buyer = marketplace.user(UserRole.BUYER)
+        api.post(
+            "/cart/items",
+            json={"listing_id": marketplace.listing()["id"], "quantity": 1},
+            headers=buyer.headers,
+        )
+        first = api.post(
+            "/cart/checkout", headers={**buyer.headers, "Idempotency-Key": "refresh"}
+        )
+        assert first.status_code == status.HTTP_201_CREATED
+
+        token = create_access_token(
+            {"sub": buyer.username}, expires_delta=timedelta(minutes=5)
+        )
+        assert f"Bearer {token}" != buyer.headers["Authorization"]
+        retry = api.post(
+            "/cart/checkout",
+            headers={"Authorization": f"Bearer {token}", "Idempotency-Key": "refresh"},
+        )
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert retry.json() == first.json()
+
+    def test_key_reused_with_another_query(self, api, marketplace):
+        """Test the same key on a queued and a direct checkout is a 422."""
+        api.post(
+            "/cart/items",
+            json={"listing_id": marketplace.listing()["id"], "quantity": 1},
+            headers=marketplace.buyer,
+        )
+        headers = {**marketplace.buyer, "Idempotency-Key": "mode"}
+        queued = api.post("/cart/checkout?mode=queued", headers=headers)
+        assert queued.status_code == status.HTTP_202_ACCEPTED
+
+        direct = api.post("/cart/checkout?mode=sync", headers=headers)
+        assert direct.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    def test_keys_are_scoped_to_the_caller(self, api, marketplace):
+        """Test two buyers using the same key do not share a response."""
+        first = self._checkout(api, marketplace, "shared")
+        other_buyer = marketplace.user(UserRole.BUYER)
+        second = api.post(
+            "/cart/checkout",
+            headers={**other_buyer.headers, "Idempotency-Key": "shared"},
+        )
+        assert first.status_code == second.status_code
+        assert "idempotent-replayed" not in second.headers
+
+    def test_oversized_key_is_refused(self, api, marketplace):
+        """Test keys longer than the limit are a 400."""
+        key = "k" * (settings.IDEMPOTENCY_KEY_MAX_LENGTH + 1)
+        response = self._checkout(api, marketplace, key)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Invalid Idempotency-Key"
@@ -0,0 +1,702 @@
+import csv
+import io
+import json
+from decimal import Decimal
+import pytest
+from fastapi import HTTPException, status
+from sqlalchemy import event, select, update
+from config import settings
+from database import SessionLocal, engine
+from fieldsets import project
+from models.listing import Listing
+from models.review import Review
+from schemas.listing import ListingBulkOperation
+from services.listing import ListingService
+from services.listing_card import ListingCardService
+from tests.constants import UserRole
+
+
+class TestConditionalGet:
+    """Test cases for ETag and Last-Modified revalidation."""
+
+    def test_listing_etag_round_trip(self, api, marketplace):
+        """Test a listing answers If-None-Match with its ETag by 304."""
+        listing = marketplace.listing()
+        response = api.get(f"/listings/{listing['id']}")
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["etag"]
+        assert etag.startswith('W/"')
+        assert response.headers["cache-control"] == "no-cache"
+
+        revalidated = api.get(
+            f"/listings/{listing['id']}", headers={"If-None-Match": etag}
+        )
+        assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not revalidated.content
+        assert revalidated.headers["etag"] == etag
+
+    def test_listing_if_modified_since(self, api, marketplace):
+        """Test a listing answers If-Modified-Since with its Last-Modified by 304."""
+        listing = marketplace.listing()
+        last_modified = api.get(f"/listings/{listing['id']}").headers["last-modified"]
+
+        response = api.get(
+            f"/listings/{listing['id']}", headers={"If-Modified-Since": last_modified}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_listing_etag_changes_on_update(self, api, marketplace):
+        """Test an updated listing no longer matches its old ETag."""
+        listing = marketplace.listing()
+        etag = api.get(f"/listings/{listing['id']}").headers["etag"]
+
+        updated = api.put(
+            f"/listings/{listing['id']}",
+            json={"price": "12.50"},
+            headers=marketplace.seller,
+        )
+        assert updated.status_code == status.HTTP_200_OK
+
+        response = api.get(
+            f"/listings/{listing['id']}", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"] != etag
+        assert response.json()["price"] == "12.50"
+
+    def test_missing_listing_with_validator(self, api, marketplace):
+        """Test a conditional GET of an unknown listing is 404, not 304."""
+        response = api.get(
+            "/listings/00000000-0000-0000-0000-000000000000",
+            headers={"If-None-Match": "*"},
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_listing_page_etag_round_trip(self, api, marketplace):
+        """Test a browse page answers its own ETag by 304 until it changes."""
+        marketplace.listing()
+        url = f"/listings/?category_id={marketplace.category_id}"
+        etag = api.get(url).headers["etag"]
+
+        assert (
+            api.get(url, headers={"If-None-Match": etag}).status_code
+            == status.HTTP_304_NOT_MODIFIED
+        )
+        marketplace.listing()
+        response = api.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 2
+
+    def test_category_etag_round_trip(self, api, marketplace):
+        """Test a category answers its ETag by 304 until it is renamed."""
+        url = f"/categories/{marketplace.category_id}"
+        etag = api.get(url).headers["etag"]
+        assert (
+            api.get(url, headers={"If-None-Match": etag}).status_code
+            == status.HTTP_304_NOT_MODIFIED
+        )
+
+        renamed = api.put(url, json={"name": "Renamed"}, headers=marketplace.admin)
+        assert renamed.status_code == status.HTTP_200_OK
+        response = api.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["name"] == "Renamed"
+
+
+class TestExport:
+    """Test cases for the streamed catalog export."""
+
+    @pytest.fixture
+    def catalog(self, marketplace, monkeypatch):
+        """Fixture that seeds five listings and exports two per batch."""
+        monkeypatch.setattr(settings, "LISTING_EXPORT_BATCH_SIZE", 2)
+        return {marketplace.listing(price="4.5")["id"] for _ in range(5)}
+
+    def test_ndjson_export(self, api, marketplace, catalog):
+        """Test NDJSON export streams one record per listing across batches."""
+        response = api.get(
+            f"/listings/export?format=ndjson&category_id={marketplace.category_id}"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert "listings.ndjson" in response.headers["content-disposition"]
+
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert {record["id"] for record in records} == catalog
+        assert all(record["price"] == "4.50" for record in records)
+        assert all(record["status"] == "active" for record in records)
+
+    def test_csv_export(self, api, marketplace, catalog):
+        """Test CSV export writes one header and one row per listing."""
+        response = api.get(
+            f"/listings/export?format=csv&category_id={marketplace.category_id}"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+
+        assert response.text.count("\nid,") == 0
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert {row["id"] for row in rows} == catalog
+        assert rows[0]["seller_id"] == marketplace.seller_id
+
+    def test_export_applies_filters(self, api, marketplace, catalog):
+        """Test the browse filters narrow the export."""
+        response = api.get(
+            f"/listings/export?category_id={marketplace.category_id}&min_price=5"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.text == ""
+
+
+class TestImport:
+    """Test cases for the seller catalog import."""
+
+    def _import(self, api, marketplace, content, filename="catalog.csv"):
+        response = api.post(
+            "/listings/import",
+            files={"file": (filename, content.encode())},
+            headers=marketplace.seller,
+        )
+        assert response.status_code == status.HTTP_200_OK, response.text
+        return response.json()
+
+    def _csv(self, marketplace, *rows):
+        lines = ["external_key,title,price,quantity,category_id,status"]
+        lines += [
+            f"{key},{title},{price},{quantity},{marketplace.category_id},"
+            for key, title, price, quantity in rows
+        ]
+        return "\n".join(lines) + "\n"
+
+    def _by_title(self, api, marketplace):
+        listings = api.get(f"/listings/?seller_id={marketplace.seller_id}").json()
+        return {listing["title"]: listing for listing in listings}
+
+    def test_csv_import_creates_then_updates(self, api, marketplace):
+        """Test re-importing a key updates its listing instead of adding one."""
+        first = self._import(
+            api,
+            marketplace,
+            self._csv(marketplace, ("k1", "Lamp", "5.00", 2), ("k2", "Desk", "80", 1)),
+        )
+        assert (first["created"], first["updated"], first["failed"]) == (2, 0, 0)
+
+        second = self._import(
+            api, marketplace, self._csv(marketplace, ("k1", "Lamp", "6.25", 4))
+        )
+        assert (second["created"], second["updated"]) == (0, 1)
+
+        listings = self._by_title(api, marketplace)
+        assert len(listings) == 2
+        assert listings["Lamp"]["price"] == "6.25"
+        assert listings["Lamp"]["quantity"] == 4
+
+    def test_row_errors_are_reported(self, api, marketplace):
+        """Test invalid rows are reported by number while the rest import."""
+        content = "\n".join(
+            [
+                json.dumps(
+                    {
+                        "external_key": "ok",
+                        "title": "Chair",
+                        "price": "12",
+                        "quantity": 1,
+                        "category_id": marketplace.category_id,
+                    }
+                ),
+                "{not json",
+                json.dumps(
+                    {
+                        "external_key": "cheap",
+                        "title": "Chair",
+                        "price": "-1",
+                        "quantity": 1,
+                        "category_id": marketplace.category_id,
+                    }
+                ),
+                json.dumps(
+                    {
+                        "external_key": "lost",
+                        "title": "Chair",
+                        "price": "1",
+                        "quantity": 1,
+                        "category_id": "00000000-0000-0000-0000-000000000000",
+                    }
+                ),
+            ]
+        )
+        result = self._import(api, marketplace, content, "catalog.jsonl")
+
+        assert (result["created"], result["failed"]) == (1, 3)
+        errors = {error["row"]: error for error in result["errors"]}
+        assert errors[2]["detail"].startswith("Invalid JSON")
+        assert errors[3]["external_key"] == "cheap"
+        assert errors[3]["detail"].startswith("price")
+        assert errors[4]["detail"] == "Category not found"
+
+    def test_batches_are_reported(self, api, marketplace, monkeypatch):
+        """Test the result reports progress per batch."""
+        monkeypatch.setattr(settings, "LISTING_IMPORT_BATCH_SIZE", 2)
+        rows = [(f"k{n}", f"Item {n}", "1", 1) for n in range(5)]
+        result = self._import(api, marketplace, self._csv(marketplace, *rows))
+
+        assert [batch["rows"] for batch in result["batches"]] == [2, 2, 1]
+        assert result["processed"] == result["created"] == 5
+
+    def test_null_status_defaults_to_active(self, api, marketplace):
+        """Test an explicit null status imports as active."""
+        row = {
+            "external_key": "k1",
+            "title": "Rug",
+            "price": "3",
+            "quantity": 1,
+            "category_id": marketplace.category_id,
+            "status": None,
+        }
+        result = self._import(api, marketplace, json.dumps(row), "catalog.jsonl")
+
+        assert result["created"] == 1
+        assert self._by_title(api, marketplace)["Rug"]["status"] == "active"
+
+    def test_quantity_below_reserved_is_rejected(self, api, marketplace, monkeypatch):
+        """Test an update cannot drop stock below the units held in carts."""
+        monkeypatch.setattr(settings, "STOCK_RESERVATIONS_ENABLED", True)
+        self._import(api, marketplace, self._csv(marketplace, ("k1", "Vase", "9", 5)))
+        vase = self._by_title(api, marketplace)["Vase"]
+        api.post(
+            "/cart/items",
+            json={"listing_id": vase["id"], "quantity": 3},
+            headers=marketplace.buyer,
+        )
+
+        result = self._import(
+            api, marketplace, self._csv(marketplace, ("k1", "Vase", "9", 1))
+        )
+        assert result["failed"] == 1
+        assert (
+            result["errors"][0]["detail"] == "quantity: 3 units are reserved in carts"
+        )
+        assert self._by_title(api, marketplace)["Vase"]["quantity"] == 5
+
+    def test_hot_listing_is_rejected(self, api, marketplace):
+        """Test an update of a hot-inventory listing is refused."""
+        self._import(api, marketplace, self._csv(marketplace, ("k1", "Mug", "2", 5)))
+        mug = self._by_title(api, marketplace)["Mug"]
+        url = f"/listings/{mug['id']}/hot-inventory"
+        api.put(f"{url}?enabled=true", headers=marketplace.admin)
+        try:
+            result = self._import(
+                api, marketplace, self._csv(marketplace, ("k1", "Mug", "2", 9))
+            )
+        finally:
+            api.put(f"{url}?enabled=false", headers=marketplace.admin)
+
+        assert result["failed"] == 1
+        assert result["errors"][0]["detail"].startswith("Turn off hot inventory")
+        assert self._by_title(api, marketplace)["Mug"]["quantity"] == 5
+
+    def test_non_utf8_file_is_reported(self, api, marketplace):
+        """Test a file that stops being UTF-8 ends with an error, not a 500."""
+        rows = [(f"k{n}", f"Item {n}", "1", 1) for n in range(300)]
+        content = self._csv(marketplace, *rows, ("k300", "Caf\u00e9", "1", 1))
+        response = api.post(
+            "/listings/import",
+            files={"file": ("catalog.csv", content.encode("cp1252"))},
+            headers=marketplace.seller,
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        result = response.json()
+        (error,) = result["errors"]
+        assert error["detail"].startswith("File is not UTF-8 encoded")
+        assert 0 < result["created"] == error["row"] - 1
+        assert result["failed"] == 1
+
+    def test_listing_turned_hot_during_the_batch(self, api, marketplace):
+        """Test an update skipped by the statement's hot guard is a row error."""
+        self._import(api, marketplace, self._csv(marketplace, ("k1", "Jug", "2", 5)))
+        jug = self._by_title(api, marketplace)["Jug"]
+
+        def switch_on(conn, cursor, statement, parameters, context, executemany):
+            # Lands between the batch's read and its UPDATE
+            if statement.startswith("UPDATE listings") and "hot_inventory" in statement:
+                cursor.connection.execute(
+                    "UPDATE listings SET hot_inventory = 1 WHERE id = ?", (jug["id"],)
+                )
+
+        event.listen(engine, "before_cursor_execute", switch_on)
+        try:
+            result = self._import(
+                api, marketplace, self._csv(marketplace, ("k1", "Jug", "2", 9))
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", switch_on)
+            with SessionLocal() as db:
+                db.execute(
+                    update(Listing)
+                    .where(Listing.id == jug["id"])
+                    .values(hot_inventory=False)
+                )
+                db.commit()
+
+        assert (result["updated"], result["failed"]) == (0, 1)
+        assert result["errors"][0]["external_key"] == "k1"
+        assert result["errors"][0]["detail"].startswith("Turn off hot inventory")
+        assert self._by_title(api, marketplace)["Jug"]["quantity"] == 5
+
+
+class TestBulkUpdate:
+    """Test cases for filtered bulk listing updates."""
+
+    def _bulk(self, api, headers, **body):
+        return api.post("/listings/bulk-update", json=body, headers=headers)
+
+    def _price(self, api, listing):
+        return api.get(f"/listings/{listing['id']}").json()["price"]
+
+    def test_seller_is_scoped_to_own_listings(self, api, marketplace):
+        """Test a seller's update of every listing leaves other sellers alone."""
+        own = marketplace.listing()
+        rival = marketplace.user(UserRole.SELLER)
+        theirs = marketplace.listing(headers=rival.headers)
+
+        response = self._bulk(
+            api,
+            marketplace.seller,
+            filter={"all": True},
+            operation="set_status",
+            status="inactive",
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["affected"] == 1
+        assert api.get(f"/listings/{own['id']}").json()["status"] == "inactive"
+        assert api.get(f"/listings/{theirs['id']}").json()["status"] == "active"
+
+    def test_seller_cannot_target_another_seller(self, api, marketplace):
+        """Test a seller naming another seller is forbidden."""
+        rival = marketplace.user(UserRole.SELLER)
+        response = self._bulk(
+            api,
+            marketplace.seller,
+            filter={"seller_id": rival.id},
+            operation="price_absolute",
+            amount="1",
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_buyer_is_forbidden(self, api, marketplace):
+        """Test buyers cannot bulk update."""
+        response = self._bulk(
+            api,
+            marketplace.buyer,
+            filter={"all": True},
+            operation="price_absolute",
+            amount="1",
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_filter_is_required(self, api, marketplace):
+        """Test an empty filter is refused instead of updating everything."""
+        response = self._bulk(
+            api, marketplace.admin, filter={}, operation="price_absolute", amount="1"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_service_refuses_an_unscoped_update(self):
+        """Test the service itself refuses an update with no filter."""
+        with SessionLocal() as db:
+            with pytest.raises(HTTPException) as refused:
+                ListingService(db).bulk_update(
+                    ListingBulkOperation.PRICE_ABSOLUTE, amount=Decimal("1")
+                )
+        assert refused.value.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_admin_updates_one_category(self, api, marketplace):
+        """Test an admin's category filter reaches every seller in it only."""
+        rival = marketplace.user(UserRole.SELLER)
+        inside = [marketplace.listing(), marketplace.listing(headers=rival.headers)]
+        outside = marketplace.listing(category_id=marketplace.category()["id"])
+
+        response = self._bulk(
+            api,
+            marketplace.admin,
+            filter={"category_id": marketplace.category_id},
+            operation="price_absolute",
+            amount="-2.5",
+        )
+        assert response.json()["affected"] == 2
+        assert [self._price(api, listing) for listing in inside] == ["7.50", "7.50"]
+        assert self._price(api, outside) == "10.00"
+
+    @pytest.mark.parametrize(
+        "price, percent, expected",
+        [("19.99", "10", "21.99"), ("0.05", "10", "0.06"), ("10.00", "-33.3", "6.67")],
+    )
+    def test_percent_rounds_to_cents(self, api, marketplace, price, percent, expected):
+        """Test percent changes round half up to whole cents."""
+        listing = marketplace.listing(price=price)
+        self._bulk(
+            api,
+            marketplace.seller,
+            filter={"all": True},
+            operation="price_percent",
+            amount=percent,
+        )
+        assert self._price(api, listing) == expected
+
+    def test_price_never_goes_negative(self, api, marketplace):
+        """Test an absolute cut below zero stops at zero."""
+        listing = marketplace.listing(price="3.00")
+        self._bulk(
+            api,
+            marketplace.seller,
+            filter={"all": True},
+            operation="price_absolute",
+            amount="-5",
+        )
+        assert self._price(api, listing) == "0.00"
+
+
+class TestFacets:
+    """Test cases for the browse facet counts."""
+
+    def _facets(self, api, marketplace):
+        response = api.get(f"/listings/facets?seller_id={marketplace.seller_id}")
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+
+    def test_counts_per_category_status_and_price(self, api, marketplace):
+        """Test one response counts categories, statuses and price buckets."""
+        other_category = marketplace.category()["id"]
+        marketplace.listing(price="5")
+        marketplace.listing(price="30")
+        marketplace.listing(price="30", status="inactive")
+        marketplace.listing(price="2000", category_id=other_category)
+
+        facets = self._facets(api, marketplace)
+        assert facets["total"] == 4
+        assert facets["categories"] == [
+            {"category_id": marketplace.category_id, "count": 3},
+            {"category_id": other_category, "count": 1},
+        ]
+        assert facets["statuses"] == {"active": 3, "inactive": 1}
+        buckets = {
+            (bucket["min"], bucket["count"]) for bucket in facets["price_buckets"]
+        }
+        assert ("0", 1) in buckets
+        assert ("25", 2) in buckets
+        assert facets["price_buckets"][-1]["max"] is None
+        assert facets["price_buckets"][-1]["count"] == 1
+
+    def test_filters_narrow_the_counts(self, api, marketplace):
+        """Test facets follow the browse filters."""
+        marketplace.listing(price="5")
+        marketplace.listing(price="30")
+        response = api.get(
+            f"/listings/facets?seller_id={marketplace.seller_id}&min_price=10"
+        )
+        assert response.json()["total"] == 1
+
+    def test_write_refreshes_cached_facets(self, api, marketplace):
+        """Test a new listing shows in facets served from the cache."""
+        marketplace.listing()
+        assert self._facets(api, marketplace)["total"] == 1
+        marketplace.listing()
+        assert self._facets(api, marketplace)["total"] == 2
+
+
+class TestListingCards:
+    """Test cases for the denormalized listing card read model."""
+
+    def _card(self, api, marketplace, listing):
+        cards = api.get(f"/listings/cards?seller_id={marketplace.seller_id}").json()
+        return next(card for card in cards if card["listing_id"] == listing["id"])
+
+    def test_card_follows_listing_writes(self, api, marketplace):
+        """Test a card carries the joined names and follows listing updates."""
+        listing = marketplace.listing(price="8")
+        card = self._card(api, marketplace, listing)
+        category = api.get(f"/categories/{marketplace.category_id}").json()
+        assert card["title"] == listing["title"]
+        assert card["category_name"] == category["name"]
+        assert card["seller_username"].startswith("seller_")
+        assert card["review_count"] == 0
+        assert card["average_rating"] is None
+
+        api.put(
+            f"/listings/{listing['id']}",
+            json={"price": "9.50", "quantity": 1},
+            headers=marketplace.seller,
+        )
+        card = self._card(api, marketplace, listing)
+        assert (card["price"], card["quantity"]) == ("9.50", 1)
+
+    def test_card_follows_category_rename(self, api, marketplace):
+        """Test renaming a category updates its listings' cards."""
+        listing = marketplace.listing()
+        api.put(
+            f"/categories/{marketplace.category_id}",
+            json={"name": "Garden tools"},
+            headers=marketplace.admin,
+        )
+        assert self._card(api, marketplace, listing)["category_name"] == "Garden tools"
+
+    def test_deleted_listing_loses_its_card(self, api, marketplace):
+        """Test a deleted listing no longer has a card."""
+        listing = marketplace.listing()
+        api.delete(f"/listings/{listing['id']}", headers=marketplace.seller)
+        cards = api.get(f"/listings/cards?seller_id={marketplace.seller_id}").json()
+        assert cards == []
+
+    def test_cards_page_in_browse_order(self, api, marketplace):
+        """Test card pages follow the /listings order without gaps or repeats."""
+        oldest = marketplace.listing()
+        for _ in range(4):
+            marketplace.listing()
+        # A refresh re-inserts the card, moving it last in table order
+        api.put(
+            f"/listings/{oldest['id']}",
+            json={"price": "9.50", "quantity": 1},
+            headers=marketplace.seller,
+        )
+        browse = api.get(f"/listings?seller_id={marketplace.seller_id}").json()
+        pages = [
+            api.get(
+                f"/listings/cards?seller_id={marketplace.seller_id}&skip={skip}&limit=2"
+            ).json()
+            for skip in (0, 2, 4)
+        ]
+        assert [card["listing_id"] for page in pages for card in page] == [
+            listing["id"] for listing in browse
+        ]
+
+    def test_review_refresh_and_rebuild(self, api, marketplace):
+        """Test refreshed and rebuilt cards both carry the review aggregates."""
+        reviewed, rebuilt = marketplace.listing(), marketplace.listing()
+        with SessionLocal() as db:
+            for rating in (4, 5):
+                reviewer = marketplace.user(UserRole.BUYER)
+                db.add(
+                    Review(
+                        listing_id=reviewed["id"],
+                        reviewer_id=reviewer.id,
+                        rating=rating,
+                    )
+                )
+            db.add(Review(listing_id=rebuilt["id"], reviewer_id=reviewer.id, rating=2))
+            ListingCardService(db).refresh_listings([reviewed["id"]])
+            db.commit()
+            card = self._card(api, marketplace, reviewed)
+            assert (card["review_count"], card["average_rating"]) == (2, 4.5)
+            assert self._card(api, marketplace, rebuilt)["review_count"] == 0
+
+            assert ListingCardService(db).rebuild() >= 2
+        card = self._card(api, marketplace, rebuilt)
+        assert (card["review_count"], card["average_rating"]) == (1, 2.0)
+
+
+class TestProjectedRows:
+    """Test cases for list endpoints served from column projections."""
+
+    def test_listing_row_matches_detail(self, api, marketplace):
+        """Test a browse row serializes exactly like the listing detail."""
+        listing = marketplace.listing(description="Long text", price="3.10")
+        rows = api.get(f"/listings/?category_id={marketplace.category_id}").json()
+        assert rows == [api.get(f"/listings/{listing['id']}").json()]
+
+    def test_order_row_matches_detail(self, api, marketplace):
+        """Test an order row serializes exactly like the order detail."""
+        listing = marketplace.listing()
+        api.post(
+            "/cart/items",
+            json={"listing_id": listing["id"], "quantity": 2},
+            headers=marketplace.buyer,
+        )
+        order = api.post("/cart/checkout", headers=marketplace.buyer).json()
+        rows = api.get("/orders/", headers=marketplace.buyer).json()
+        detail = api.get(f"/orders/{order['id']}", headers=marketplace.buyer).json()
+        assert rows == [detail]
+
+    def test_review_rows_match_response_model(self, api, marketplace):
+        """Test review rows carry the ReviewResponse fields."""
+        listing = marketplace.listing()
+        with SessionLocal() as db:
+            review = Review(
+                listing_id=listing["id"],
+                reviewer_id=marketplace.buyer_id,
+                rating=4,
+                comment="Solid",
+            )
+            db.add(review)
+            db.commit()
+            review_id = review.id
+
+        rows = api.get(f"/reviews/listing/{listing['id']}").json()
+        assert rows == [
+            {
+                "listing_id": listing["id"],
+                "rating": 4,
+                "comment": "Solid",
+                "id": review_id,
+                "reviewer_id": marketplace.buyer_id,
+            }
+        ]
+
+
+class TestSparseFieldsets:
+    """Test cases for ?fields= on list endpoints."""
+
+    def test_listing_fields(self, api, marketplace):
+        """Test listing rows carry only the requested fields."""
+        listing = marketplace.listing(description="Not wanted")
+        response = api.get(
+            f"/listings/?category_id={marketplace.category_id}&fields=title, price"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [{"title": listing["title"], "price": "10.00"}]
+
+    def test_projection_skips_unrequested_columns(self):
+        """Test unrequested columns are not read from the table."""
+        statement = select(*project(ListingService.ROW_COLUMNS, {"id", "title"}))
+        sql = str(statement.compile())
+        assert "listings.title" in sql
+        assert "listings.description" not in sql
+        assert "NULL AS description" in sql
+
+    def test_order_fields_skip_items(self, api, marketplace):
+        """Test order rows without items still report their totals."""
+        listing = marketplace.listing()
+        api.post(
+            "/cart/items",
+            json={"listing_id": listing["id"], "quantity": 2},
+            headers=marketplace.buyer,
+        )
+        api.post("/cart/checkout", headers=marketplace.buyer)
+        response = api.get(
+            "/orders/?fields=total_amount,status", headers=marketplace.buyer
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [{"total_amount": "20.00", "status": "PENDING"}]
+
+    def test_review_fields(self, api, marketplace):
+        """Test review rows carry only the requested fields."""
+        listing = marketplace.listing()
+        with SessionLocal() as db:
+            db.add(
+                Review(
+                    listing_id=listing["id"],
+                    reviewer_id=marketplace.buyer_id,
+                    rating=3,
+                    comment="Fine",
+                )
+            )
+            db.commit()
+        response = api.get(f"/reviews/listing/{listing['id']}?fields=rating")
+        assert response.json() == [{"rating": 3}]
+
+    @pytest.mark.parametrize("fields", ["password", "", "title,nope"])
+    def test_unknown_fields_are_rejected(self, api, fields):
+        """Test fields outside the response model are a 400 naming the allowed ones."""
+        response = api.get(f"/listings/?fields={fields}")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Allowed: " in response.json()["detail"]
@@ -0,0 +1,156 @@
+import gzip
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+import pytest
+from fastapi import status
+from http_compression import negotiate, precompress
+from models.listing import ListingStatus
+from responses import dumps
+from schemas.category import CategoryCreate
+
+
+@dataclass(slots=True)
+class Row:
+    id: str
+    price: Decimal
+
+
+class TestOrjsonEncoding:
+    """Test cases for the orjson response encoding."""
+
+    def test_native_types(self):
+        """Test UUIDs, Decimals, datetimes and enums encode like pydantic."""
+        body = dumps(
+            {
+                "id": UUID("12345678-1234-5678-1234-567812345678"),
+                "price": Decimal("9.90"),
+                "at": datetime(2024, 1, 2, 3, 4, 5),
+                "status": ListingStatus.ACTIVE,
+            }
+        )
+        assert body == (
+            b'{"id":"12345678-1234-5678-1234-567812345678","price":"9.90",'
+            b'"at":"2024-01-02T03:04:05","status":"active"}'
+        )
+
+    def test_dataclasses_models_and_keys(self):
+        """Test slotted rows, pydantic models and non-string keys encode."""
+        body = dumps(
+            {
+                1: [Row(id="a", price=Decimal("1.50"))],
+                ListingStatus.SOLD_OUT: CategoryCreate(name="Books"),
+            }
+        )
+        assert body == (
+            b'{"1":[{"id":"a","price":"1.50"}],'
+            b'"sold_out":{"name":"Books","description":null,"parent_id":null}}'
+        )
+
+    def test_list_body_is_compact(self, api, marketplace):
+        """Test list pages are compact JSON with prices as strings."""
+        marketplace.listing(price="7.5")
+        response = api.get(f"/listings/?category_id={marketplace.category_id}")
+        assert response.headers["content-type"] == "application/json"
+        assert b'"price":"7.50"' in response.content
+        assert b", " not in response.content
+        assert b'": ' not in response.content
+
+    def test_cached_detail_bytes_are_reused(self, api, marketplace):
+        """Test a cached detail sends the same bytes as the first read."""
+        listing = marketplace.listing()
+        first = api.get(f"/listings/{listing['id']}")
+        second = api.get(f"/listings/{listing['id']}")
+        assert second.status_code == status.HTTP_200_OK
+        assert second.content == first.content
+
+    def test_default_response_class(self, api, marketplace):
+        """Test endpoints returning models are encoded by orjson too."""
+        response = api.post(
+            "/listings/",
+            json={
+                "title": "Encoded",
+                "price": "3",
+                "quantity": 1,
+                "category_id": marketplace.category_id,
+            },
+            headers=marketplace.seller,
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert b'"price":"3.00"' in response.content
+
+
+class TestCompression:
+    """Test cases for negotiated response compression."""
+
+    @pytest.mark.parametrize(
+        "accept_encoding, expected",
+        [
+            (None, None),
+            ("identity", None),
+            ("gzip", "gzip"),
+            ("br;q=0.5, gzip;q=0.8", "gzip"),
+            ("gzip;q=0", None),
+            ("*", "gzip"),
+        ],
+    )
+    def test_negotiate(self, accept_encoding, expected):
+        """Test Accept-Encoding picks the best available codec or none."""
+        assert negotiate(accept_encoding, ["gzip"]) == expected
+
+    def test_precompress_skips_small_bodies(self):
+        """Test bodies under the minimum size get no precompressed variants."""
+        assert precompress(b"{}") == {}
+        body = b'{"title":"lamp"}' * 200
+        assert gzip.decompress(precompress(body)["gzip"]) == body
+
+    def test_large_page_is_compressed(self, api, marketplace):
+        """Test a large browse page is gzipped for clients that accept it."""
+        for _ in range(8):
+            marketplace.listing(description="x" * 300)
+        response = api.get(
+            f"/listings/?category_id={marketplace.category_id}",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert len(response.json()) == 8
+
+    def test_small_or_unaccepted_bodies_are_not_compressed(self, api, marketplace):
+        """Test small bodies and identity clients are sent uncompressed."""
+        listing = marketplace.listing()
+        small = api.get(
+            f"/listings/{listing['id']}", headers={"Accept-Encoding": "gzip"}
+        )
+        assert "content-encoding" not in small.headers
+
+        for _ in range(8):
+            marketplace.listing(description="x" * 300)
+        identity = api.get(
+            f"/listings/?category_id={marketplace.category_id}",
+            headers={"Accept-Encoding": "identity"},
+        )
+        assert "content-encoding" not in identity.headers
+        assert "Accept-Encoding" in identity.headers["vary"]
+
+    def test_cached_detail_is_sent_precompressed(self, api, marketplace):
+        """Test a cached large detail is served from its stored gzip variant."""
+        listing = marketplace.listing(description="y" * 2000)
+        url = f"/listings/{listing['id']}"
+        api.get(url)
+        response = api.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["description"] == "y" * 2000
+
+    def test_export_is_compressed_as_a_stream(self, api, marketplace):
+        """Test a streamed export is gzipped chunk by chunk."""
+        for _ in range(10):
+            marketplace.listing(description="z" * 200)
+        response = api.get(
+            f"/listings/export?category_id={marketplace.category_id}",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert len(response.text.splitlines()) == 10
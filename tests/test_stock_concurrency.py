@@ -0,0 +1,586 @@
+import os
+import tempfile
+import threading
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+import models  # noqa: F401  (register every mapper)
+from config import settings
+from database import Base
+from models.cart import CartItem
+from models.category import Category
+from models.listing import Listing, ListingStatus
+from models.checkout_job import CheckoutJob, CheckoutJobStatus
+from models.order import Order, OrderItem
+from models.reservation import StockReservation
+from models.roles import Role
+from models.user import User
+from schemas.cart import CartItemCreate, CartOperation
+from schemas.listing import ListingUpdate
+from schemas.order import OrderCreate, OrderItemCreate
+from services.cart import CartService
+from services.checkout_queue import CheckoutQueue, CheckoutQueueService
+from services.hot_inventory import HotInventoryLedger, ListingSwitching
+from services.listing import ListingService
+from services.order import OrderService
+from services.reservation import ReservationExpiry, ReservationService
+from services.stock import StockService
+from tests.constants import UserRole
+
+BUYERS = 40
+
+
+@pytest.fixture
+def session_factory():
+    """Fixture that provides sessions on a throwaway SQLite file database."""
+    path = os.path.join(tempfile.mkdtemp(), "stock.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+    os.remove(path)
+
+
+@pytest.fixture
+def hot_listing(session_factory):
+    """Fixture that creates one listing with 5 units left and 40 buyers."""
+
+    def _create(units_per_buyer=1):
+        with session_factory() as db:
+            role = Role(name=UserRole.BUYER)
+            seller = User(username="seller", email="s@ex.com", password="x", role=role)
+            buyers = [
+                User(
+                    username=f"buyer{i}", email=f"b{i}@ex.com", password="x", role=role
+                )
+                for i in range(BUYERS)
+            ]
+            category = Category(name="Hot")
+            db.add_all([role, seller, category, *buyers])
+            db.flush()
+            listing = Listing(
+                title="Last units",
+                price=10.0,
+                quantity=5,
+                category_id=category.id,
+                seller_id=seller.id,
+            )
+            db.add(listing)
+            db.flush()
+            db.add_all(
+                CartItem(
+                    user_id=buyer.id,
+                    listing_id=listing.id,
+                    quantity=units_per_buyer,
+                    price_at_add=listing.price,
+                )
+                for buyer in buyers
+            )
+            db.commit()
+            return listing.id, [buyer.id for buyer in buyers]
+
+    return _create
+
+
+def run_concurrently(session_factory, buyer_ids, checkout):
+    """Release every buyer at once; returns (successes, failures)"""
+    barrier = threading.Barrier(len(buyer_ids))
+    successes, failures = [], []
+
+    def buy(buyer_id):
+        with session_factory() as db:
+            barrier.wait()
+            try:
+                checkout(db, buyer_id)
+                successes.append(buyer_id)
+            except (ValueError, HTTPException) as e:
+                failures.append(e)
+
+    threads = [threading.Thread(target=buy, args=(b,)) for b in buyer_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return successes, failures
+
+
+def sold_units(db, listing_id):
+    return (
+        db.query(func.coalesce(func.sum(OrderItem.quantity), 0))
+        .filter(OrderItem.listing_id == listing_id)
+        .scalar()
+    )
+
+
+class TestConcurrentCheckout:
+    """Many buyers racing for the last units of one listing."""
+
+    def test_cart_checkout_never_oversells(self, session_factory, hot_listing):
+        """Test exactly the remaining units are sold through cart checkout."""
+        listing_id, buyer_ids = hot_listing()
+        successes, failures = run_concurrently(
+            session_factory,
+            buyer_ids,
+            lambda db, buyer_id: CartService(db).process_checkout(buyer_id),
+        )
+
+        assert len(successes) == 5
+        assert len(failures) == BUYERS - 5
+        assert all(isinstance(e, ValueError) for e in failures)
+        with session_factory() as db:
+            listing = db.get(Listing, listing_id)
+            assert listing.quantity == 0
+            assert listing.status == ListingStatus.SOLD_OUT
+            assert sold_units(db, listing_id) == 5
+            assert db.query(Order).count() == 5
+            # Losing buyers keep their cart
+            assert db.query(CartItem).count() == BUYERS - 5
+
+    def test_multi_unit_checkout_never_goes_negative(
+        self, session_factory, hot_listing
+    ):
+        """Test buyers of 2 units each leave the odd last unit unsold."""
+        listing_id, buyer_ids = hot_listing(units_per_buyer=2)
+        successes, _ = run_concurrently(
+            session_factory,
+            buyer_ids,
+            lambda db, buyer_id: CartService(db).process_checkout(buyer_id),
+        )
+
+        assert len(successes) == 2
+        with session_factory() as db:
+            listing = db.get(Listing, listing_id)
+            assert listing.quantity == 1
+            assert listing.status == ListingStatus.ACTIVE
+            assert sold_units(db, listing_id) == 4
+
+    def test_direct_orders_never_oversell(self, session_factory, hot_listing):
+        """Test OrderService.create_order sells exactly the remaining units."""
+        listing_id, buyer_ids = hot_listing()
+
+        def order(db, buyer_id):
+            OrderService(db).create_order(
+                OrderCreate(
+                    buyer_id=buyer_id,
+                    total_amount=Decimal("10"),
+                    items=[OrderItemCreate(listing_id=listing_id, quantity=1)],
+                )
+            )
+
+        successes, failures = run_concurrently(session_factory, buyer_ids, order)
+
+        assert len(successes) == 5
+        assert all(isinstance(e, HTTPException) for e in failures)
+        with session_factory() as db:
+            assert db.get(Listing, listing_id).quantity == 0
+            assert sold_units(db, listing_id) == 5
+
+    def test_cancel_returns_stock(self, session_factory, hot_listing):
+        """Test cancelling a sold-out order restocks and reactivates the listing."""
+        listing_id, buyer_ids = hot_listing(units_per_buyer=5)
+        with session_factory() as db:
+            order = CartService(db).process_checkout(buyer_ids[0])
+            assert db.get(Listing, listing_id).status == ListingStatus.SOLD_OUT
+            OrderService(db).cancel_order(order.id, buyer_ids[0])
+            db.expire_all()
+            listing = db.get(Listing, listing_id)
+            assert listing.quantity == 5
+            assert listing.status == ListingStatus.ACTIVE
+
+    def test_stock_change_during_an_edit(self, session_factory, hot_listing):
+        """Test an edit commits over a sale that landed after its read."""
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as edit, session_factory() as sale:
+            listing = edit.get(Listing, listing_id)
+            version = listing.version
+            assert StockService(sale).decrement({listing_id: 2})
+            sale.commit()
+
+            updated = ListingService(edit).update_listing(
+                listing_id, ListingUpdate(title="Edited"), listing.seller_id
+            )
+            assert updated.title == "Edited"
+            assert updated.quantity == 3
+            assert updated.version == version + 2
+
+
+@pytest.fixture
+def reservations(monkeypatch):
+    """Fixture that turns stock reservations on for one test."""
+    monkeypatch.setattr(settings, "STOCK_RESERVATIONS_ENABLED", True)
+    return settings
+
+
+class TestReservations:
+    """Cart holds taken at add-to-cart under concurrency."""
+
+    def test_concurrent_holds_never_exceed_stock(
+        self, session_factory, hot_listing, reservations
+    ):
+        """Test only the available units can be held by racing carts."""
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as db:
+            db.query(CartItem).delete()
+            db.commit()
+
+        successes, failures = run_concurrently(
+            session_factory,
+            buyer_ids,
+            lambda db, buyer_id: CartService(db).add_to_cart(
+                buyer_id, CartItemCreate(listing_id=listing_id, quantity=1)
+            ),
+        )
+
+        assert len(successes) == 5
+        assert all(isinstance(e, ValueError) for e in failures)
+        with session_factory() as db:
+            listing = db.get(Listing, listing_id)
+            assert listing.reserved_quantity == 5
+            assert listing.available_quantity == 0
+            assert db.query(StockReservation).count() == 5
+
+    def test_held_units_are_not_sold_to_others(
+        self, session_factory, hot_listing, reservations
+    ):
+        """Test a direct order cannot take units held by a cart."""
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as db:
+            db.query(CartItem).delete()
+            db.commit()
+            CartService(db).add_to_cart(
+                buyer_ids[0], CartItemCreate(listing_id=listing_id, quantity=4)
+            )
+            with pytest.raises(HTTPException):
+                OrderService(db).create_order(
+                    OrderCreate(
+                        buyer_id=buyer_ids[1],
+                        total_amount=Decimal("20"),
+                        items=[OrderItemCreate(listing_id=listing_id, quantity=2)],
+                    )
+                )
+            CartService(db).process_checkout(buyer_ids[0])
+            db.expire_all()
+            listing = db.get(Listing, listing_id)
+            assert (listing.quantity, listing.reserved_quantity) == (1, 0)
+
+    def test_expired_holds_are_released(
+        self, session_factory, hot_listing, reservations, monkeypatch
+    ):
+        """Test the expiry heap releases lapsed holds in one batch."""
+        monkeypatch.setattr(settings, "STOCK_RESERVATION_TTL_SECONDS", 0)
+        listing_id, buyer_ids = hot_listing()
+        expiry = ReservationExpiry(session_factory)
+        with session_factory() as db:
+            db.query(CartItem).delete()
+            db.commit()
+            for buyer_id in buyer_ids[:3]:
+                hold = ReservationService(db).hold(buyer_id, listing_id, 1)
+                db.commit()
+                expiry.schedule(hold)
+
+        assert expiry.run_once(datetime.utcnow() + timedelta(seconds=1)) == 3
+        assert len(expiry) == 0
+        with session_factory() as db:
+            assert db.get(Listing, listing_id).available_quantity == 5
+            assert db.query(StockReservation).count() == 0
+
+    def test_batch_is_all_or_nothing(self, session_factory, hot_listing, reservations):
+        """Test a batch short on stock for one listing holds nothing at all."""
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as db:
+            db.query(CartItem).delete()
+            db.commit()
+            cart = CartService(db)
+            cart.add_to_cart(
+                buyer_ids[1], CartItemCreate(listing_id=listing_id, quantity=4)
+            )
+            with pytest.raises(ValueError):
+                cart.apply_operations(
+                    buyer_ids[0],
+                    [
+                        CartOperation(op="add", listing_id=listing_id, quantity=1),
+                        CartOperation(op="add", listing_id=listing_id, quantity=1),
+                    ],
+                )
+            summary = cart.apply_operations(
+                buyer_ids[0],
+                [CartOperation(op="add", listing_id=listing_id, quantity=1)],
+            )
+            assert [item.quantity for item in summary.items] == [1]
+            db.expire_all()
+            assert db.get(Listing, listing_id).available_quantity == 0
+
+
+@pytest.fixture
+def ledger(session_factory, monkeypatch):
+    """Fixture that gives the services a hot-inventory ledger on the test database."""
+    ledger = HotInventoryLedger(session_factory)
+    monkeypatch.setattr("services.cart.hot_inventory", ledger)
+    monkeypatch.setattr("services.order.hot_inventory", ledger)
+    return ledger
+
+
+class TestHotInventory:
+    """Flash-sale listings sold from the in-memory ledger."""
+
+    def test_ledger_checkout_never_oversells(
+        self, session_factory, hot_listing, ledger
+    ):
+        """Test the ledger sells exactly the remaining units and writes them back."""
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as db:
+            assert ledger.enable(db, listing_id)
+
+        successes, failures = run_concurrently(
+            session_factory,
+            buyer_ids,
+            lambda db, buyer_id: CartService(db).process_checkout(buyer_id),
+        )
+
+        assert len(successes) == 5
+        assert all(isinstance(e, ValueError) for e in failures)
+        assert ledger.available(listing_id) == 0
+        with session_factory() as db:
+            # Nothing reaches the listing row before the write-behind runs
+            assert db.get(Listing, listing_id).quantity == 5
+        assert ledger.flush() == 5
+        with session_factory() as db:
+            listing = db.get(Listing, listing_id)
+            assert listing.quantity == 0
+            assert listing.status == ListingStatus.SOLD_OUT
+            assert sold_units(db, listing_id) == 5
+
+    def test_restart_recovers_pending_sales(self, session_factory, hot_listing, ledger):
+        """Test a new ledger writes back a crashed one's sales before selling."""
+        listing_id, buyer_ids = hot_listing(units_per_buyer=2)
+        with session_factory() as db:
+            ledger.enable(db, listing_id)
+            CartService(db).process_checkout(buyer_ids[0])
+        # The first ledger dies here without flushing
+
+        restarted = HotInventoryLedger(session_factory)
+        restarted.start()
+        restarted.stop()
+
+        assert restarted.written == 2
+        assert restarted.available(listing_id) == 3
+        with session_factory() as db:
+            assert db.get(Listing, listing_id).quantity == 3
+            assert db.query(OrderItem).filter(~OrderItem.stock_applied).count() == 0
+
+    def test_cancel_before_write_back(self, session_factory, hot_listing, ledger):
+        """Test a cancelled hot sale goes back to the ledger, not the listing row."""
+        listing_id, buyer_ids = hot_listing(units_per_buyer=2)
+        with session_factory() as db:
+            ledger.enable(db, listing_id)
+            order = CartService(db).process_checkout(buyer_ids[0])
+            OrderService(db).cancel_order(order.id, buyer_ids[0])
+
+        assert ledger.available(listing_id) == 5
+        assert ledger.flush() == 0
+        with session_factory() as db:
+            assert db.get(Listing, listing_id).quantity == 5
+
+    def test_enable_turns_holds_into_ledger_units(
+        self, session_factory, hot_listing, ledger, reservations
+    ):
+        """Test units held by carts are loaded into the ledger when it is enabled."""
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as db:
+            db.query(CartItem).delete()
+            db.commit()
+            CartService(db).add_to_cart(
+                buyer_ids[0], CartItemCreate(listing_id=listing_id, quantity=3)
+            )
+            assert ledger.enable(db, listing_id)
+
+        assert ledger.available(listing_id) == 5
+        with session_factory() as db:
+            assert db.get(Listing, listing_id).reserved_quantity == 0
+            assert db.query(StockReservation).count() == 0
+            CartService(db).process_checkout(buyer_ids[0])
+        assert ledger.available(listing_id) == 2
+
+    def test_disable_waits_for_open_checkouts(
+        self, session_factory, hot_listing, ledger
+    ):
+        """Test handing a listing back writes back a sale committing meanwhile."""
+        listing_id, buyer_ids = hot_listing(units_per_buyer=2)
+        with session_factory() as db:
+            ledger.enable(db, listing_id)
+        buying = session_factory()
+        cart = CartService(buying)
+        prepared = cart.prepare_checkout(buyer_ids[0])
+
+        with session_factory() as db:
+            handing_back = threading.Thread(
+                target=ledger.disable, args=(db, listing_id)
+            )
+            handing_back.start()
+            handing_back.join(0.3)
+            assert handing_back.is_alive()
+            buying.commit()
+            cart.finish_checkout(prepared)
+            handing_back.join()
+        buying.close()
+
+        assert ledger.available(listing_id) is None
+        with session_factory() as db:
+            listing = db.get(Listing, listing_id)
+            assert (listing.quantity, listing.hot_inventory) == (3, False)
+            assert db.query(OrderItem).filter(~OrderItem.stock_applied).count() == 0
+            # Sold through the guarded update again
+            CartService(db).process_checkout(buyer_ids[1])
+            db.expire_all()
+            assert db.get(Listing, listing_id).quantity == 1
+
+    def test_checkout_during_a_stalled_switch(
+        self, session_factory, hot_listing, ledger, monkeypatch
+    ):
+        """Test a checkout outwaited by a switch fails as retryable, taking nothing."""
+        monkeypatch.setattr(settings, "HOT_INVENTORY_SWITCH_TIMEOUT_SECONDS", 0.1)
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as writer, session_factory() as db:
+            # The switch stalls on SQLite's write lock
+            writer.query(CartItem).filter(CartItem.user_id == buyer_ids[-1]).update(
+                {"quantity": 2}
+            )
+            switching = threading.Thread(target=ledger.enable, args=(db, listing_id))
+            switching.start()
+            switching.join(0.3)
+            assert switching.is_alive()
+            with session_factory() as buying:
+                with pytest.raises(ListingSwitching, match="^Last units is starting"):
+                    CartService(buying).process_checkout(buyer_ids[0])
+            writer.rollback()
+            switching.join()
+
+        assert ledger.available(listing_id) == 5
+        with session_factory() as db:
+            CartService(db).process_checkout(buyer_ids[0])
+        assert ledger.available(listing_id) == 4
+
+    def test_several_workers_hand_hot_listings_back(
+        self, session_factory, hot_listing, ledger, monkeypatch
+    ):
+        """Test a ledger started with several worker processes sells nothing."""
+        listing_id, _ = hot_listing()
+        with session_factory() as db:
+            ledger.enable(db, listing_id)
+
+        monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+        restarted = HotInventoryLedger(session_factory)
+        restarted.start()
+        restarted.stop()
+
+        assert restarted.available(listing_id) is None
+        with session_factory() as db:
+            assert db.get(Listing, listing_id).hot_inventory is False
+
+
+class TestCheckoutQueue:
+    """Queued checkouts processed in batches sharing one commit."""
+
+    def test_failed_job_rolls_back_only_itself(
+        self, session_factory, hot_listing, reservations, monkeypatch
+    ):
+        """Test a checkout failing after its first writes leaves the batch intact."""
+        listing_id, buyer_ids = hot_listing()
+        with session_factory() as db:
+            db.query(CartItem).delete()
+            db.commit()
+            for buyer_id in buyer_ids[:3]:
+                CartService(db).add_to_cart(
+                    buyer_id, CartItemCreate(listing_id=listing_id, quantity=1)
+                )
+            jobs = [CheckoutQueueService(db).enqueue(b).id for b in buyer_ids[:3]]
+
+        decrement = StockService.decrement
+        calls = []
+
+        def fail_second(self, quantities, held=None):
+            calls.append(quantities)
+            return len(calls) != 2 and decrement(self, quantities, held)
+
+        monkeypatch.setattr(StockService, "decrement", fail_second)
+        assert CheckoutQueue(session_factory).run_once() == 3
+
+        with session_factory() as db:
+            statuses = [db.get(CheckoutJob, job_id).status for job_id in jobs]
+            assert statuses == [
+                CheckoutJobStatus.DONE,
+                CheckoutJobStatus.FAILED,
+                CheckoutJobStatus.DONE,
+            ]
+            assert db.query(Order).count() == 2
+            listing = db.get(Listing, listing_id)
+            # The failed buyer's hold and cart survived its savepoint rollback
+            assert (listing.quantity, listing.reserved_quantity) == (3, 1)
+            assert db.query(StockReservation).count() == 1
+            assert db.query(CartItem).count() == 1
+
+    def test_concurrent_enqueue_yields_one_job(self, session_factory, hot_listing):
+        """Test racing checkout requests of one buyer share a single open job."""
+        _, buyer_ids = hot_listing()
+        barrier = threading.Barrier(8)
+        job_ids = []
+
+        def enqueue():
+            with session_factory() as db:
+                barrier.wait()
+                job_ids.append(CheckoutQueueService(db).enqueue(buyer_ids[0]).id)
+
+        threads = [threading.Thread(target=enqueue) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(job_ids) == 8
+        assert len(set(job_ids)) == 1
+        with session_factory() as db:
+            assert db.query(CheckoutJob).count() == 1
+
+    def test_expired_lease_is_claimed_again(self, session_factory, hot_listing):
+        """Test a job left PROCESSING is reclaimed only once its lease ran out."""
+        _, buyer_ids = hot_listing()
+        with session_factory() as db:
+            job_id = CheckoutQueueService(db).enqueue(buyer_ids[0]).id
+            assert CheckoutQueueService(db).claim("crashed-worker", 10) == [
+                (job_id, buyer_ids[0])
+            ]
+            db.commit()
+
+        queue = CheckoutQueue(session_factory)
+        assert queue.run_once() == 0
+        with session_factory() as db:
+            db.get(CheckoutJob, job_id).lease_expires_at = datetime.utcnow()
+            db.commit()
+        assert queue.run_once() == 1
+        with session_factory() as db:
+            job = db.get(CheckoutJob, job_id)
+            assert (job.status, job.claimed_by) == (CheckoutJobStatus.DONE, queue.owner)
+            assert db.query(Order).count() == 1
+
+    def test_result_needs_the_claim(self, session_factory, hot_listing):
+        """Test a worker whose job was taken over cannot write its result."""
+        _, buyer_ids = hot_listing()
+        with session_factory() as db:
+            queue = CheckoutQueueService(db)
+            job_id = queue.enqueue(buyer_ids[0]).id
+            queue.claim("first-worker", 10)
+            db.query(CheckoutJob).update({"claimed_by": "second-worker"})
+            done = {
+                "b_id": job_id,
+                "status": CheckoutJobStatus.DONE,
+                "order_id": None,
+                "error": None,
+            }
+
+            assert not queue.complete("first-worker", [done])
+            assert queue.complete("second-worker", [done])
+            db.commit()
+            assert db.get(CheckoutJob, job_id).status == CheckoutJobStatus.DONE